@@ -0,0 +1,198 @@
+"""
+Admission control for the prediction endpoints: answer fast with 429/503
+instead of letting a burst queue up behind the forest.
+
+- RateLimiter: a token bucket per client. Each client may make `rate`
+  requests per second on average, with bursts of up to `burst`; beyond that
+  requests get 429 with Retry-After.
+- ConcurrencyLimiter: at most `max_concurrent` requests run inference at the
+  same time, and at most `max_queue` more wait for a slot. A request is shed
+  with 503 when the queue is full, when the wait predicted from the recent
+  inference time would exceed the latency budget, or when it has waited for
+  the whole budget without getting a slot. Callers that queue work
+  themselves (the ASGI micro-batcher) use admit_backlog() for the same
+  decisions against their own queue.
+
+Both are per process, like the prediction cache: with N workers a client can
+get N times the configured rate.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Weight of the newest sample in the running mean of inference time
+SERVICE_TIME_SMOOTHING = 0.2
+
+
+class Overloaded(Exception):
+    """Inference is saturated; the request should be retried later"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """Token bucket per client id; the least recently seen clients are forgotten beyond max_clients"""
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def check(self, client, cost=1, now=None):
+        """None if the request may go ahead, else the seconds until it would be allowed"""
+        if not self.enabled:
+            return None
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= cost:
+                tokens -= cost
+                retry_after = None
+                self.allowed += 1
+            else:
+                retry_after = (cost - tokens) / self.rate
+                self.limited += 1
+            self._buckets[client] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'rate_per_second': self.rate,
+            'burst': self.burst,
+            'clients': len(self._buckets),
+            'allowed': self.allowed,
+            'limited': self.limited,
+        }
+
+
+class ConcurrencyLimiter:
+    """Bounded number of requests in inference, with a bounded, latency-budgeted wait queue"""
+
+    def __init__(self, max_concurrent, max_queue, latency_budget):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.latency_budget = latency_budget
+        self._condition = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.service_time = None
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_latency_budget = 0
+
+    @property
+    def enabled(self):
+        return self.max_concurrent > 0
+
+    def estimated_wait(self):
+        """Seconds a request joining the queue now would wait, from the recent inference time"""
+        if self.service_time is None:
+            return 0.0
+        rounds = math.ceil((self.waiting + 1) / self.max_concurrent)
+        return rounds * self.service_time
+
+    def acquire(self):
+        """Take an inference slot, waiting at most the latency budget; raises Overloaded instead"""
+        with self._condition:
+            if self.active < self.max_concurrent and not self.waiting:
+                self.active += 1
+                self.admitted += 1
+                return
+            if self.waiting >= self.max_queue:
+                self.shed_queue_full += 1
+                raise Overloaded('queue_full', self.retry_after())
+            if self.latency_budget and self.estimated_wait() > self.latency_budget:
+                self.shed_latency_budget += 1
+                raise Overloaded('latency_budget', self.retry_after())
+
+            deadline = time.monotonic() + self.latency_budget if self.latency_budget else None
+            self.waiting += 1
+            try:
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic() if deadline is not None else None
+                    if remaining is not None and remaining <= 0:
+                        self.shed_latency_budget += 1
+                        raise Overloaded('latency_budget', self.retry_after())
+                    self._condition.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+
+    def admit_backlog(self, queued, calls_ahead):
+        """
+        Admit a request into a queue the caller manages: `queued` requests already wait
+        behind the inference in progress and `calls_ahead` inference calls must finish
+        before this one starts. Raises Overloaded on the same grounds as acquire()
+        """
+        with self._condition:
+            wait = calls_ahead * self.service_time if self.service_time is not None else 0.0
+            retry_after = max(1, math.ceil(wait))
+            if queued >= self.max_queue:
+                self.shed_queue_full += 1
+                raise Overloaded('queue_full', retry_after)
+            if self.latency_budget and wait > self.latency_budget:
+                self.shed_latency_budget += 1
+                raise Overloaded('latency_budget', retry_after)
+            self.admitted += 1
+
+    def observe(self, seconds):
+        """Fold one inference's duration into the running mean that predicts waits"""
+        if self.service_time is None:
+            self.service_time = seconds
+        else:
+            self.service_time += SERVICE_TIME_SMOOTHING * (seconds - self.service_time)
+
+    def release(self, seconds):
+        with self._condition:
+            self.active -= 1
+            self.observe(seconds)
+            self._condition.notify()
+
+    @contextmanager
+    def slot(self):
+        """Run the body holding an inference slot; a no-op when the limiter is disabled"""
+        if not self.enabled:
+            yield
+            return
+        self.acquire()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def retry_after(self):
+        # Whole seconds for the Retry-After header; the queue usually drains much sooner
+        return max(1, math.ceil(self.estimated_wait()))
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'max_concurrent': self.max_concurrent,
+            'max_queue': self.max_queue,
+            'latency_budget_ms': self.latency_budget * 1000,
+            'active': self.active,
+            'waiting': self.waiting,
+            'mean_inference_ms': round(self.service_time * 1000, 3) if self.service_time is not None else None,
+            'admitted': self.admitted,
+            'shed_queue_full': self.shed_queue_full,
+            'shed_latency_budget': self.shed_latency_budget,
+        }
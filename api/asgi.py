@@ -0,0 +1,371 @@
+"""
+ASGI serving mode for the House Sorting Hat API.
+
+Serves the same routes as the Flask app in main.py, sharing its model,
+validation and response helpers. Concurrent /predict requests are coalesced
+by a MicroBatcher: requests arriving within a few milliseconds of each other
+are stacked into one (N, 8) matrix and scored with a single model call, which
+keeps throughput up when a whole school year submits at once.
+
+The batcher's queue is bounded by the same admission settings as the Flask
+app (MAX_QUEUED_REQUESTS, LATENCY_BUDGET_MS): a request that would wait
+behind too many rows, or longer than the budget at the recent batch time, is
+answered 503 straight away.
+
+Run with any ASGI server, e.g.:
+    uvicorn asgi:app --host 0.0.0.0 --port 8000
+"""
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import numpy as np
+
+import main
+from admission import Overloaded
+from metrics import error_type
+
+# How long the first request of a batch waits for others to join, and the batch size that flushes early
+BATCH_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', 2))
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', 64))
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-allow-headers', b'Content-Type,Authorization'),
+    (b'access-control-allow-methods', b'GET,PUT,POST,DELETE,OPTIONS'),
+]
+
+
+class MicroBatcher:
+    """
+    Collects feature rows from concurrent requests and scores them together.
+
+    A batch is flushed when it reaches max_batch rows or when its oldest row
+    has waited max_wait seconds, whichever comes first. Model calls run on a
+    single worker thread so the event loop never blocks on the forest.
+
+    With a limiter, rows beyond one full batch count as queued requests, and
+    the wait is estimated as the batches already scheduled times the recent
+    batch time; over either limit submit() raises Overloaded.
+    """
+
+    def __init__(self, predict, max_wait=BATCH_MAX_WAIT_MS / 1000, max_batch=BATCH_MAX_SIZE, limiter=None):
+        self.predict = predict
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self.limiter = limiter
+        self._pending = []
+        self._timer = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='micro-batcher')
+        # Rows and batches handed to the worker thread and not yet scored
+        self.in_flight = 0
+        self.in_flight_batches = 0
+        self.batches = 0
+        self.rows = 0
+
+    def _admit(self):
+        if self.limiter is not None and self.limiter.enabled:
+            backlog = len(self._pending) + self.in_flight
+            self.limiter.admit_backlog(max(0, backlog - self.max_batch), self.in_flight_batches)
+
+    async def submit(self, features):
+        """Score one feature row; resolves to (predicted_house, prediction_proba)"""
+        self._admit()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((features, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self.in_flight += len(batch)
+            self.in_flight_batches += 1
+            asyncio.ensure_future(self._run(batch))
+
+    def _timed(self, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        if self.limiter is not None:
+            self.limiter.observe(time.perf_counter() - started)
+        return result
+
+    async def _run(self, batch):
+        loop = asyncio.get_running_loop()
+        features_array = np.array([features for features, _ in batch])
+        try:
+            predictions, prediction_proba = await loop.run_in_executor(
+                self._executor, self._timed, self.predict, features_array)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.in_flight -= len(batch)
+            self.in_flight_batches -= 1
+
+        self.batches += 1
+        self.rows += len(batch)
+        for row, (_, future) in enumerate(batch):
+            if not future.done():
+                future.set_result((predictions[row], prediction_proba[row]))
+
+    def stats(self):
+        return {
+            'max_wait_ms': self.max_wait * 1000,
+            'max_batch_size': self.max_batch,
+            'batches': self.batches,
+            'rows': self.rows,
+            'in_flight_rows': self.in_flight,
+            'queued_rows': len(self._pending),
+            'mean_batch_size': round(self.rows / self.batches, 2) if self.batches else 0.0
+        }
+
+    async def run_sync(self, func, *args):
+        """Run other model work (e.g. /predict/batch) on the same thread as the batches, admitted like a row"""
+        self._admit()
+        self.in_flight_batches += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._timed, func, *args)
+        finally:
+            self.in_flight_batches -= 1
+
+
+batcher = MicroBatcher(main.predict_with_proba, limiter=main.inference_limiter)
+
+
+async def read_json(receive):
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    if not body:
+        return None
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
+
+async def send_bytes(send, status, headers, body):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(name.lower().encode(), value.encode()) for name, value in headers.items()] + CORS_HEADERS,
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_json(send, payload, status=200, headers=None):
+    body = json.dumps(payload, sort_keys=True).encode('utf-8')
+    await send_bytes(send, status, dict(headers or {}, **{'Content-Type': 'application/json',
+                                                          'Content-Length': str(len(body))}), body)
+
+
+async def ensure_model():
+    """
+    The serving ModelVersion, loading the model first if this worker has not yet
+    (MODEL_LOADING=lazy). Loading runs on a thread so the event loop keeps serving
+    """
+    current = main.model_registry.current
+    if current is None:
+        current = await asyncio.get_running_loop().run_in_executor(None, main.load_model)
+    return current
+
+
+async def home(scope, receive):
+    return dict(main.health_payload(), serving_mode='asgi', micro_batching=batcher.stats()), 200
+
+
+async def get_stats(scope, receive):
+    if await ensure_model() is None:
+        return {'error': 'Model not loaded'}, 500
+    return main.house_stats.summary(), 200
+
+
+async def predict_house(scope, receive):
+    # Serialization happens in app(), so 'total' here stops at the payload
+    timer = main.metrics.timer()
+    main.metrics.count_request('/predict')
+    try:
+        if await ensure_model() is None:
+            main.metrics.count_error('/predict', 'exception')
+            return {'error': 'Model not loaded'}, 500
+
+        data = await read_json(receive)
+        timer.lap('parse')
+
+        error, features, trait_scores = main.validate_answers(data)
+        timer.lap('validate')
+        if error:
+            main.metrics.count_error('/predict', error_type(error))
+            return error, 400
+
+        explain = query_param(scope, 'explain') in ('1', 'true')
+        if explain:
+            # Scored and explained together on the batcher's thread, so both use the same model version
+            predictions, prediction_proba, explanation = await batcher.run_sync(
+                main.predict_and_explain, np.array(features).reshape(1, -1))
+            predicted_house, prediction_proba = predictions[0], prediction_proba[0]
+        else:
+            # Includes the time spent waiting for the micro-batch to fill
+            predicted_house, prediction_proba = await batcher.submit(features)
+        timer.lap('inference')
+
+        trusted = main.admin_authorized(request_header(scope, b'authorization'))
+        main.record_sorting(data, features, predicted_house, prediction_proba, trusted)
+
+        payload = main.prediction_payload(data, predicted_house, prediction_proba, trait_scores)
+        if explain:
+            payload['explanation'] = explanation
+        timer.finish()
+        return payload, 200
+
+    except Overloaded as e:
+        main.metrics.count_error('/predict', 'overloaded')
+        payload, headers = main.overloaded_payload(e)
+        return payload, 503, headers
+
+    except Exception as e:
+        main.metrics.count_error('/predict', 'exception')
+        return {'error': f'Prediction failed: {str(e)}'}, 500
+
+
+async def predict_house_batch(scope, receive):
+    main.metrics.count_request('/predict/batch')
+    try:
+        if await ensure_model() is None:
+            main.metrics.count_error('/predict/batch', 'exception')
+            return {'error': 'Model not loaded'}, 500
+
+        data = await read_json(receive)
+        trusted = main.admin_authorized(request_header(scope, b'authorization'))
+        payload, status = await batcher.run_sync(main.batch_payload, data, trusted)
+        if status != 200:
+            main.metrics.count_error('/predict/batch', 'invalid')
+        return payload, status
+
+    except Overloaded as e:
+        main.metrics.count_error('/predict/batch', 'overloaded')
+        payload, headers = main.overloaded_payload(e)
+        return payload, 503, headers
+
+    except Exception as e:
+        main.metrics.count_error('/predict/batch', 'exception')
+        return {'error': f'Batch prediction failed: {str(e)}'}, 500
+
+
+async def reload_model(scope, receive):
+    # With ?wait=1 the reload and smoke test run on a thread, not on the event loop
+    wait = query_param(scope, 'wait') in ('1', 'true')
+    authorization = request_header(scope, b'authorization')
+    return await asyncio.get_running_loop().run_in_executor(None, main.reload_payload, authorization, wait)
+
+
+ROUTES = {
+    ('GET', '/'): home,
+    ('GET', '/stats'): get_stats,
+    ('POST', '/predict'): predict_house,
+    ('POST', '/predict/batch'): predict_house_batch,
+    ('POST', '/admin/reload'): reload_model,
+}
+
+# Only the prediction endpoints are rate limited, as in the Flask app
+RATE_LIMITED_PATHS = ('/predict', '/predict/batch')
+
+# Pre-encoded payloads shared with the Flask app
+STATIC_ROUTES = {
+    '/questions': main.QUESTIONS_RESPONSE,
+    '/houses': main.HOUSES_RESPONSE,
+}
+
+
+def request_header(scope, name):
+    for key, value in scope.get('headers', ()):
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def query_param(scope, name):
+    values = parse_qs(scope.get('query_string', b'').decode('latin-1')).get(name)
+    return values[0] if values else None
+
+
+def rate_limit_key(scope):
+    header = main.RATE_LIMIT_CLIENT_HEADER
+    headers = {header: request_header(scope, header.lower().encode('latin-1'))} if header else {}
+    peer = scope.get('client')
+    return main.client_id(headers, peer[0] if peer else None)
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # Serve only once the model is in, as the Flask app does with eager loading
+                if main.MODEL_LOADING == 'eager':
+                    main.load_model()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    if scope['type'] != 'http':
+        return
+
+    method, path = scope['method'], scope['path']
+    if method == 'OPTIONS':
+        await send({'type': 'http.response.start', 'status': 204, 'headers': CORS_HEADERS})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    if method == 'GET' and path in STATIC_ROUTES:
+        status, headers, body = STATIC_ROUTES[path].respond(
+            request_header(scope, b'if-none-match'),
+            request_header(scope, b'accept-encoding')
+        )
+        await send_bytes(send, status, headers, body)
+        return
+
+    if method == 'GET' and path == '/metrics' and main.metrics.enabled:
+        body = main.metrics.render().encode('utf-8')
+        await send_bytes(send, 200, {'Content-Type': 'text/plain; version=0.0.4',
+                                     'Content-Length': str(len(body))}, body)
+        return
+
+    handler = ROUTES.get((method, path))
+    if handler is None:
+        allowed = path in STATIC_ROUTES or any(route_path == path for _, route_path in ROUTES)
+        status = 405 if allowed else 404
+        await send_json(send, {'error': 'Method not allowed' if allowed else 'Not found'}, status)
+        return
+
+    # Inference is serialized and bounded by the micro-batcher, so only the per-client rate applies here
+    if path in RATE_LIMITED_PATHS and main.rate_limiter.enabled:
+        retry_after = main.rate_limiter.check(rate_limit_key(scope))
+        if retry_after is not None:
+            main.metrics.count_request(path)
+            main.metrics.count_error(path, 'rate_limited')
+            payload, headers = main.rate_limited_payload(retry_after)
+            await send_json(send, payload, 429, headers)
+            return
+
+    # (payload, status) or (payload, status, headers)
+    await send_json(send, *await handler(scope, receive))
@@ -0,0 +1,566 @@
+"""
+Benchmarks for the /predict path and model inference.
+
+Run from the api directory:
+    python benchmark.py                                # every suite, results to benchmark_results.json
+    python benchmark.py --suites single batch endpoint --output before.json
+    python benchmark.py --output after.json --compare before.json
+
+Results are written as JSON together with the commit, library versions and
+CPU count they were measured on, so runs from two commits can be diffed with
+--compare.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+import main
+from compact_forest import CompactForest
+from dataset import load_dataset_features
+from explain import PathExplainer
+from inference import FlatForest
+from lookup_table import LookupTable
+from model_artifact import export_artifact
+from prediction_cache import PredictionCache
+
+# The model was fitted on a DataFrame; plain arrays trigger a feature-name warning per call
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+
+def time_per_call(func, rows, repeats=3):
+    """Median seconds per call of func(row) over every row, best of `repeats` passes"""
+    best = None
+    for _ in range(repeats):
+        timings = []
+        for row in rows:
+            start = time.perf_counter()
+            func(row)
+            timings.append(time.perf_counter() - start)
+        median = statistics.median(timings)
+        best = median if best is None else min(best, median)
+    return best
+
+
+def latency_stats(func, rows, repeats=3):
+    """p50/p99/mean milliseconds per call of func(row), over every row `repeats` times"""
+    for row in rows[:10]:
+        func(row)  # warm-up
+    timings = []
+    for _ in range(repeats):
+        for row in rows:
+            start = time.perf_counter()
+            func(row)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        'p50_ms': timings[len(timings) // 2] * 1000,
+        'p99_ms': timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000,
+        'mean_ms': statistics.fmean(timings) * 1000,
+        'calls': len(timings),
+    }
+
+
+def bench_single_row(n_rows=500):
+    """Single-row predict_proba latency of the sklearn model and the engine /predict uses"""
+    rows = [row.reshape(1, -1) for row in load_dataset_features()[:n_rows]]
+
+    print("=" * 60)
+    print("🎯 SINGLE-ROW predict_proba")
+    print("=" * 60)
+    results = {}
+    engines = [('engine', main.engine)]
+    if main.model is not None:
+        engines.insert(0, ('sklearn', main.model))
+    for name, engine in engines:
+        results[name] = latency_stats(engine.predict_proba, rows)
+        print(f"   {name:8s} p50: {results[name]['p50_ms']:.3f} ms   p99: {results[name]['p99_ms']:.3f} ms")
+    results['engine_name'] = main.model_registry.current.engine_name
+    return results
+
+
+def bench_batch_throughput(batch_sizes=(1, 10, 100, 1000, 10000)):
+    """predict_proba rows/s of the serving engine for batches of house_sorting.csv rows"""
+    features = load_dataset_features()
+
+    print("=" * 60)
+    print(f"📊 BATCH THROUGHPUT ({main.model_registry.current.engine_name} engine)")
+    print("=" * 60)
+    results = {}
+    for batch_size in batch_sizes:
+        batch = np.resize(features, (batch_size, features.shape[1]))
+        # Enough repeats that small batches are timed over a few hundred rows
+        batch_s = time_per_call(main.engine.predict_proba, [batch] * max(1, 1000 // batch_size))
+        results[str(batch_size)] = {'rows_per_s': batch_size / batch_s, 'ms_per_batch': batch_s * 1000}
+        print(f"   batch of {batch_size:6d}: {batch_size / batch_s:12,.0f} rows/s   {batch_s * 1000:8.3f} ms/batch")
+    return results
+
+
+def bench_endpoint(n_requests=500):
+    """End-to-end POST /predict through Flask's test client (no network), with and without the cache"""
+    client = main.app.test_client()
+    rng = np.random.default_rng(0)
+    questionnaires = [
+        {f"q{i + 1}": int(value) for i, value in enumerate(answers)}
+        for answers in rng.integers(0, 11, size=(n_requests, 24))
+    ]
+
+    def post(data):
+        response = client.post('/predict', json=data)
+        assert response.status_code == 200, response.data
+
+    print("=" * 60)
+    print("🌐 END-TO-END /predict (Flask test client)")
+    print("=" * 60)
+    saved_cache = main.prediction_cache
+    try:
+        # Distinct questionnaires with the cache off measure the full path every time
+        main.prediction_cache = PredictionCache(0)
+        uncached = latency_stats(post, questionnaires, repeats=1)
+    finally:
+        main.prediction_cache = saved_cache
+    repeated = latency_stats(post, questionnaires[:1] * n_requests, repeats=1)
+
+    results = {'uncached': uncached, 'repeated_questionnaire': repeated}
+    for name, r in results.items():
+        print(f"   {name:22s} p50: {r['p50_ms']:.3f} ms   p99: {r['p99_ms']:.3f} ms   "
+              f"{1000 / r['mean_ms']:,.0f} req/s")
+    return results
+
+
+def bench_predict_paths(n_rows=200):
+    """Per-request latency of predict()+predict_proba() versus a single predict_proba() pass"""
+    rows = [row.reshape(1, -1) for row in load_dataset_features()[:n_rows]]
+
+    def two_pass(features_array):
+        main.model.predict(features_array)
+        main.model.predict_proba(features_array)
+
+    def single_pass(features_array):
+        main.model.predict_proba(features_array)
+
+    two_pass_s = time_per_call(two_pass, rows)
+    single_pass_s = time_per_call(single_pass, rows)
+
+    print("=" * 60)
+    print("🔮 PER-REQUEST INFERENCE (1x8 row)")
+    print("=" * 60)
+    print(f"   predict + predict_proba: {two_pass_s * 1000:.3f} ms")
+    print(f"   single predict_proba:    {single_pass_s * 1000:.3f} ms")
+    print(f"   saving per request:      {(two_pass_s - single_pass_s) * 1000:.3f} ms "
+          f"({(1 - single_pass_s / two_pass_s) * 100:.1f}%)")
+    return {'two_pass_ms': two_pass_s * 1000, 'single_pass_ms': single_pass_s * 1000}
+
+
+def bench_engines(n_rows=200, batch_size=1000):
+    """Single-row latency and batch throughput of the sklearn model, FlatForest, CompactForest and LookupTable"""
+    features = load_dataset_features()
+    rows = [row.reshape(1, -1) for row in features[:n_rows]]
+    batch = np.resize(features, (batch_size, features.shape[1]))
+    forest = FlatForest.from_sklearn(main.model)
+    compact = CompactForest.from_flat(forest)
+    table = LookupTable.build(main.model, fallback=forest)
+
+    print("=" * 60)
+    print("⚙️ INFERENCE ENGINES")
+    print("=" * 60)
+    results = {}
+    for name, engine in (('sklearn', main.model), ('flat', forest), ('compact', compact), ('lookup', table)):
+        single_s = time_per_call(engine.predict_proba, rows)
+        batch_s = time_per_call(engine.predict_proba, [batch])
+        results[name] = {'single_row_ms': single_s * 1000, 'batch_rows_per_s': batch_size / batch_s}
+        print(f"   {name:8s} single row: {single_s * 1000:.3f} ms   "
+              f"batch of {batch_size}: {batch_size / batch_s:,.0f} rows/s")
+    return results
+
+
+def bench_explanations(n_rows=200, batch_size=1000):
+    """Cost of an explanation (precomputed path contributions) against a plain prediction, and of a cached one"""
+    features = load_dataset_features()
+    rows = [row.reshape(1, -1) for row in features[:n_rows]]
+    batch = np.resize(features, (batch_size, features.shape[1]))
+    forest = FlatForest.from_sklearn(main.model)
+
+    start = time.perf_counter()
+    explainer = PathExplainer.from_flat(forest)
+    build_s = time.perf_counter() - start
+
+    predict_s = time_per_call(forest.predict_proba, rows)
+    explain_s = time_per_call(explainer.explain, rows)
+    batch_predict_s = time_per_call(forest.predict_proba, [batch])
+    batch_explain_s = time_per_call(explainer.explain, [batch])
+
+    # The endpoint's payload path: first call computes and caches, the repeats are cache hits
+    original_cache = main.explanation_cache
+    main.explanation_cache = PredictionCache(0)
+    uncached_s = time_per_call(main.explain_features, rows)
+    main.explanation_cache = PredictionCache(len(rows))
+    for row in rows:
+        main.explain_features(row)
+    cached_s = time_per_call(main.explain_features, rows)
+    main.explanation_cache = original_cache
+
+    print("=" * 60)
+    print("🔍 EXPLANATIONS (tree-path contributions)")
+    print("=" * 60)
+    print(f"   precompute per-leaf contributions: {build_s * 1000:.1f} ms, {explainer.nbytes / 1024:.0f} KiB")
+    print(f"   single row: predict {predict_s * 1000:.3f} ms   explain {explain_s * 1000:.3f} ms "
+          f"(x{explain_s / predict_s:.2f})")
+    print(f"   batch of {batch_size}: predict {batch_size / batch_predict_s:,.0f} rows/s   "
+          f"explain {batch_size / batch_explain_s:,.0f} rows/s")
+    print(f"   payload: uncached {uncached_s * 1000:.3f} ms   cached {cached_s * 1000:.3f} ms")
+    return {
+        'build_ms': build_s * 1000,
+        'nbytes': explainer.nbytes,
+        'predict_ms': predict_s * 1000,
+        'explain_ms': explain_s * 1000,
+        'batch_predict_rows_per_s': batch_size / batch_predict_s,
+        'batch_explain_rows_per_s': batch_size / batch_explain_s,
+        'payload_uncached_ms': uncached_s * 1000,
+        'payload_cached_ms': cached_s * 1000,
+    }
+
+
+def bench_validation(n_rows=2000, batch_size=500):
+    """Per-request validation + trait averaging: the old per-question loop versus the precompiled schema"""
+    from features import validate_answers, validate_many
+    from legacy_validation import legacy_validate_answers
+
+    rng = np.random.default_rng(0)
+    questionnaires = [
+        {f"q{i + 1}": int(value) for i, value in enumerate(answers)}
+        for answers in rng.integers(0, 11, size=(n_rows, 24))
+    ]
+    batch = questionnaires[:batch_size]
+
+    legacy_s = time_per_call(legacy_validate_answers, questionnaires)
+    schema_s = time_per_call(validate_answers, questionnaires)
+    legacy_batch_s = time_per_call(lambda rows: [legacy_validate_answers(row) for row in rows], [batch])
+    schema_batch_s = time_per_call(validate_many, [batch])
+
+    print("=" * 60)
+    print("🧾 REQUEST VALIDATION + TRAIT AVERAGING")
+    print("=" * 60)
+    print(f"   single request   loop: {legacy_s * 1e6:7.1f} us   schema: {schema_s * 1e6:7.1f} us")
+    print(f"   batch of {batch_size}   loop: {legacy_batch_s * 1e3:7.2f} ms   schema: {schema_batch_s * 1e3:7.2f} ms "
+          f"({legacy_batch_s / schema_batch_s:.1f}x)")
+    return {
+        'single_loop_us': legacy_s * 1e6, 'single_schema_us': schema_s * 1e6,
+        'batch_loop_ms': legacy_batch_s * 1e3, 'batch_schema_ms': schema_batch_s * 1e3,
+    }
+
+
+# Runs in a fresh interpreter so import and load costs are not hidden by this process
+_LOAD_PROBE = """
+import json, sys, time, warnings
+warnings.simplefilter("ignore")
+start = time.perf_counter()
+import numpy as np
+import model_artifact
+if sys.argv[1] == "pickle":
+    forest = model_artifact.load_pickle(sys.argv[2])
+else:
+    forest = model_artifact.load_artifact(sys.argv[2])
+loaded = time.perf_counter() - start
+forest.predict_proba(np.full((1, 8), 5.0))
+status = dict(line.split(":", 1) for line in open("/proc/self/status") if line.startswith(("Rss", "VmHWM")))
+print(json.dumps({
+    "load_s": loaded,
+    "rss_anon_kib": int(status["RssAnon"].split()[0]),
+    "rss_file_kib": int(status["RssFile"].split()[0]),
+    "peak_rss_kib": int(status["VmHWM"].split()[0]),
+    "sklearn_imported": "sklearn" in sys.modules,
+}))
+"""
+
+
+def bench_model_loading():
+    """Cold-start time and per-process RSS of the pickle path versus the mmap artifact"""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        artifact_path = os.path.join(tmp, "model.forest")
+        export_artifact(FlatForest.from_sklearn(main.model), artifact_path)
+
+        print("=" * 60)
+        print("📦 MODEL LOADING (fresh process each)")
+        print("=" * 60)
+        for fmt, path in (('pickle', main.MODEL_PATH), ('artifact', artifact_path)):
+            output = subprocess.run(
+                [sys.executable, "-c", _LOAD_PROBE, fmt, path],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                capture_output=True, text=True, check=True,
+            ).stdout
+            results[fmt] = json.loads(output.strip().splitlines()[-1])
+            r = results[fmt]
+            # RssAnon is private to each worker; RssFile pages come from the shared page cache
+            print(f"   {fmt:8s} load: {r['load_s'] * 1000:7.1f} ms   private RSS: {r['rss_anon_kib'] / 1024:6.1f} MiB   "
+                  f"shared file RSS: {r['rss_file_kib'] / 1024:6.1f} MiB   peak RSS: {r['peak_rss_kib'] / 1024:6.1f} MiB   "
+                  f"sklearn imported: {r['sklearn_imported']}")
+    return results
+
+
+# Times `import main`, app creation and the first /predict in a fresh interpreter
+_STARTUP_PROBE = """
+import json, sys, time, warnings
+warnings.simplefilter("ignore")
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+app = main.app
+created = time.perf_counter()
+response = app.test_client().post("/predict", json={f"q{i}": 5 for i in range(1, 25)})
+assert response.status_code == 200, response.data
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "first_request_ms": (time.perf_counter() - created) * 1000,
+    "sklearn_imported": "sklearn" in sys.modules,
+}))
+"""
+
+
+def import_times(module):
+    """Cumulative microseconds of `module` and each of its direct imports, from python -X importtime"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True,
+    ).stderr
+    total, direct = None, {}
+    # Lines are "import time: self | cumulative | name", with the name indented two spaces per nesting level
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        if name.strip() == module and depth == 0:
+            total = int(cumulative)
+        elif depth == 1:
+            # Direct imports are printed before the module itself
+            direct[name.strip()] = int(cumulative)
+    return total, direct
+
+
+def bench_startup(repeats=3):
+    """Import time of main (python -X importtime) and cold start per MODEL_LOADING / MODEL_FORMAT"""
+    print("=" * 60)
+    print("🚀 STARTUP (fresh process each)")
+    print("=" * 60)
+    total, direct = min((import_times("main") for _ in range(repeats)), key=lambda result: result[0])
+    results = {'import_main_ms': total / 1000}
+    print(f"   import main: {total / 1000:.1f} ms; slowest direct imports:")
+    for name, cumulative in sorted(direct.items(), key=lambda item: -item[1])[:6]:
+        print(f"      {name:20s} {cumulative / 1000:7.1f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        artifact_path = os.path.join(tmp, "model.forest")
+        export_artifact(FlatForest.from_sklearn(main.model), artifact_path)
+        configs = (
+            ('eager_pickle', {'MODEL_LOADING': 'eager', 'MODEL_FORMAT': 'pickle'}),
+            ('lazy_pickle', {'MODEL_LOADING': 'lazy', 'MODEL_FORMAT': 'pickle'}),
+            ('eager_artifact', {'MODEL_LOADING': 'eager', 'MODEL_FORMAT': 'artifact',
+                                'MODEL_ARTIFACT_PATH': artifact_path}),
+        )
+        for name, env in configs:
+            runs = []
+            for _ in range(repeats):
+                output = subprocess.run(
+                    [sys.executable, "-c", _STARTUP_PROBE],
+                    cwd=os.path.dirname(os.path.abspath(__file__)),
+                    env=dict(os.environ, MODEL_WATCH_INTERVAL='0', **env),
+                    capture_output=True, text=True, check=True,
+                ).stdout
+                runs.append(json.loads(output.strip().splitlines()[-1]))
+            r = min(runs, key=lambda run: run['import_ms'] + run['create_app_ms'] + run['first_request_ms'])
+            results[name] = r
+            print(f"   {name:15s} import: {r['import_ms']:6.1f} ms   create app: {r['create_app_ms']:6.1f} ms   "
+                  f"first request: {r['first_request_ms']:6.1f} ms   sklearn imported: {r['sklearn_imported']}")
+    return results
+
+
+def bench_parallel_scoring(n_rows=200000, chunk_size=10000, max_workers=None):
+    """Bulk-scoring throughput of score.py for 1..N worker processes on the same synthetic file"""
+    import score
+
+    max_workers = max_workers or os.cpu_count() or 1
+    rng = np.random.default_rng(0)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, "answers.jsonl")
+        with open(input_path, "w") as f:
+            for answers in rng.integers(0, 11, size=(n_rows, 24)):
+                f.write(json.dumps({f"q{i + 1}": int(value) for i, value in enumerate(answers)}))
+                f.write("\n")
+
+        print("=" * 60)
+        print(f"🧮 PARALLEL BULK SCORING ({n_rows:,} rows, {os.cpu_count()} CPUs)")
+        print("=" * 60)
+        for workers in range(1, max_workers + 1):
+            scorer = score.ParallelScorer(workers) if workers > 1 else score.score_chunks
+            summary = score.score_file(
+                input_path, os.path.join(tmp, "predictions.csv"),
+                chunk_size=chunk_size, score=scorer, progress=False
+            )
+            results[str(workers)] = summary['rows_per_s']
+            print(f"   {workers:2d} worker(s): {summary['rows_per_s']:10,.0f} rows/s   "
+                  f"speed-up x{summary['rows_per_s'] / results['1']:.2f}")
+    return results
+
+
+# Loads a dataset through train.load_dataset in a fresh interpreter, so peak RSS is this load's alone
+_DATASET_PROBE = """
+import json, sys, time
+import train
+status = lambda: dict(line.split(":", 1) for line in open("/proc/self/status") if line.startswith(("VmRSS", "VmHWM")))
+before = int(status()["VmRSS"].split()[0])
+start = time.perf_counter()
+X, y = train.load_dataset(sys.argv[1])
+loaded = time.perf_counter() - start
+after = status()
+print(json.dumps({
+    "load_s": loaded,
+    "rows": len(X),
+    "rss_growth_kib": int(after["VmRSS"].split()[0]) - before,
+    "peak_growth_kib": int(after["VmHWM"].split()[0]) - before,
+}))
+"""
+
+
+def bench_dataset_storage(n_rows=1000000):
+    """Load time and memory of train.load_dataset on a CSV versus its columnar copy"""
+    import columnar
+    import pandas as pd
+
+    source = pd.read_csv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "house_sorting.csv"))
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "history.csv")
+        source.sample(n=n_rows, replace=True, random_state=0).to_csv(csv_path, index=False)
+        cols_path = os.path.join(tmp, "history.cols")
+        start = time.perf_counter()
+        columnar.convert_csv(csv_path, cols_path)
+        convert_s = time.perf_counter() - start
+
+        print("=" * 60)
+        print(f"🗄️ DATASET STORAGE ({n_rows:,} rows, fresh process each)")
+        print("=" * 60)
+        for fmt, path, size in (('csv', csv_path, os.path.getsize(csv_path)),
+                                ('columnar', cols_path, columnar.dataset_nbytes(cols_path))):
+            output = subprocess.run(
+                [sys.executable, "-c", _DATASET_PROBE, path],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                capture_output=True, text=True, check=True,
+            ).stdout
+            r = results[fmt] = dict(json.loads(output.strip().splitlines()[-1]), disk_kib=size // 1024)
+            print(f"   {fmt:8s} load: {r['load_s'] * 1000:8.1f} ms   peak memory growth: {r['peak_growth_kib'] / 1024:7.1f} MiB   "
+                  f"on disk: {r['disk_kib'] / 1024:6.1f} MiB")
+        results['convert_s'] = convert_s
+        print(f"   conversion took {convert_s:.1f}s, load is x{results['csv']['load_s'] / results['columnar']['load_s']:.0f} faster")
+    return results
+
+
+SUITES = {
+    'single': bench_single_row,
+    'batch': bench_batch_throughput,
+    'endpoint': bench_endpoint,
+    'loading': bench_model_loading,
+    'predict_paths': bench_predict_paths,
+    'validation': bench_validation,
+    'engines': bench_engines,
+    'explanations': bench_explanations,
+    'parallel': bench_parallel_scoring,
+    'storage': bench_dataset_storage,
+    'startup': bench_startup,
+}
+
+
+def environment_info():
+    """What the numbers were measured on; comparisons across different machines mean little"""
+    import sklearn
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'inference_engine': main.model_registry.current.engine_name,
+        'model_format': main.MODEL_FORMAT,
+    }
+
+
+def flatten(results, prefix=''):
+    """{'a.b.c': number} for every numeric leaf of a nested results dict"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline, current, threshold=0.10):
+    """Print every metric that moved by more than `threshold` between two result files"""
+    before = flatten(baseline['results'])
+    after = flatten(current['results'])
+
+    print("=" * 60)
+    print(f"🔍 COMPARED WITH {baseline['environment'].get('commit')} (changes over {threshold:.0%})")
+    print("=" * 60)
+    changed = 0
+    for name in sorted(before.keys() & after.keys()):
+        if before[name] == 0:
+            continue
+        ratio = after[name] / before[name]
+        if abs(ratio - 1) > threshold:
+            changed += 1
+            print(f"   {name:55s} {before[name]:12.4g} -> {after[name]:12.4g}  (x{ratio:.2f})")
+    if not changed:
+        print("   no metric moved by more than the threshold")
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the /predict path and model inference')
+    parser.add_argument('--suites', nargs='+', choices=list(SUITES), default=list(SUITES),
+                        help='Suites to run (default: all)')
+    parser.add_argument('--output', default='benchmark_results.json', help='Where to write the JSON results')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    args = parser.parse_args(argv)
+
+    # Importing main no longer loads the model, and every suite (and environment_info) needs it
+    if main.load_model() is None:
+        print("❌ Model not loaded")
+        return 1
+
+    results = {name: SUITES[name]() for name in args.suites}
+    report = {'environment': environment_info(), 'results': results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"✅ Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,285 @@
+"""
+Compact columnar storage for the training set and the submission history.
+
+A dataset is a directory:
+
+    meta.json                 columns, categories, trait scale, chunk list
+    traits-00000.npy          (rows, 8) uint8, FEATURE_NAMES order
+    house-00000.npy           uint8 category codes
+    blood_status-00000.npy    ...
+
+Traits are stored as uint8 `code`, with the value being `code / scale`:
+scale 1 for the 0-10 integer columns of house_sorting.csv, scale 3 for the
+submission history, whose trait averages are sums of three 0-10 answers over
+three. Text columns hold uint8 codes into the category list in meta.json
+(MISSING_CODE for no value), so "Gryffindor" is stored once rather than on
+every row. Each chunk holds up to `chunk_rows` rows; chunks are appended and
+never rewritten, and every chunk file is a plain .npy that np.load maps
+read-only with mmap_mode='r'.
+
+Converters, from the api directory:
+    python columnar.py from-csv ../house_sorting.csv ../house_sorting.cols [--append | --overwrite]
+    python columnar.py from-log ../submissions.jsonl ../history.cols     # appends only new log lines
+    python columnar.py info ../house_sorting.cols
+"""
+import json
+import os
+import sys
+
+import numpy as np
+
+from features import FEATURE_NAMES, QUESTIONS_PER_TRAIT
+
+FORMAT_VERSION = 1
+DEFAULT_CHUNK_ROWS = 1 << 16
+MISSING_CODE = 255
+TRAITS = 'traits'
+META_FILE = 'meta.json'
+
+
+def column_file(name, chunk):
+    return f"{name.lower().replace(' ', '_')}-{chunk:05d}.npy"
+
+
+class ColumnarDataset:
+    """Read side: memory-maps chunk files on demand"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar format version {self.meta.get('version')}")
+        self.scale = self.meta['scale']
+        self.categories = self.meta['categories']
+
+    def __len__(self):
+        return sum(chunk['rows'] for chunk in self.meta['chunks'])
+
+    @property
+    def columns(self):
+        return [TRAITS] + list(self.categories)
+
+    def chunk_column(self, name, chunk):
+        return np.load(os.path.join(self.path, column_file(name, chunk)), mmap_mode='r')
+
+    def column(self, name):
+        """The whole column: the mapped file itself for a single chunk, one concatenation otherwise"""
+        chunks = [self.chunk_column(name, i) for i in range(len(self.meta['chunks']))]
+        if len(chunks) == 1:
+            return chunks[0]
+        if not chunks:
+            return np.empty((0, len(FEATURE_NAMES)) if name == TRAITS else 0, dtype=np.uint8)
+        return np.concatenate(chunks)
+
+    def iter_chunks(self, names=None):
+        """{column: mapped array} per chunk, for streaming over history larger than memory"""
+        names = names or self.columns
+        for i in range(len(self.meta['chunks'])):
+            yield {name: self.chunk_column(name, i) for name in names}
+
+    def trait_codes(self):
+        return self.column(TRAITS)
+
+    def features(self, dtype=np.float64):
+        """Trait values as floats; with scale 1 this is a plain widening of the uint8 codes"""
+        codes = self.trait_codes()
+        if self.scale == 1:
+            return codes.astype(dtype)
+        return codes / np.array(self.scale, dtype=dtype)
+
+    def labels(self, name):
+        """Decoded text column as an object array (None where missing)"""
+        return decode(self.column(name), self.categories[name])
+
+
+def decode(codes, categories):
+    lookup = np.array(list(categories) + [None] * (MISSING_CODE + 1 - len(categories)), dtype=object)
+    return lookup.take(codes)
+
+
+class ColumnarWriter:
+    """
+    Appends chunks to a new or existing dataset. Category lists only grow, so
+    codes already written keep their meaning. meta.json is replaced atomically
+    after the chunk files are on disk, so readers never see a half-written chunk
+    """
+
+    def __init__(self, path, categorical=(), scale=1, chunk_rows=DEFAULT_CHUNK_ROWS):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+            if self.meta['scale'] != scale:
+                raise ValueError(f"{path} stores traits with scale {self.meta['scale']}, not {scale}")
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.meta = {
+                'version': FORMAT_VERSION,
+                'feature_names': FEATURE_NAMES,
+                'scale': scale,
+                'categories': {name: [] for name in categorical},
+                'chunks': [],
+            }
+
+    def encode(self, name, values):
+        categories = self.meta['categories'][name]
+        index = {category: code for code, category in enumerate(categories)}
+        codes = np.empty(len(values), dtype=np.uint8)
+        for i, value in enumerate(values):
+            if value is None or value != value:  # None or NaN
+                codes[i] = MISSING_CODE
+                continue
+            code = index.get(value)
+            if code is None:
+                if len(categories) >= MISSING_CODE:
+                    raise ValueError(f"Too many categories in column {name}")
+                code = index[value] = len(categories)
+                categories.append(value)
+            codes[i] = code
+        return codes
+
+    def append(self, trait_codes, columns):
+        """Write rows: (N, 8) uint8 trait codes and {categorical column: N values}"""
+        trait_codes = np.ascontiguousarray(trait_codes, dtype=np.uint8)
+        encoded = {name: self.encode(name, values) for name, values in columns.items()}
+        for start in range(0, len(trait_codes), self.chunk_rows):
+            stop = start + self.chunk_rows
+            chunk = len(self.meta['chunks'])
+            np.save(os.path.join(self.path, column_file(TRAITS, chunk)), trait_codes[start:stop])
+            for name in self.meta['categories']:
+                codes = encoded.get(name)
+                codes = codes[start:stop] if codes is not None else np.full(len(trait_codes[start:stop]), MISSING_CODE, np.uint8)
+                np.save(os.path.join(self.path, column_file(name, chunk)), codes)
+            self.meta['chunks'].append({'rows': len(trait_codes[start:stop])})
+
+    def commit(self, **extra):
+        self.meta.update(extra)
+        tmp_path = os.path.join(self.path, META_FILE + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.path, META_FILE))
+
+
+def to_codes(values, scale):
+    """uint8 codes for trait values, or None if any is off the 1/scale grid or outside 0-10"""
+    codes = np.rint(np.asarray(values, dtype=np.float64) * scale)
+    if not np.allclose(codes / scale, values, rtol=0, atol=1e-9) or codes.min() < 0 or codes.max() > 10 * scale:
+        return None
+    return codes.astype(np.uint8)
+
+
+def remove_dataset(path):
+    """Delete a dataset's meta.json and chunk files, leaving anything else in the directory"""
+    meta_path = os.path.join(path, META_FILE)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    for name in os.listdir(path):
+        if name.endswith('.npy'):
+            os.remove(os.path.join(path, name))
+
+
+def convert_csv(csv_path, out_path, chunk_rows=DEFAULT_CHUNK_ROWS, append=False, overwrite=False):
+    """
+    house_sorting.csv-style file (integer traits, House, Blood Status) -> columnar dataset.
+    Refuses a dataset that already has rows, since converting the same CSV twice would
+    duplicate every row (and leak copies across train/test splits), unless `append`
+    adds to it or `overwrite` replaces it
+    """
+    import pandas as pd
+
+    if os.path.exists(os.path.join(out_path, META_FILE)):
+        if overwrite:
+            remove_dataset(out_path)
+        elif not append:
+            existing = len(ColumnarDataset(out_path))
+            if existing:
+                raise FileExistsError(f"{out_path} already holds {existing:,} rows; "
+                                      f"use --append to add to it or --overwrite to replace it")
+
+    writer = ColumnarWriter(out_path, categorical=('House', 'Blood Status'), scale=1, chunk_rows=chunk_rows)
+    rows = 0
+    for df in pd.read_csv(csv_path, chunksize=chunk_rows):
+        codes = to_codes(df[FEATURE_NAMES].to_numpy(dtype=np.float64), 1)
+        if codes is None:
+            raise ValueError(f"{csv_path} has trait values that are not integers from 0 to 10")
+        writer.append(codes, {
+            name: df[name].tolist() if name in df else [None] * len(df)
+            for name in ('House', 'Blood Status')
+        })
+        rows += len(df)
+    writer.commit(source=os.path.basename(csv_path))
+    return rows
+
+
+def convert_log(log_path, out_path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Append the submission-log lines not converted yet (tracked by byte offset in
+    meta.json) to a history dataset. Returns (rows appended, rows skipped)
+    """
+    writer = ColumnarWriter(out_path, categorical=('House', 'Predicted House', 'Label'),
+                            scale=QUESTIONS_PER_TRAIT, chunk_rows=chunk_rows)
+    offset = writer.meta.get('log_offset', 0)
+    with open(log_path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b'\n') + 1
+
+    appended = skipped = 0
+    batch = ([], [], [], [])
+    for line in data[:end].splitlines():
+        try:
+            entry = json.loads(line)
+            codes = to_codes(entry['features'], QUESTIONS_PER_TRAIT)
+        except (ValueError, KeyError, TypeError):
+            codes = None
+        if codes is None or len(codes) != len(FEATURE_NAMES):
+            # e.g. fractional answers, whose averages are not multiples of 1/3
+            skipped += 1
+            continue
+        label = entry.get('label')
+        batch[0].append(codes)
+        batch[1].append(label if label is not None else entry.get('predicted_house'))
+        batch[2].append(entry.get('predicted_house'))
+        batch[3].append(label)
+        appended += 1
+
+    if appended:
+        writer.append(np.vstack(batch[0]), {'House': batch[1], 'Predicted House': batch[2], 'Label': batch[3]})
+    writer.commit(log_offset=offset + end, source=os.path.basename(log_path))
+    return appended, skipped
+
+
+def dataset_nbytes(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else None
+    if command == 'from-csv' and len(argv) in (4, 5) and argv[4:] in ([], ['--append'], ['--overwrite']):
+        try:
+            rows = convert_csv(argv[2], argv[3], append='--append' in argv, overwrite='--overwrite' in argv)
+        except FileExistsError as e:
+            print(f"❌ {e}")
+            return 1
+        print(f"✅ {rows:,} rows written to {argv[3]} ({dataset_nbytes(argv[3]) / 1024:.0f} KiB, "
+              f"CSV was {os.path.getsize(argv[2]) / 1024:.0f} KiB)")
+    elif command == 'from-log' and len(argv) == 4:
+        appended, skipped = convert_log(argv[2], argv[3])
+        print(f"✅ {appended:,} rows appended to {argv[3]} ({skipped:,} skipped)")
+    elif command == 'info' and len(argv) == 3:
+        dataset = ColumnarDataset(argv[2])
+        print(f"   rows: {len(dataset):,} in {len(dataset.meta['chunks'])} chunk(s), trait scale {dataset.scale}")
+        for name, categories in dataset.categories.items():
+            print(f"   {name}: {', '.join(map(str, categories))}")
+        print(f"   size on disk: {dataset_nbytes(argv[2]) / 1024:.0f} KiB")
+    else:
+        print("Usage: python columnar.py [from-csv CSV OUT [--append | --overwrite] | from-log LOG OUT | info PATH]")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
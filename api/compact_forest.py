@@ -0,0 +1,226 @@
+"""
+Compact, quantized forest for low-memory serving.
+
+Every trait is a mean of 0-10 answers and the training data holds integers,
+so every split threshold sklearn learned is a multiple of 0.5. Stored as the
+uint8 code 2 * threshold, and compared against 2 * x (exact in float32), the
+splits decide exactly as the float64 thresholds do. The rest of the node
+layout shrinks the same way:
+
+- feature index: uint8
+- children: per-tree local indices, uint8 when every tree has at most 256 nodes
+- leaf class probabilities: uint16 fixed point (p * 65535), stored for leaves only,
+  reached through a per-node leaf row index
+
+That is about 6 bytes per node plus 8 per leaf, against 64 per node for the
+float64/intp FlatForest. Probabilities differ from the original forest by at
+most half a fixed-point step per tree; `python compact_forest.py report`
+prints the size reduction and the measured parity.
+
+    python compact_forest.py report [model.pkl]
+    python compact_forest.py export [model.pkl] [model.compact.forest]
+"""
+import os
+import sys
+
+import numpy as np
+
+from inference import FlatForest
+
+# Split thresholds are stored as round(threshold * THRESHOLD_SCALE)
+THRESHOLD_SCALE = 2
+# Leaves point back at themselves, so the threshold they are compared to never matters
+LEAF_THRESHOLD = np.iinfo(np.uint8).max
+VALUE_SCALE = np.iinfo(np.uint16).max
+
+DEFAULT_COMPACT_PATH = os.path.join(os.path.dirname(__file__), "..", "house_sorting_model.compact.forest")
+
+
+class ThresholdGridError(ValueError):
+    """A split threshold is not on the half-point trait grid, so it cannot be quantized exactly"""
+
+
+def index_dtype(count):
+    """Smallest unsigned dtype that can index `count` items"""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if count <= np.iinfo(dtype).max + 1:
+            return dtype
+    return np.uint64
+
+
+class CompactForest:
+    """
+    A random forest as small fixed-width node arrays; the same traversal as
+    FlatForest (fixed depth, self-looping leaves) on quantized values
+    """
+
+    __slots__ = ('feature', 'threshold', 'children', 'roots', 'leaf_row', 'leaf_value',
+                 'max_depth', 'classes_', 'n_features_in_', 'source_sha256')
+
+    ARRAY_NAMES = ('feature', 'threshold', 'children', 'roots', 'leaf_row', 'leaf_value')
+    # Written to the artifact header, so load_artifact knows which class to build
+    ARTIFACT_KIND = 'compact'
+    # Largest difference from the original forest's probabilities: half a fixed-point step
+    proba_tolerance = 0.5 / VALUE_SCALE + 1e-12
+
+    def __init__(self, feature, threshold, children, roots, leaf_row, leaf_value, max_depth, classes,
+                 n_features_in=None):
+        self.feature = feature
+        self.threshold = threshold
+        # children[2 * node + went_left] is the next node's index within its own tree
+        self.children = children
+        self.roots = roots
+        self.leaf_row = leaf_row
+        self.leaf_value = leaf_value
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.n_features_in_ = n_features_in
+        self.source_sha256 = None
+
+    @classmethod
+    def from_flat(cls, forest):
+        """Quantize a FlatForest; raises ThresholdGridError if a threshold is off the grid"""
+        is_leaf = ~np.isfinite(forest.threshold)
+        codes = forest.threshold[~is_leaf] * THRESHOLD_SCALE
+        if not (np.array_equal(codes, np.round(codes)) and codes.min(initial=0) >= 0
+                and codes.max(initial=0) < LEAF_THRESHOLD):
+            raise ThresholdGridError(f"split thresholds are not multiples of {1 / THRESHOLD_SCALE}")
+        if forest.n_features_in_ > np.iinfo(np.uint8).max + 1:
+            raise ValueError("too many features for uint8 feature indices")
+
+        threshold = np.full(forest.node_count, LEAF_THRESHOLD, dtype=np.uint8)
+        threshold[~is_leaf] = codes
+
+        # Each node's tree root, so children can be stored relative to it
+        tree_sizes = np.diff(np.append(forest.roots, forest.node_count))
+        node_root = np.repeat(forest.roots, tree_sizes)
+        local_children = forest.children - np.repeat(node_root, 2)
+
+        leaf_nodes = np.flatnonzero(is_leaf)
+        leaf_row = np.zeros(forest.node_count, dtype=index_dtype(len(leaf_nodes)))
+        leaf_row[leaf_nodes] = np.arange(len(leaf_nodes))
+
+        return cls(
+            feature=forest.feature.astype(np.uint8),
+            threshold=threshold,
+            children=local_children.astype(index_dtype(tree_sizes.max())),
+            roots=np.asarray(forest.roots, dtype=np.intp),
+            leaf_row=leaf_row,
+            leaf_value=np.rint(forest.value[leaf_nodes] * VALUE_SCALE).astype(np.uint16),
+            max_depth=forest.max_depth,
+            classes=forest.classes_,
+            n_features_in=forest.n_features_in_,
+        )
+
+    @classmethod
+    def from_sklearn(cls, model):
+        return cls.from_flat(FlatForest.from_sklearn(model))
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def node_count(self):
+        return len(self.feature)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.ARRAY_NAMES)
+
+    def apply(self, X):
+        """Leaf reached in every tree, as an (N, n_trees) array of flat node ids"""
+        # Doubling a float32 is exact, so 2x <= code decides as x <= threshold does
+        X = np.ascontiguousarray(X, dtype=np.float32) * np.float32(THRESHOLD_SCALE)
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+        row_offsets = (np.arange(n_rows) * n_features)[:, None]
+        roots = self.roots
+        nodes = np.broadcast_to(roots, (n_rows, len(roots)))
+
+        for _ in range(self.max_depth):
+            went_left = flat_X.take(row_offsets + self.feature.take(nodes)) <= self.threshold.take(nodes)
+            nodes = roots + self.children.take(nodes * 2 + went_left)
+
+        return nodes
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        # Summed as integers, so the only rounding is the final division
+        totals = self.leaf_value.take(self.leaf_row.take(leaves), axis=0).sum(axis=1, dtype=np.uint32)
+        return totals / float(VALUE_SCALE * len(self.roots))
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+
+def parity_report(compact, reference, X):
+    """How closely compact reproduces a reference engine's probabilities and labels on X"""
+    expected = reference.predict_proba(X)
+    actual = compact.predict_proba(X)
+    return {
+        'rows': len(X),
+        'max_abs_proba_diff': float(np.abs(actual - expected).max()),
+        'label_agreement': float(np.mean(np.argmax(actual, axis=1) == np.argmax(expected, axis=1))),
+        'same_leaves': bool(np.array_equal(compact.apply(X), reference.apply(X)))
+        if isinstance(reference, FlatForest) else None,
+    }
+
+
+def report(model_path):
+    """Print sizes of the pickle, the flat forest and the compact forest, and parity on the dataset"""
+    import pickle
+
+    from dataset import load_dataset_features
+    from model_artifact import load_pickle
+
+    model = load_pickle(model_path)
+    flat = FlatForest.from_sklearn(model)
+    compact = CompactForest.from_flat(flat)
+
+    # The dataset, random on-grid questionnaire averages, and arbitrary fractional inputs
+    rng = np.random.default_rng(0)
+    X = np.vstack([
+        load_dataset_features(),
+        rng.integers(0, 31, size=(20000, 8)) / 3,
+        rng.uniform(0, 10, size=(20000, 8)),
+    ])
+
+    flat_nbytes = sum(getattr(flat, name).nbytes for name in ('feature', 'threshold', 'children', 'value', 'roots'))
+    print("=" * 60)
+    print(f"🗜️ COMPACT FOREST ({compact.n_estimators} trees, {compact.node_count} nodes, "
+          f"{len(compact.leaf_value)} leaves)")
+    print("=" * 60)
+    print(f"   pickled sklearn model: {len(pickle.dumps(model)) / 1024:8.1f} KiB")
+    print(f"   flat forest arrays:    {flat_nbytes / 1024:8.1f} KiB")
+    print(f"   compact forest arrays: {compact.nbytes / 1024:8.1f} KiB  (x{flat_nbytes / compact.nbytes:.1f} smaller)")
+    for name in CompactForest.ARRAY_NAMES:
+        array = getattr(compact, name)
+        print(f"      {name:11s} {str(array.dtype):7s} {array.nbytes / 1024:7.1f} KiB")
+
+    parity = parity_report(compact, flat, X)
+    print(f"   parity on {parity['rows']:,} rows: max |p - p_original| = {parity['max_abs_proba_diff']:.2e}, "
+          f"same leaves: {parity['same_leaves']}, same house: {parity['label_agreement'] * 100:.3f}%")
+    return parity
+
+
+def main(argv):
+    from model_artifact import DEFAULT_MODEL_PATH, export_artifact, file_sha256, load_pickle
+
+    command = argv[1] if len(argv) > 1 else None
+    model_path = argv[2] if len(argv) > 2 else DEFAULT_MODEL_PATH
+    if command == "report":
+        report(model_path)
+    elif command == "export":
+        compact_path = argv[3] if len(argv) > 3 else DEFAULT_COMPACT_PATH
+        compact = CompactForest.from_sklearn(load_pickle(model_path))
+        export_artifact(compact, compact_path, source_sha256=file_sha256(model_path))
+        print(f"✅ Compact forest written to {compact_path} ({os.path.getsize(compact_path) / 1024:.0f} KiB)")
+    else:
+        print("Usage: python compact_forest.py [report|export] [model_path] [compact_path]")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
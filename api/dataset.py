@@ -0,0 +1,17 @@
+"""
+The training data, house_sorting.csv, for the tools (train.py, benchmark.py,
+compact_forest.py) and tests that need real trait rows. pandas is imported
+only when the file is read, so importing this module stays cheap.
+"""
+import os
+
+from features import FEATURE_NAMES
+
+DATASET_PATH = os.path.join(os.path.dirname(__file__), "..", "house_sorting.csv")
+
+
+def load_dataset_features(path=DATASET_PATH):
+    """Trait columns of house_sorting.csv, in FEATURE_NAMES order, as an (N, 8) float matrix"""
+    import pandas as pd
+
+    return pd.read_csv(path)[FEATURE_NAMES].to_numpy(dtype=float)
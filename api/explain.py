@@ -0,0 +1,66 @@
+"""
+Per-trait explanations of forest predictions by tree-path decomposition.
+
+Walking from a tree's root to a leaf, every split moves the node's class
+distribution from the parent's to the child's; that change is credited to the
+trait the split tested. A leaf's distribution is therefore the root's plus
+the sum of its path's changes per trait, and the forest's probabilities are
+the mean root distribution (the baseline) plus the mean of those per-trait
+sums over all trees.
+
+The per-trait sums depend only on the leaf, so they are computed once per
+leaf when the explainer is built. Explaining a row is then one forest
+traversal (FlatForest.apply) and a gather, about the cost of a prediction.
+"""
+import numpy as np
+
+
+class PathExplainer:
+    """Precomputed per-leaf trait contributions for a FlatForest"""
+
+    def __init__(self, forest, leaf_row, leaf_contributions, baseline):
+        self.forest = forest
+        # leaf_row[node] indexes leaf_contributions for leaf nodes (0 elsewhere)
+        self.leaf_row = leaf_row
+        # (n_leaves, n_features, n_classes): summed probability changes per split feature
+        self.leaf_contributions = leaf_contributions
+        self.baseline = baseline
+        self.classes_ = forest.classes_
+
+    @classmethod
+    def from_flat(cls, forest):
+        n_features, n_classes = forest.n_features_in_, forest.value.shape[1]
+        is_leaf = ~np.isfinite(forest.threshold)
+        contributions = np.zeros((forest.node_count, n_features, n_classes))
+
+        # Top-down, one level at a time: a child's contributions are its parent's plus the split's change
+        nodes = forest.roots
+        for _ in range(forest.max_depth):
+            nodes = nodes[~is_leaf[nodes]]
+            if not len(nodes):
+                break
+            for went_left in (0, 1):
+                children = forest.children[nodes * 2 + went_left]
+                contributions[children] = contributions[nodes]
+                contributions[children, forest.feature[nodes]] += forest.value[children] - forest.value[nodes]
+            nodes = forest.children[np.concatenate([nodes * 2, nodes * 2 + 1])]
+
+        leaf_nodes = np.flatnonzero(is_leaf)
+        leaf_row = np.zeros(forest.node_count, dtype=np.intp)
+        leaf_row[leaf_nodes] = np.arange(len(leaf_nodes))
+        baseline = forest.value[forest.roots].mean(axis=0)
+        return cls(forest, leaf_row, np.ascontiguousarray(contributions[leaf_nodes]), baseline)
+
+    @property
+    def nbytes(self):
+        return self.leaf_row.nbytes + self.leaf_contributions.nbytes
+
+    def explain(self, X):
+        """
+        (probabilities, contributions) for an (N, n_features) matrix: probabilities
+        is (N, n_classes) and equals baseline + contributions.sum(axis=1);
+        contributions is (N, n_features, n_classes)
+        """
+        leaves = self.forest.apply(X)
+        contributions = self.leaf_contributions.take(self.leaf_row.take(leaves), axis=0).mean(axis=1)
+        return self.baseline + contributions.sum(axis=1), contributions
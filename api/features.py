@@ -0,0 +1,171 @@
+"""
+Questionnaire schema: validation and reduction of q1-q24 answers to the 8
+trait averages the model was trained on.
+
+Everything that does not depend on the request (question order, trait
+mapping, getters) is built once at import. Validating a batch is then one
+C-level gather of the 24 answers per row, one type check over the whole
+batch, and a vectorized range check and (N, 8, 3) reshape-and-average;
+a single questionnaire takes the same steps without the array overhead.
+Rows that fail the fast checks are re-run through the per-question loop so
+error messages are exactly the same as before. NaN, which the original
+loop let through to the model, is rejected as out of range.
+"""
+import math
+from operator import itemgetter
+
+import numpy as np
+
+# Define the feature names in the correct order (as they were in training)
+FEATURE_NAMES = [
+    'Bravery', 'Intelligence', 'Loyalty', 'Ambition',
+    'Dark Arts Knowledge', 'Quidditch Skills', 'Dueling Skills', 'Creativity'
+]
+
+# Map questions to traits (3 questions per trait), in FEATURE_NAMES order
+TRAIT_MAPPING = {
+    'bravery': ['q1', 'q2', 'q3'],
+    'intelligence': ['q4', 'q5', 'q6'],
+    'loyalty': ['q7', 'q8', 'q9'],
+    'ambition': ['q10', 'q11', 'q12'],
+    'dark_arts_knowledge': ['q13', 'q14', 'q15'],
+    'quidditch_skills': ['q16', 'q17', 'q18'],
+    'dueling_skills': ['q19', 'q20', 'q21'],
+    'creativity': ['q22', 'q23', 'q24']
+}
+
+EXPECTED_QUESTIONS = [f'q{i}' for i in range(1, 25)]
+
+QUESTIONS_PER_TRAIT = 3
+TRAIT_NAMES = list(TRAIT_MAPPING)
+# Question ids in trait order, so a row of answers reshapes straight to (8, 3)
+_ANSWER_ORDER = [q_id for question_ids in TRAIT_MAPPING.values() for q_id in question_ids]
+_gather_answers = itemgetter(*_ANSWER_ORDER)
+# bool is accepted because isinstance(True, int) was always accepted
+_NUMERIC_TYPES = frozenset((int, float, bool))
+
+
+def _validate_slow(data):
+    """Per-question validation; the reference for error messages"""
+    missing_questions = []
+    invalid_questions = []
+
+    for q_id in EXPECTED_QUESTIONS:
+        if q_id not in data:
+            missing_questions.append(q_id)
+        else:
+            value = data[q_id]
+            # Written so NaN, which compares false both ways, fails the range check
+            if not isinstance(value, (int, float)) or not 0 <= value <= 10:
+                invalid_questions.append(q_id)
+
+    if missing_questions:
+        return {
+            'error': 'Missing required questions',
+            'missing': missing_questions,
+            'total_required': 24
+        }
+
+    if invalid_questions:
+        return {
+            'error': 'Invalid values provided (must be 0-10)',
+            'invalid_questions': invalid_questions
+        }
+
+    return None
+
+
+def trait_scores_for(features):
+    """{trait: score rounded to 2 places} for one row of trait averages"""
+    return {trait: round(score, 2) for trait, score in zip(TRAIT_NAMES, features)}
+
+
+def validate_many(rows):
+    """
+    Validate a list of questionnaires and reduce the valid ones to trait averages.
+
+    Returns (errors, features, valid_rows): errors has one entry per input row
+    (None for valid rows), features is a (len(valid_rows), 8) float matrix and
+    valid_rows lists the input indexes its rows came from.
+    """
+    errors = [None] * len(rows)
+    gathered = []
+    gathered_rows = []
+
+    for index, data in enumerate(rows):
+        if not data:
+            errors[index] = {'error': 'No JSON data provided'}
+            continue
+        try:
+            answers = _gather_answers(data)
+        except (KeyError, TypeError):
+            errors[index] = _validate_slow(data)
+            continue
+        gathered.append(answers)
+        gathered_rows.append(index)
+
+    if not gathered:
+        return errors, np.empty((0, len(TRAIT_NAMES))), []
+
+    # Exact-type check across the whole batch in one pass; rows with other types
+    # (strings, None, nested values, number subclasses) take the reference path
+    if _NUMERIC_TYPES.issuperset(map(type, (value for answers in gathered for value in answers))):
+        type_ok = np.ones(len(gathered), dtype=bool)
+    else:
+        type_ok = np.array([_NUMERIC_TYPES.issuperset(map(type, answers)) for answers in gathered])
+
+    matrix = np.zeros((len(gathered), len(_ANSWER_ORDER)))
+    try:
+        if type_ok.all():
+            matrix[:] = gathered
+        elif type_ok.any():
+            matrix[type_ok] = [answers for answers, ok in zip(gathered, type_ok) if ok]
+    except OverflowError:
+        # Integers too large for a float64 are out of range anyway; let the reference path say so
+        type_ok[:] = False
+    # NaN compares false both ways, so it fails this check and goes to the reference path
+    valid = type_ok & ((matrix >= 0) & (matrix <= 10)).all(axis=1)
+
+    for position in np.flatnonzero(~valid):
+        index = gathered_rows[position]
+        errors[index] = _validate_slow(rows[index])
+        if errors[index] is None:
+            # e.g. numeric subclasses the exact-type check is too strict for
+            matrix[position] = [float(value) for value in gathered[position]]
+            valid[position] = True
+
+    # Same arithmetic as sum(scores) / len(scores): a left-to-right sum of 3, then divide
+    answers = matrix[valid].reshape(-1, len(TRAIT_NAMES), QUESTIONS_PER_TRAIT)
+    features = (answers[:, :, 0] + answers[:, :, 1] + answers[:, :, 2]) / QUESTIONS_PER_TRAIT
+    valid_rows = [gathered_rows[position] for position in np.flatnonzero(valid)]
+    return errors, features, valid_rows
+
+
+def validate_answers(data):
+    """
+    Validate one questionnaire and reduce it to the 8 trait averages.
+    Returns (error, None, None) on failure, otherwise (None, features, trait_scores)
+    """
+    if not data:
+        return {'error': 'No JSON data provided'}, None, None
+
+    # For a single row plain Python beats building arrays: one C-level gather,
+    # one type check and a min/max range check, with the loop only on failure
+    try:
+        answers = _gather_answers(data)
+    except (KeyError, TypeError):
+        answers = None
+
+    # min/max can step over a NaN, so the sum catches it
+    if (answers is None or not _NUMERIC_TYPES.issuperset(map(type, answers))
+            or not (min(answers) >= 0 and max(answers) <= 10) or math.isnan(sum(answers))):
+        error = _validate_slow(data)
+        if error:
+            return error, None, None
+        answers = _gather_answers(data)
+
+    features = [
+        (answers[i] + answers[i + 1] + answers[i + 2]) / QUESTIONS_PER_TRAIT
+        for i in range(0, len(answers), QUESTIONS_PER_TRAIT)
+    ]
+    return None, features, trait_scores_for(features)
@@ -0,0 +1,242 @@
+"""
+Running house statistics for /stats, updated in O(1) per sorting.
+
+For every house: how many questionnaires were sorted into it, the running
+mean and sum of squared deviations of each trait (Welford's update), and a
+histogram of the winning probability. Nothing is ever rescanned; /stats
+merges the per-house aggregates (Chan's parallel formula) when it is asked.
+
+Sharing between workers: the aggregates live in a file mapped with mmap,
+divided into one slot per process. A worker claims a free slot the first
+time it records (an fcntl lock on the slot's byte range, released by the
+kernel when the process exits) and is then the only writer of that slot, so
+recording takes no lock shared with other workers. Each slot has a sequence
+number that is odd while the slot is being written; readers retry a slot
+whose sequence changed under them (a seqlock), so /stats never sees half an
+update. A worker killed mid-update leaves its slot's sequence odd; readers
+give up waiting on it after READ_TIMEOUT, and the next worker to claim the
+slot makes the sequence even again. A restarted worker claims a slot left by
+an exited one and keeps adding to it, and the file is msync'ed every few seconds, so the statistics
+survive restarts.
+
+Without a path the aggregates are kept in this process's memory only.
+"""
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+MAGIC = b"HSSTATS1"
+# The layout description goes in the first page; slots start after it
+HEADER_BYTES = mmap.PAGESIZE
+DEFAULT_SLOTS = 64
+DEFAULT_BINS = 20
+DEFAULT_FLUSH_INTERVAL = 5.0
+# Longest a reader waits for a slot to stop changing; a live writer holds it for microseconds
+READ_TIMEOUT = 0.1
+_PREAMBLE = struct.Struct("<8sI")
+
+
+class HouseStats:
+    def __init__(self, houses, traits, path=None, slots=DEFAULT_SLOTS, bins=DEFAULT_BINS,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.houses = [str(house) for house in houses]
+        self.traits = list(traits)
+        self.path = path
+        self.bins = bins
+        self.flush_interval = flush_interval
+        n_houses, n_traits = len(self.houses), len(self.traits)
+        # seq | count per house | mean per house and trait | M2 per house and trait | winning-probability bins
+        self._fields = {
+            'seq': slice(0, 1),
+            'count': slice(1, 1 + n_houses),
+            'mean': slice(1 + n_houses, 1 + n_houses + n_houses * n_traits),
+            'm2': slice(1 + n_houses + n_houses * n_traits, 1 + n_houses + 2 * n_houses * n_traits),
+        }
+        self.slot_size = 1 + n_houses + 2 * n_houses * n_traits + bins
+        self._fields['hist'] = slice(self.slot_size - bins, self.slot_size)
+
+        self._mmap = None
+        self._fd = None
+        if path is None:
+            self._slots = np.zeros((1, self.slot_size))
+        else:
+            self._slots = self._map(path, slots)
+        self._slot = None
+        self._owner = None
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _layout(self, slots):
+        return {'houses': self.houses, 'traits': self.traits, 'bins': self.bins, 'slots': slots}
+
+    def _map(self, path, slots):
+        """Open or create the shared file; refuses one written with a different layout"""
+        layout = self._layout(slots)
+        size = HEADER_BYTES + slots * self.slot_size * 8
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        # Only one process writes the header of a new file
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, 0)
+        try:
+            header = os.pread(self._fd, HEADER_BYTES, 0)
+            if len(header) < _PREAMBLE.size or header[:len(MAGIC)] != MAGIC:
+                encoded = json.dumps(layout).encode('utf-8')
+                if _PREAMBLE.size + len(encoded) > HEADER_BYTES:
+                    raise ValueError("Stats layout does not fit in the header")
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, _PREAMBLE.pack(MAGIC, len(encoded)) + encoded, 0)
+            else:
+                _, length = _PREAMBLE.unpack_from(header)
+                existing = json.loads(header[_PREAMBLE.size:_PREAMBLE.size + length])
+                if existing != layout:
+                    raise ValueError(f"{path} holds statistics for a different layout: {existing}")
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, 0)
+
+        self._mmap = mmap.mmap(self._fd, size)
+        return np.frombuffer(self._mmap, dtype=np.float64, offset=HEADER_BYTES).reshape(slots, self.slot_size)
+
+    def _claim_slot(self):
+        """This process's slot: any slot no live process holds a lock on"""
+        if self._fd is None:
+            return self._slots[0]
+        slot_bytes = self.slot_size * 8
+        for index in range(len(self._slots)):
+            try:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, slot_bytes, HEADER_BYTES + index * slot_bytes)
+            except OSError:
+                continue
+            # The lock rules out another writer, so an odd sequence is a worker that died mid-update
+            slot = self._slots[index]
+            if slot[0] % 2:
+                slot[0] += 1
+            if self.flush_interval:
+                threading.Thread(target=self._run_flusher, name='house-stats', daemon=True).start()
+            return slot
+        print(f"⚠️ All {len(self._slots)} house statistics slots are taken; this worker's sortings are not shared")
+        return np.zeros(self.slot_size)
+
+    def _after_fork(self):
+        # The slot lock belongs to the parent; the child claims its own on first use
+        self._slot = None
+        self._owner = None
+        self._lock = threading.Lock()
+
+    def record(self, features, house_index, winning_probability):
+        """Add one sorting; only this process ever writes its slot"""
+        x = np.asarray(features, dtype=np.float64)
+        if not (np.isfinite(x).all() and np.isfinite(winning_probability)):
+            # One NaN would poison the running means for good, in the shared file too
+            return
+        with self._lock:
+            if self._owner != os.getpid():
+                self._slot = self._claim_slot()
+                self._owner = os.getpid()
+            slot, fields = self._slot, self._fields
+            n_traits = len(self.traits)
+
+            slot[0] += 1  # odd: update in progress
+            count = slot[fields['count']]
+            count[house_index] += 1
+            mean = slot[fields['mean']][house_index * n_traits:(house_index + 1) * n_traits]
+            m2 = slot[fields['m2']][house_index * n_traits:(house_index + 1) * n_traits]
+            delta = x - mean
+            mean += delta / count[house_index]
+            m2 += delta * (x - mean)
+            bin_index = min(int(winning_probability * self.bins), self.bins - 1)
+            slot[fields['hist'].start + bin_index] += 1
+            slot[0] += 1
+
+    def _read_slot(self, index):
+        deadline = time.monotonic() + READ_TIMEOUT
+        while True:
+            seq = self._slots[index, 0]
+            copy = self._slots[index].copy()
+            if seq % 2 == 0 and self._slots[index, 0] == seq and copy[0] == seq:
+                return copy
+            if time.monotonic() > deadline:
+                # Its writer died mid-update (or is stalled); at most that one sorting is off
+                return copy
+            time.sleep(0)
+
+    def snapshot(self):
+        """(count, mean, m2, hist) summed over every worker's slot: (H,), (H, T), (H, T), (bins,)"""
+        n_houses, n_traits = len(self.houses), len(self.traits)
+        count = np.zeros(n_houses)
+        weighted_mean = np.zeros((n_houses, n_traits))
+        slots = []
+        for index in range(len(self._slots)):
+            slot = self._read_slot(index)
+            if slot[self._fields['count']].any():
+                slots.append(slot)
+
+        # Chan et al.: merge (n, mean, M2) groups without revisiting any sample
+        for slot in slots:
+            slot_count = slot[self._fields['count']]
+            count += slot_count
+            weighted_mean += slot_count[:, None] * slot[self._fields['mean']].reshape(n_houses, n_traits)
+        mean = np.divide(weighted_mean, count[:, None], out=np.zeros_like(weighted_mean), where=count[:, None] > 0)
+        m2 = np.zeros((n_houses, n_traits))
+        hist = np.zeros(self.bins)
+        for slot in slots:
+            slot_count = slot[self._fields['count']][:, None]
+            slot_mean = slot[self._fields['mean']].reshape(n_houses, n_traits)
+            m2 += slot[self._fields['m2']].reshape(n_houses, n_traits) + slot_count * (slot_mean - mean) ** 2
+            hist += slot[self._fields['hist']]
+        return count, mean, m2, hist
+
+    def summary(self):
+        """The /stats payload"""
+        count, mean, m2, hist = self.snapshot()
+        total = count.sum()
+
+        def trait_stats(n, means, m2s):
+            variance = m2s / (n - 1) if n > 1 else np.zeros_like(m2s)
+            return {
+                trait: {'mean': round(float(m), 4), 'std': round(float(np.sqrt(v)), 4)}
+                for trait, m, v in zip(self.traits, means, variance)
+            }
+
+        # All houses together, merged the same way as the slots
+        overall_mean = (count[:, None] * mean).sum(axis=0) / total if total else np.zeros(len(self.traits))
+        overall_m2 = (m2 + count[:, None] * (mean - overall_mean) ** 2).sum(axis=0)
+        edges = np.linspace(0, 1, self.bins + 1)
+        return {
+            'total_sortings': int(total),
+            'houses': {
+                house: {
+                    'count': int(n),
+                    'share': round(float(n / total), 4) if total else 0.0,
+                    'traits': trait_stats(n, mean[i], m2[i]),
+                }
+                for i, (house, n) in enumerate(zip(self.houses, count))
+            },
+            'traits': trait_stats(total, overall_mean, overall_m2),
+            'winning_probability': [
+                {'from': round(float(low), 4), 'to': round(float(high), 4), 'count': int(n)}
+                for low, high, n in zip(edges[:-1], edges[1:], hist)
+            ],
+            'workers': self.workers(),
+        }
+
+    def workers(self):
+        """Slots that have recorded anything, i.e. worker processes current or past"""
+        return int(sum(self._slots[index, self._fields['count']].any() for index in range(len(self._slots))))
+
+    def flush(self):
+        if self._mmap is not None:
+            self._mmap.flush()
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Could not persist house statistics to {self.path}: {e}")
+                return
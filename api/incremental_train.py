@@ -0,0 +1,177 @@
+"""
+Incremental model updates from the submission log.
+
+Instead of refitting the whole forest on all of history, each update reads
+only the log lines appended since the previous update (a byte offset kept in
+a state file next to the model) and grows the forest with warm_start: a few
+new trees are fitted on the new rows, the existing trees are untouched. The
+cost of an update therefore depends on how many rows arrived, not on how many
+have been seen.
+
+Rows are used with their confirmed label when the client sent one, otherwise
+with the predicted house if the model was at least --min-confidence sure of it.
+An update is skipped, and its rows left for the next one, when there are
+fewer than --min-rows of them or they do not cover every house: a forest's
+new trees must know all of its classes.
+
+The updated model is written with its .sha256 and manifest, so a running API
+picks it up through its model watcher.
+
+Run from the api directory:
+    python incremental_train.py ../submissions.jsonl
+    python incremental_train.py ../submissions.jsonl --trees-per-update 5 --max-trees 300
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_NAMES
+from model_artifact import DEFAULT_MODEL_PATH, load_pickle
+from train import manifest_path, write_model
+
+DEFAULT_TREES_PER_UPDATE = 10
+DEFAULT_MIN_ROWS = 200
+DEFAULT_MIN_CONFIDENCE = 0.6
+
+
+def state_path(model_path):
+    return os.path.splitext(model_path)[0] + ".incremental.json"
+
+
+def load_state(model_path):
+    try:
+        with open(state_path(model_path)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'log_offset': 0, 'rows_used': 0, 'updates': 0}
+
+
+def save_state(model_path, state):
+    tmp_path = state_path(model_path) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, state_path(model_path))
+
+
+def read_new_rows(log_path, offset):
+    """
+    Parsed log entries after `offset` and the offset just past the last complete
+    line; a line still being written is left for next time
+    """
+    with open(log_path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1
+    entries = []
+    for line in data[:end].splitlines():
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            continue
+    return entries, offset + end
+
+
+def training_rows(entries, classes, min_confidence=DEFAULT_MIN_CONFIDENCE):
+    """(X, y) for entries that carry 8 in-range traits and a confirmed or confident label"""
+    known = set(classes)
+    features, labels = [], []
+    for entry in entries:
+        row = entry.get('features')
+        if not isinstance(row, list) or len(row) != len(FEATURE_NAMES):
+            continue
+        if not all(isinstance(value, (int, float)) and 0 <= value <= 10 for value in row):
+            continue
+        label = entry.get('label')
+        if label is None and (entry.get('probability') or 0) >= min_confidence:
+            label = entry.get('predicted_house')
+        if label in known:
+            features.append(row)
+            labels.append(label)
+    return np.array(features, dtype=float).reshape(-1, len(FEATURE_NAMES)), np.array(labels, dtype=object)
+
+
+def update_forest(model, X, y, trees_per_update=DEFAULT_TREES_PER_UPDATE, max_trees=None):
+    """Add `trees_per_update` trees fitted on (X, y) only; drop the oldest beyond max_trees"""
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + trees_per_update)
+    # A DataFrame keeps feature_names_in_ as the model was originally fitted
+    model.fit(pd.DataFrame(X, columns=FEATURE_NAMES), y)
+    model.set_params(warm_start=False)
+
+    if max_trees is not None and len(model.estimators_) > max_trees:
+        model.estimators_ = model.estimators_[-max_trees:]
+        model.n_estimators = max_trees
+    return model
+
+
+def run_update(log_path, model_path=DEFAULT_MODEL_PATH, trees_per_update=DEFAULT_TREES_PER_UPDATE,
+               max_trees=None, min_rows=DEFAULT_MIN_ROWS, min_confidence=DEFAULT_MIN_CONFIDENCE):
+    """One incremental update; returns a summary dict with 'updated' True/False and why"""
+    state = load_state(model_path)
+    if not os.path.exists(log_path):
+        return {'updated': False, 'reason': f'no submission log at {log_path}'}
+    if os.path.getsize(log_path) < state['log_offset']:
+        return {'updated': False, 'reason': 'submission log is shorter than the saved offset (was it rotated?)'}
+
+    entries, new_offset = read_new_rows(log_path, state['log_offset'])
+    model = load_pickle(model_path)
+    X, y = training_rows(entries, model.classes_, min_confidence)
+    summary = {'new_entries': len(entries), 'usable_rows': len(X)}
+
+    if len(X) < min_rows:
+        return dict(summary, updated=False, reason=f'fewer than {min_rows} usable rows')
+    missing = sorted(set(model.classes_) - set(y))
+    if missing:
+        # New trees would be fitted with fewer classes than the forest predicts
+        return dict(summary, updated=False, reason=f'no rows for {", ".join(map(str, missing))}')
+
+    start = time.perf_counter()
+    update_forest(model, X, y, trees_per_update, max_trees)
+    fit_s = time.perf_counter() - start
+
+    try:
+        with open(manifest_path(model_path)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        manifest = {}
+    state = {
+        'log_offset': new_offset,
+        'rows_used': state['rows_used'] + len(X),
+        'updates': state['updates'] + 1,
+    }
+    manifest['incremental'] = dict(state, n_estimators=len(model.estimators_), last_update_rows=len(X))
+    write_model(model, model_path, manifest)
+    # Saved after the model: a crash in between re-applies these rows rather than losing them
+    save_state(model_path, state)
+
+    return dict(summary, updated=True, fit_s=fit_s, n_estimators=len(model.estimators_))
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description='Grow the model with trees fitted on newly logged submissions')
+    parser.add_argument('log', help='Submission log written by the API (SUBMISSION_LOG_PATH)')
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--trees-per-update', type=int, default=DEFAULT_TREES_PER_UPDATE)
+    parser.add_argument('--max-trees', type=int, help='Drop the oldest trees beyond this many')
+    parser.add_argument('--min-rows', type=int, default=DEFAULT_MIN_ROWS,
+                        help='Wait for at least this many usable rows before updating')
+    parser.add_argument('--min-confidence', type=float, default=DEFAULT_MIN_CONFIDENCE,
+                        help='Unlabelled rows are used only if the predicted house had this probability')
+    args = parser.parse_args(argv)
+
+    summary = run_update(args.log, args.model, args.trees_per_update, args.max_trees,
+                         args.min_rows, args.min_confidence)
+    if not summary['updated']:
+        print(f"⏭️ No update: {summary['reason']}")
+        return 0
+    print(f"✅ Added trees from {summary['usable_rows']:,} new rows in {summary['fit_s']:.2f}s "
+          f"- model now has {summary['n_estimators']} trees")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
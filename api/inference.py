@@ -0,0 +1,109 @@
+"""
+Flat-array inference engine for the pickled RandomForestClassifier.
+
+Every DecisionTreeClassifier in the forest is exported once into a handful of
+contiguous NumPy arrays, and rows are scored by walking all trees at the same
+time with vectorized gathers. This skips sklearn's per-call input validation,
+joblib dispatch and per-tree Python overhead, which dominate for a 1x8 row.
+"""
+import numpy as np
+
+
+class FlatForest:
+    """
+    A random forest stored as flat node arrays shared by all trees.
+
+    Leaves point back at themselves with a +inf threshold, so a fixed number of
+    traversal steps (the deepest tree's depth) lands every row on its leaf
+    without any per-node branching.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, max_depth, classes, n_features_in=None):
+        self.feature = feature
+        self.threshold = threshold
+        # children[2 * node + went_left] is the next node, so one gather replaces two plus a select
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.n_features_in_ = n_features_in
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Export the trees of a fitted RandomForestClassifier into flat arrays"""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            is_leaf = tree.children_left == -1
+            node_ids = np.arange(tree.node_count)
+
+            roots.append(offset)
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+
+            # Normalise per node, as DecisionTreeClassifier.predict_proba does
+            value = tree.value[:, 0, :]
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        children = np.stack([np.concatenate(rights), np.concatenate(lefts)], axis=1).ravel()
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            children=np.ascontiguousarray(children, dtype=np.intp),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            classes=model.classes_,
+            n_features_in=model.n_features_in_,
+        )
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def node_count(self):
+        return len(self.feature)
+
+    @property
+    def children_left(self):
+        return self.children[1::2]
+
+    @property
+    def children_right(self):
+        return self.children[0::2]
+
+    def apply(self, X):
+        """Leaf index reached in every tree, as an (N, n_trees) array of flat node ids"""
+        # sklearn compares float32 inputs against the stored thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+        row_offsets = (np.arange(n_rows) * n_features)[:, None]
+        nodes = np.broadcast_to(self.roots, (n_rows, len(self.roots)))
+
+        for _ in range(self.max_depth):
+            went_left = flat_X.take(row_offsets + self.feature.take(nodes)) <= self.threshold.take(nodes)
+            nodes = self.children.take(nodes * 2 + went_left)
+
+        return nodes
+
+    def predict_proba(self, X):
+        """Mean of the per-tree leaf class distributions, like RandomForestClassifier.predict_proba"""
+        leaves = self.apply(X)
+        return self.value.take(leaves, axis=0).sum(axis=1) / len(self.roots)
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
@@ -0,0 +1,48 @@
+"""
+The per-question validation loop /predict used before features.py vectorized
+it. Kept unchanged as the baseline benchmark.py measures against and the
+reference test_features.py checks the fast paths with; the only difference
+on purpose is that features.py also rejects NaN.
+"""
+from features import EXPECTED_QUESTIONS, TRAIT_MAPPING
+
+
+def legacy_validate_answers(data):
+    """(error, features, trait_scores) exactly as the original /predict computed them"""
+    if not data:
+        return {'error': 'No JSON data provided'}, None, None
+
+    missing_questions = []
+    invalid_questions = []
+
+    for q_id in EXPECTED_QUESTIONS:
+        if q_id not in data:
+            missing_questions.append(q_id)
+        else:
+            value = data[q_id]
+            if not isinstance(value, (int, float)) or value < 0 or value > 10:
+                invalid_questions.append(q_id)
+
+    if missing_questions:
+        return {
+            'error': 'Missing required questions',
+            'missing': missing_questions,
+            'total_required': 24
+        }, None, None
+
+    if invalid_questions:
+        return {
+            'error': 'Invalid values provided (must be 0-10)',
+            'invalid_questions': invalid_questions
+        }, None, None
+
+    trait_scores = {}
+    features = []
+
+    for trait, question_ids in TRAIT_MAPPING.items():
+        scores = [data[q_id] for q_id in question_ids]
+        average_score = sum(scores) / len(scores)
+        trait_scores[trait] = round(average_score, 2)
+        features.append(average_score)
+
+    return None, features, trait_scores
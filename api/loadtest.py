@@ -0,0 +1,172 @@
+"""
+Load-test harness for /predict.
+
+Fires concurrent /predict requests at a running server and reports latency
+percentiles and throughput. It can also start the server itself, so both
+serving modes can be compared on the same machine:
+
+    python loadtest.py --url http://localhost:5000            # an already running server
+    python loadtest.py --mode flask --mode asgi               # start each mode in turn
+    python loadtest.py --mode both --concurrency 128 --requests 5000
+
+Flask runs under gunicorn (sync workers); ASGI runs under uvicorn.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SERVER_COMMANDS = {
+    'flask': lambda port, workers: [
+        sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}', 'main:app'
+    ],
+    'asgi': lambda port, workers: [
+        sys.executable, '-m', 'uvicorn', '--workers', str(workers), '--port', str(port),
+        '--log-level', 'warning', 'asgi:app'
+    ],
+}
+
+
+def random_answers(rng):
+    return {f'q{i}': rng.randint(0, 10) for i in range(1, 25)}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_load(url, total_requests, concurrency, seed=0):
+    """Send total_requests POST /predict calls from `concurrency` keep-alive connections"""
+    parsed = urlparse(url)
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    counter = iter(range(total_requests))
+
+    def worker(worker_id):
+        rng = random.Random(seed + worker_id)
+        connection = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    break
+            body = json.dumps(random_answers(rng))
+            start = time.perf_counter()
+            try:
+                connection.request('POST', '/predict', body, {'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                (latencies if ok else errors).append(elapsed)
+        connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': total_requests,
+        'concurrency': concurrency,
+        'errors': len(errors),
+        'wall_s': wall,
+        'throughput_rps': len(latencies) / wall if wall else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'mean_ms': statistics.fmean(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+def wait_until_ready(url, timeout=60):
+    parsed = urlparse(url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=2)
+            connection.request('GET', '/')
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Server at {url} did not become ready in {timeout}s')
+
+
+def run_mode(mode, port, workers, total_requests, concurrency):
+    """Start a server in the given mode, load it, then stop it"""
+    server = subprocess.Popen(
+        SERVER_COMMANDS[mode](port, workers), cwd=API_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f'http://127.0.0.1:{port}'
+    try:
+        wait_until_ready(url)
+        # Warm up connections and caches before measuring
+        run_load(url, min(200, total_requests), concurrency)
+        return run_load(url, total_requests, concurrency)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def print_result(name, result):
+    print(f"   {name:8s} {result['throughput_rps']:9,.0f} req/s   p50 {result['p50_ms']:7.2f} ms   "
+          f"p99 {result['p99_ms']:7.2f} ms   errors {result['errors']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load-test POST /predict')
+    parser.add_argument('--url', help='Target an already running server instead of starting one')
+    parser.add_argument('--mode', action='append', choices=['flask', 'asgi', 'both'],
+                        help='Serving mode(s) to start and test (default: both)')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=1, help='Server worker processes per mode')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--json', help='Also write results to this JSON file')
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print(f"🚦 LOAD TEST: {args.requests} requests, concurrency {args.concurrency}")
+    print("=" * 60)
+
+    results = {}
+    if args.url:
+        results['target'] = run_load(args.url, args.requests, args.concurrency)
+        print_result('target', results['target'])
+    else:
+        modes = args.mode or ['both']
+        if 'both' in modes:
+            modes = ['flask', 'asgi']
+        for mode in modes:
+            results[mode] = run_mode(mode, args.port, args.workers, args.requests, args.concurrency)
+            print_result(mode, results[mode])
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""
+Precomputed lookup table for integer-only answers.
+
+With whole-number answers every trait mean is one of 31 values (sum 0-30 / 3),
+so each feature can be compressed to a grid code before it ever meets a tree.
+For every (feature, grid code, tree) the table stores a bitmask of the tree's
+leaves that stay reachable; AND-ing the 8 masks of a row and taking the lowest
+set bit gives the exit leaf of each tree directly (QuickScorer-style), so a
+lookup costs the same handful of gathers no matter how deep the trees are.
+
+Rows whose trait means fall off the grid (fractional answers) are passed to a
+fallback engine.
+
+Build the table offline and print its memory footprint:
+    python lookup_table.py build
+    python lookup_table.py report
+"""
+import os
+import sys
+
+import numpy as np
+
+from model_artifact import file_sha256, load_pickle
+
+# Trait means are sums of three 0-10 answers divided by 3
+GRID_DENOMINATOR = 3
+GRID_SIZE = 31
+MAX_LEAVES_PER_TREE = 64
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "house_sorting_model.pkl")
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(__file__), "..", "house_sorting_lookup.npz")
+
+
+def _tree_leaf_masks(tree):
+    """
+    Number the leaves of one tree left to right and return
+    (leaf_ids, left_subtree_masks): leaf_ids maps leaf position -> node id, and
+    left_subtree_masks[node] has a bit set for every leaf under node's left child
+    """
+    leaf_ids = []
+    subtree_masks = np.zeros(tree.node_count, dtype=np.uint64)
+
+    def visit(node):
+        if tree.children_left[node] == -1:
+            subtree_masks[node] = np.uint64(1) << np.uint64(len(leaf_ids))
+            leaf_ids.append(node)
+        else:
+            visit(tree.children_left[node])
+            visit(tree.children_right[node])
+            subtree_masks[node] = subtree_masks[tree.children_left[node]] | subtree_masks[tree.children_right[node]]
+
+    visit(0)
+
+    left_subtree_masks = np.zeros(tree.node_count, dtype=np.uint64)
+    internal = tree.children_left != -1
+    left_subtree_masks[internal] = subtree_masks[tree.children_left[internal]]
+    return leaf_ids, left_subtree_masks
+
+
+class LookupTable:
+    """
+    Grid-indexed forest: masks has shape (n_features, GRID_SIZE, n_trees) and
+    leaf_values has shape (n_trees, MAX_LEAVES_PER_TREE, n_classes)
+    """
+
+    def __init__(self, masks, leaf_values, classes, fallback=None, model_sha256=None):
+        self.masks = masks
+        self.leaf_values = leaf_values
+        self.classes_ = classes
+        self.fallback = fallback
+        self.model_sha256 = model_sha256
+        self.tree_index = np.arange(masks.shape[2])
+
+    @classmethod
+    def build(cls, model, fallback=None, model_sha256=None):
+        """Enumerate the trait grid through every tree of a fitted RandomForestClassifier"""
+        n_features = model.n_features_in_
+        n_trees = len(model.estimators_)
+        n_classes = len(model.classes_)
+        # sklearn compares float32 inputs against the stored thresholds
+        grid = (np.arange(GRID_SIZE) / GRID_DENOMINATOR).astype(np.float32)
+
+        masks = np.full((n_features, GRID_SIZE, n_trees), np.iinfo(np.uint64).max, dtype=np.uint64)
+        leaf_values = np.zeros((n_trees, MAX_LEAVES_PER_TREE, n_classes), dtype=np.float64)
+
+        for t, estimator in enumerate(model.estimators_):
+            tree = estimator.tree_
+            if tree.n_leaves > MAX_LEAVES_PER_TREE:
+                raise ValueError(
+                    f"Tree {t} has {tree.n_leaves} leaves; lookup mode supports at most {MAX_LEAVES_PER_TREE}"
+                )
+
+            leaf_ids, left_subtree_masks = _tree_leaf_masks(tree)
+
+            value = tree.value[leaf_ids, 0, :]
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            leaf_values[t, :len(leaf_ids)] = value / normalizer
+
+            for f in range(n_features):
+                nodes = np.flatnonzero((tree.children_left != -1) & (tree.feature == f))
+                for g, x in enumerate(grid):
+                    # Going right at a node rules out every leaf in its left subtree
+                    for node in nodes[x > tree.threshold[nodes]]:
+                        masks[f, g, t] &= ~left_subtree_masks[node]
+
+        return cls(masks, leaf_values, model.classes_, fallback=fallback, model_sha256=model_sha256)
+
+    @classmethod
+    def load(cls, path, fallback=None):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["masks"],
+                data["leaf_values"],
+                data["classes"],
+                fallback=fallback,
+                model_sha256=str(data["model_sha256"]),
+            )
+
+    def save(self, path):
+        np.savez(
+            path,
+            masks=self.masks,
+            leaf_values=self.leaf_values,
+            classes=self.classes_.astype(str),
+            model_sha256=np.array(self.model_sha256 or ""),
+        )
+
+    @property
+    def nbytes(self):
+        return self.masks.nbytes + self.leaf_values.nbytes
+
+    def grid_codes(self, X):
+        """(codes, on_grid): grid code per feature and whether each row lies on the grid"""
+        X = np.asarray(X, dtype=np.float64)
+        scaled = X * GRID_DENOMINATOR
+        codes = np.rint(scaled)
+        on_grid = np.all((np.abs(scaled - codes) < 1e-9) & (codes >= 0) & (codes < GRID_SIZE), axis=1)
+        return codes.astype(np.intp), on_grid
+
+    def lookup_proba(self, codes):
+        """Probabilities for rows already converted to grid codes, with no tree traversal"""
+        feature_index = np.arange(codes.shape[1])
+        # (N, n_features, n_trees) -> (N, n_trees): leaves every feature agrees on
+        reachable = np.bitwise_and.reduce(self.masks[feature_index, codes], axis=1)
+        # The exit leaf is the lowest surviving bit
+        lowest_bit = reachable & (~reachable + np.uint64(1))
+        leaves = np.log2(lowest_bit.astype(np.float64)).astype(np.intp)
+        return self.leaf_values[self.tree_index, leaves].sum(axis=1) / len(self.tree_index)
+
+    def predict_proba(self, X):
+        codes, on_grid = self.grid_codes(X)
+        if on_grid.all():
+            return self.lookup_proba(codes)
+
+        proba = np.empty((len(codes), len(self.classes_)), dtype=np.float64)
+        if on_grid.any():
+            proba[on_grid] = self.lookup_proba(codes[on_grid])
+        if self.fallback is None:
+            raise ValueError("Trait scores outside the integer-answer grid and no fallback engine")
+        proba[~on_grid] = self.fallback.predict_proba(np.asarray(X)[~on_grid])
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+    def memory_report(self):
+        return {
+            'masks_bytes': self.masks.nbytes,
+            'leaf_values_bytes': self.leaf_values.nbytes,
+            'total_bytes': self.nbytes,
+            'grid_cells': int(self.masks.shape[0] * self.masks.shape[1]),
+            'trees': int(self.masks.shape[2]),
+        }
+
+
+def load_or_build(model, model_path=DEFAULT_MODEL_PATH, table_path=DEFAULT_TABLE_PATH, fallback=None):
+    """Use the prebuilt table if it was built from this exact model file, otherwise build it now"""
+    model_sha256 = file_sha256(model_path)
+    if os.path.exists(table_path):
+        table = LookupTable.load(table_path, fallback=fallback)
+        if table.model_sha256 == model_sha256:
+            return table
+        print(f"⚠️ Lookup table at {table_path} was built from a different model, rebuilding")
+    return LookupTable.build(model, fallback=fallback, model_sha256=model_sha256)
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else "report"
+    model_path = argv[2] if len(argv) > 2 else DEFAULT_MODEL_PATH
+    table_path = argv[3] if len(argv) > 3 else DEFAULT_TABLE_PATH
+
+    model = load_pickle(model_path)
+
+    if command == "build":
+        table = LookupTable.build(model, model_sha256=file_sha256(model_path))
+        table.save(table_path)
+        print(f"✅ Lookup table written to {table_path}")
+    elif command == "report":
+        table = load_or_build(model, model_path, table_path)
+    else:
+        print("Usage: python lookup_table.py [build|report] [model_path] [table_path]")
+        return 1
+
+    report = table.memory_report()
+    print(f"   Trees: {report['trees']}, grid cells: {report['grid_cells']}")
+    print(f"   Leaf masks:  {report['masks_bytes'] / 1024:.1f} KiB")
+    print(f"   Leaf values: {report['leaf_values_bytes'] / 1024:.1f} KiB")
+    print(f"   Total:       {report['total_bytes'] / 1024:.1f} KiB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -1,13 +1,32 @@
+"""
+House Sorting Hat API (Flask).
+
+Importing this module is cheap: it reads the configuration and sets up the
+process-wide state (model registry, caches, metrics), but neither builds the
+Flask app nor loads the model, so sklearn (pulled in by the pickle) is only
+imported once a model is needed. create_app() builds the app; `main.app` is a
+default one, created on first access, which is what `gunicorn main:app` and
+`python main.py` serve. The model is loaded by load_model(), when the app is
+created (MODEL_LOADING=eager) or by the first request that needs it (lazy).
+"""
 from flask import Flask, request, jsonify
-import pickle
 import numpy as np
-import pandas as pd
+import hmac
 import os
+import threading
+import time
+
+from admission import ConcurrencyLimiter, Overloaded, RateLimiter
+from features import FEATURE_NAMES, TRAIT_NAMES, trait_scores_for, validate_answers, validate_many
+from metrics import Metrics, error_type
+from model_artifact import DEFAULT_ARTIFACT_PATH, checksum_path, file_sha256, load_artifact, load_pickle
+from model_registry import ModelRegistry, ModelVersion
+from prediction_cache import PredictionCache
+from static_payload import StaticPayload
+from submission_log import SubmissionLog
 
-app = Flask(__name__)
 
 # Enable CORS manually if needed
-@app.after_request
 def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
@@ -16,32 +35,416 @@ def after_request(response):
 
 MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "house_sorting_model.pkl")
 
-model = None
-try:
-    with open(MODEL_PATH, "rb") as f:
-        model = pickle.load(f)
-    print("✅ Model loaded successfully!")
-except FileNotFoundError:
-    print(f"❌ Model file not found at {MODEL_PATH}. Please ensure it exists in the repo root.")
-except Exception as e:
-    print(f"⚠️ Error loading model: {e}")
-
-# Define the feature names in the correct order (as they were in training)
-FEATURE_NAMES = [
-    'Bravery', 'Intelligence', 'Loyalty', 'Ambition', 
-    'Dark Arts Knowledge', 'Quidditch Skills', 'Dueling Skills', 'Creativity'
-]
+# When each process loads the model:
+#   "eager" - when the app is created. With `gunicorn --preload` that is once, in the master,
+#             and the forked workers share the loaded model copy-on-write; without --preload
+#             every worker loads its own copy while booting
+#   "lazy"  - on the first request that needs it, in each worker after it has forked
+MODEL_LOADING = os.environ.get('MODEL_LOADING', 'eager')
 
-@app.route('/', methods=['GET'])
-def home():
-    """Health check endpoint"""
-    return jsonify({
+# Per-stage latency histograms and counters served at /metrics (METRICS_ENABLED=0 turns them off)
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+metrics = Metrics(enabled=METRICS_ENABLED)
+
+# How the model is loaded:
+#   "pickle"   - unpickle house_sorting_model.pkl (checked against its .sha256 file)
+#   "artifact" - memory-map the exported forest (python model_artifact.py export, or
+#                python compact_forest.py export for the compact form);
+#                no sklearn import, and preforked workers share the pages
+MODEL_FORMAT = os.environ.get('MODEL_FORMAT', 'pickle')
+MODEL_ARTIFACT_PATH = os.environ.get('MODEL_ARTIFACT_PATH', DEFAULT_ARTIFACT_PATH)
+
+# Which engine scores /predict requests:
+#   "flat"    - the forest exported into flat NumPy arrays (inference.FlatForest)
+#   "lookup"  - precomputed table for integer-only answers (lookup_table.LookupTable),
+#               falling back to the flat engine for fractional answers
+#   "compact" - the forest quantized to uint8 thresholds and uint16 leaf probabilities
+#               (compact_forest.CompactForest), a fraction of the flat engine's memory
+#   "sklearn" - the unpickled RandomForestClassifier itself
+INFERENCE_ENGINE = os.environ.get('INFERENCE_ENGINE', 'flat')
+# Default: lookup_table.DEFAULT_TABLE_PATH
+LOOKUP_TABLE_PATH = os.environ.get('LOOKUP_TABLE_PATH')
+
+# Seconds between checks of the model file for a new version (0 disables hot reload by watching)
+MODEL_WATCH_INTERVAL = float(os.environ.get('MODEL_WATCH_INTERVAL', 5))
+# Bearer token for POST /admin/reload and for submitting confirmed "house" labels; admin features are off when unset
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+
+def admin_authorized(authorization):
+    """True if an Authorization header value carries ADMIN_TOKEN as a bearer token"""
+    if not ADMIN_TOKEN or not authorization:
+        return False
+    supplied = authorization.removeprefix('Bearer ').strip()
+    return hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode())
+
+# Rows every newly loaded model is smoke-tested on before it serves traffic
+SMOKE_TEST_ROWS = np.vstack([
+    np.random.default_rng(0).uniform(0, 10, size=(48, len(FEATURE_NAMES))),
+    np.repeat(np.arange(0, 11, 2, dtype=float)[:, None], len(FEATURE_NAMES), axis=1),
+])
+
+
+def load_model_version():
+    """
+    Load the configured model and build its inference engine.
+    Raises if the model itself cannot be loaded; if an engine cannot be built,
+    falls back to a simpler one
+    """
+    # Engine modules are imported here rather than at the top, so `import main` does not pay for them
+    from compact_forest import CompactForest
+    from inference import FlatForest
+    from lookup_table import DEFAULT_TABLE_PATH, load_or_build as load_lookup_table
+
+    started = time.perf_counter()
+    model = None
+    artifact = None
+    engine_name = INFERENCE_ENGINE
+
+    if MODEL_FORMAT == 'artifact':
+        artifact = load_artifact(MODEL_ARTIFACT_PATH)
+        source = MODEL_ARTIFACT_PATH
+        version = artifact.source_sha256 or file_sha256(MODEL_ARTIFACT_PATH)
+        print("✅ Model artifact memory-mapped successfully!")
+    else:
+        model = load_pickle(MODEL_PATH)
+        source = MODEL_PATH
+        version = file_sha256(MODEL_PATH)
+        print("✅ Model loaded successfully!")
+
+    engine = model
+    if artifact is not None:
+        # The artifact is already a flat or compact forest; the other engines need the sklearn model
+        artifact_engine = getattr(artifact, 'ARTIFACT_KIND', 'flat')
+        if engine_name != artifact_engine:
+            print(f"⚠️ INFERENCE_ENGINE={engine_name} does not match the artifact, using {artifact_engine} engine")
+        engine_name = artifact_engine
+        engine = artifact
+    elif engine_name == 'compact':
+        try:
+            engine = CompactForest.from_sklearn(model)
+            print(f"✅ Compact inference engine ready ({engine.n_estimators} trees, {engine.nbytes / 1024:.0f} KiB)")
+        except Exception as e:
+            engine_name = 'flat'
+            print(f"⚠️ Could not build compact inference engine, using flat engine: {e}")
+    if model is not None and engine_name in ('flat', 'lookup'):
+        try:
+            engine = FlatForest.from_sklearn(model)
+            print(f"✅ Flat inference engine ready ({engine.n_estimators} trees, {engine.node_count} nodes)")
+        except Exception as e:
+            engine_name = 'sklearn'
+            print(f"⚠️ Could not build flat inference engine, using sklearn: {e}")
+
+    if model is not None and engine_name == 'lookup':
+        try:
+            engine = load_lookup_table(model, MODEL_PATH, LOOKUP_TABLE_PATH or DEFAULT_TABLE_PATH, fallback=engine)
+            print(f"✅ Lookup table ready ({engine.nbytes / 1024:.0f} KiB)")
+        except Exception as e:
+            engine_name = 'flat'
+            print(f"⚠️ Could not build lookup table, using flat engine: {e}")
+
+    return ModelVersion(engine, model, artifact, engine_name, version, source, time.perf_counter() - started)
+
+
+# LRU cache of probabilities keyed on the model version and the 8 trait averages (0 disables it)
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 4096))
+prediction_cache = PredictionCache(PREDICTION_CACHE_SIZE)
+# Same for the explanation payloads of /predict?explain=1
+EXPLANATION_CACHE_SIZE = int(os.environ.get('EXPLANATION_CACHE_SIZE', 1024))
+explanation_cache = PredictionCache(EXPLANATION_CACHE_SIZE)
+
+# The serving version is model_registry.current. use_model_version() mirrors it into the
+# module-level names model, artifact and engine for code that reads main.engine; until
+# the model is loaded, reading one of them loads it (see __getattr__ below)
+
+
+def use_model_version(version):
+    """Swap a new version in; requests already running keep the version they started with"""
+    global model, artifact, engine, house_stats
+    model, artifact, engine = version.model, version.artifact, version.engine
+    # Opened with the first version that loads; reloads never change the houses
+    if house_stats is None:
+        house_stats = open_house_stats(version.engine.classes_)
+    # Entries of the previous version can never be hit again
+    prediction_cache.clear()
+    explanation_cache.clear()
+    metrics.set_gauge('model_load_seconds', version.load_seconds,
+                      'Time to load the serving model and build its inference engine')
+
+
+model_registry = ModelRegistry(
+    load_model_version,
+    SMOKE_TEST_ROWS,
+    on_swap=use_model_version,
+    watch_paths=(MODEL_ARTIFACT_PATH,) if MODEL_FORMAT == 'artifact' else (MODEL_PATH, checksum_path(MODEL_PATH)),
+    poll_interval=MODEL_WATCH_INTERVAL,
+)
+_model_lock = threading.Lock()
+_model_attempted = False
+
+
+def load_model():
+    """
+    Load the model into this process on first call, and start watching its file.
+    Later calls return straight away. Returns the serving ModelVersion, or None
+    if the model could not be loaded
+    """
+    global _model_attempted
+    if _model_attempted:
+        return model_registry.current
+    with _model_lock:
+        if _model_attempted:
+            return model_registry.current
+        try:
+            model_registry.set_current(load_model_version())
+        except FileNotFoundError:
+            if MODEL_FORMAT == 'artifact':
+                print(f"❌ Model artifact not found at {MODEL_ARTIFACT_PATH}. Run: python model_artifact.py export")
+            else:
+                print(f"❌ Model file not found at {MODEL_PATH}. Please ensure it exists in the repo root.")
+        except Exception as e:
+            print(f"⚠️ Error loading model: {e}")
+        model_registry.start_watching()
+        _model_attempted = True
+    return model_registry.current
+
+
+def __getattr__(name):
+    # main.model / main.artifact / main.engine before anything loaded the model
+    if name in ('model', 'artifact', 'engine'):
+        load_model()
+        return globals().get(name)
+    if name == 'app':
+        with _model_lock:
+            if 'app' not in globals():
+                globals()['app'] = create_app(load=False)
+        if MODEL_LOADING == 'eager':
+            load_model()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Append-only log of scored submissions for incremental_train.py (disabled when unset)
+SUBMISSION_LOG_PATH = os.environ.get('SUBMISSION_LOG_PATH')
+submission_log = SubmissionLog(SUBMISSION_LOG_PATH) if SUBMISSION_LOG_PATH else None
+
+
+def log_submission(data, features, predicted_house, prediction_proba, trusted=False):
+    """
+    Queue a scored questionnaire for the submission log. A valid "house" in the request
+    is its confirmed label only from a trusted (ADMIN_TOKEN) caller; anyone else's is
+    ignored, so anonymous clients cannot steer incremental training
+    """
+    if submission_log is None:
+        return
+    label = data.get('house') if trusted else None
+    if not isinstance(label, str) or label not in model_registry.current.engine.classes_:
+        label = None
+    submission_log.record(features, predicted_house, prediction_proba.max(), label)
+
+
+# Running house counts, trait means/variances and winning-probability histogram for /stats.
+# With STATS_PATH set they live in a file every worker maps and are persisted every
+# STATS_FLUSH_INTERVAL seconds; otherwise each process keeps its own, in memory
+STATS_PATH = os.environ.get('STATS_PATH')
+STATS_FLUSH_INTERVAL = float(os.environ.get('STATS_FLUSH_INTERVAL', 5))
+# Opened when the first model version is swapped in, once the houses are known
+house_stats = None
+
+
+def open_house_stats(houses):
+    from house_stats import HouseStats
+
+    try:
+        return HouseStats(houses, TRAIT_NAMES, path=STATS_PATH, flush_interval=STATS_FLUSH_INTERVAL)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not open house statistics at {STATS_PATH}, keeping them in memory: {e}")
+        return HouseStats(houses, TRAIT_NAMES)
+
+
+def record_sorting(data, features, predicted_house, prediction_proba, trusted=False):
+    """Everything kept about a scored questionnaire: the submission log and the /stats aggregates"""
+    log_submission(data, features, predicted_house, prediction_proba, trusted)
+    if house_stats is not None:
+        house_stats.record(features, int(np.argmax(prediction_proba)), float(prediction_proba.max()))
+
+
+# Admission control (admission.py). Requests per second and burst allowed per client (0 turns rate limiting off);
+# clients are told apart by RATE_LIMIT_CLIENT_HEADER when set (e.g. X-Forwarded-For behind a proxy), else the peer address.
+# Proxies append to that header, so only the last RATE_LIMIT_TRUSTED_PROXIES entries were not written by the client
+RATE_LIMIT_PER_SECOND = float(os.environ.get('RATE_LIMIT_PER_SECOND', 0))
+RATE_LIMIT_BURST = int(os.environ.get('RATE_LIMIT_BURST', 20))
+RATE_LIMIT_CLIENT_HEADER = os.environ.get('RATE_LIMIT_CLIENT_HEADER')
+RATE_LIMIT_TRUSTED_PROXIES = int(os.environ.get('RATE_LIMIT_TRUSTED_PROXIES', 1))
+# Requests allowed in inference at once (0 turns the limiter off), how many may wait for a slot,
+# and the longest a request may wait before it is shed with 503
+MAX_CONCURRENT_INFERENCES = int(os.environ.get('MAX_CONCURRENT_INFERENCES', 4))
+MAX_QUEUED_REQUESTS = int(os.environ.get('MAX_QUEUED_REQUESTS', 64))
+LATENCY_BUDGET_MS = float(os.environ.get('LATENCY_BUDGET_MS', 1000))
+
+rate_limiter = RateLimiter(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+inference_limiter = ConcurrencyLimiter(MAX_CONCURRENT_INFERENCES, MAX_QUEUED_REQUESTS, LATENCY_BUDGET_MS / 1000)
+
+
+def client_id(headers, peer):
+    """
+    Rate-limit key: the address RATE_LIMIT_TRUSTED_PROXIES entries from the right of
+    RATE_LIMIT_CLIENT_HEADER (the one our outermost proxy saw), else the peer address.
+    Entries further left are whatever the client sent, so they cannot pick their own bucket
+    """
+    if RATE_LIMIT_CLIENT_HEADER and RATE_LIMIT_TRUSTED_PROXIES > 0:
+        value = headers.get(RATE_LIMIT_CLIENT_HEADER)
+        if value:
+            entries = [entry.strip() for entry in value.split(',')]
+            if len(entries) >= RATE_LIMIT_TRUSTED_PROXIES and entries[-RATE_LIMIT_TRUSTED_PROXIES]:
+                return entries[-RATE_LIMIT_TRUSTED_PROXIES]
+    return peer
+
+
+def rate_limited_payload(retry_after):
+    """Body and headers of a 429 for a client over its rate"""
+    retry_after = max(1, int(retry_after + 0.999))
+    return {'error': 'Too many requests', 'retry_after': retry_after}, {'Retry-After': str(retry_after)}
+
+
+def overloaded_payload(error):
+    """Body and headers of a 503 for a request shed by the inference limiter"""
+    return {'error': 'Server overloaded', 'reason': error.reason, 'retry_after': error.retry_after}, \
+        {'Retry-After': str(error.retry_after)}
+
+
+def health_payload():
+    return {
         'message': 'House Sorting Hat API is running!',
-        'model_loaded': model is not None,
+        'model_loaded': model_registry.current is not None,
+        'model_loading': MODEL_LOADING,
+        'model_format': MODEL_FORMAT,
+        'inference_engine': model_registry.current.engine_name if model_registry.current else INFERENCE_ENGINE,
+        'model_version': model_registry.stats(),
+        'prediction_cache': prediction_cache.stats(),
+        'submission_log': submission_log.stats() if submission_log is not None else None,
+        'admission': {'rate_limit': rate_limiter.stats(), 'inference': inference_limiter.stats()},
         'features_required': FEATURE_NAMES
-    })
+    }
+
+def home():
+    """Health check endpoint"""
+    return jsonify(health_payload())
+
+# Upper bound on questionnaires accepted by a single /predict/batch call
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 1000))
+
+
+def predict_with_proba(features_array, use_cache=True, current=None):
+    """
+    Score an (N, 8) feature matrix with a single pass through the forest.
+    RandomForestClassifier.predict is just the argmax of predict_proba, so the
+    labels are taken from the probabilities instead of walking every tree twice.
+    Rows already in the prediction cache skip the forest; the rest are scored together.
+    The whole call uses the version that was serving when it started (or `current`),
+    even if a reload swaps mid-call.
+    Returns (predicted_houses, prediction_proba)
+    """
+    current = current or model_registry.current or load_model()
+    if use_cache and prediction_cache.maxsize > 0:
+        prediction_proba = cached_predict_proba(features_array, current)
+    else:
+        prediction_proba = current.engine.predict_proba(features_array)
+    predictions = current.engine.classes_.take(np.argmax(prediction_proba, axis=1))
+    return predictions, prediction_proba
+
+
+def cached_predict_proba(features_array, current):
+    """predict_proba that serves repeat feature vectors from prediction_cache"""
+    # Keyed on the version too, so a request finishing on the old model cannot poison the new one's entries
+    keys = [(current.version, PredictionCache.make_key(row)) for row in features_array]
+    rows = [prediction_cache.get(key) for key in keys]
+    missing = [i for i, proba in enumerate(rows) if proba is None]
+
+    if missing:
+        computed = current.engine.predict_proba(features_array[missing])
+        for i, proba in zip(missing, computed):
+            proba = proba.copy()
+            proba.flags.writeable = False
+            prediction_cache.put(keys[i], proba)
+            rows[i] = proba
+
+    return np.vstack(rows)
+
+
+def explainer_for(current):
+    """The version's PathExplainer, built on first use; None if the version has no float forest to decompose"""
+    if current.explainer is None:
+        from explain import PathExplainer
+        from inference import FlatForest
+
+        if isinstance(current.engine, FlatForest):
+            forest = current.engine
+        elif current.model is not None:
+            forest = FlatForest.from_sklearn(current.model)
+        else:
+            # A compact artifact keeps only leaf probabilities, not the inner nodes' the paths go through
+            return None
+        current.explainer = PathExplainer.from_flat(forest)
+    return current.explainer
+
+
+def explain_features(features_array, current=None):
+    """
+    Explanation payload for one row of trait averages: the baseline probabilities
+    (the forest's mean before any split) and each trait's contribution to every
+    house, in percentage points, which add up to the predicted probabilities.
+    Pass the ModelVersion that scored the row so both come from the same model.
+    Returns None when the model cannot be explained
+    """
+    current = current or model_registry.current
+    key = (current.version, PredictionCache.make_key(features_array[0]))
+    explanation = explanation_cache.get(key)
+    if explanation is not None:
+        return explanation
+
+    explainer = explainer_for(current)
+    if explainer is None:
+        return None
+    _, contributions = explainer.explain(features_array)
+    explanation = {
+        'baseline': format_probabilities(explainer.baseline, explainer.classes_),
+        'contributions': {
+            trait: {house: round(float(value) * 100, 2) for house, value in zip(explainer.classes_, row)}
+            for trait, row in zip(TRAIT_NAMES, contributions[0])
+        },
+    }
+    explanation_cache.put(key, explanation)
+    return explanation
+
+
+def predict_and_explain(features_array):
+    """predict_with_proba plus explain_features for the first row, both from the same model version"""
+    current = model_registry.current or load_model()
+    predictions, prediction_proba = predict_with_proba(features_array, current=current)
+    return predictions, prediction_proba, explain_features(features_array, current)
+
+
+def format_probabilities(prediction_proba, classes=None):
+    """Turn one row of predict_proba output into a {house: percent} dict; classes default to the serving model's"""
+    if classes is None:
+        classes = model_registry.current.engine.classes_
+    probabilities = {}
+    for i, house in enumerate(classes):
+        probabilities[house] = round(float(prediction_proba[i]) * 100, 2)
+    return probabilities
+
+
+def prediction_payload(data, predicted_house, prediction_proba, trait_scores):
+    """Response body for one scored questionnaire"""
+    return {
+        'predicted_house': predicted_house,
+        'probabilities': format_probabilities(prediction_proba),
+        'trait_scores': trait_scores,
+        'input_questions': len([q for q in data.keys() if q.startswith('q')])
+    }
+
 
-@app.route('/predict', methods=['POST'])
 def predict_house():
     """
     Predict Hogwarts house based on user answers to indirect questions
@@ -51,295 +454,461 @@ def predict_house():
         "q4": 6, "q5": 8, "q6": 7,  // intelligence questions
         ... // all 24 questions (q1-q24)
     }
+    With ?explain=1 the response also carries an "explanation": how much each
+    trait moved every house's probability away from the baseline
     """
+    timer = metrics.timer()
+    metrics.count_request('/predict')
     try:
-        if model is None:
+        if load_model() is None:
+            metrics.count_error('/predict', 'exception')
             return jsonify({'error': 'Model not loaded'}), 500
+
+        retry_after = rate_limiter.check(client_id(request.headers, request.remote_addr))
+        if retry_after is not None:
+            metrics.count_error('/predict', 'rate_limited')
+            payload, headers = rate_limited_payload(retry_after)
+            return jsonify(payload), 429, headers
         
         data = request.json
-        if not data:
-            return jsonify({'error': 'No JSON data provided'}), 400
-        
-        # Map questions to traits (3 questions per trait)
-        trait_mapping = {
-            'bravery': ['q1', 'q2', 'q3'],
-            'intelligence': ['q4', 'q5', 'q6'],
-            'loyalty': ['q7', 'q8', 'q9'],
-            'ambition': ['q10', 'q11', 'q12'],
-            'dark_arts_knowledge': ['q13', 'q14', 'q15'],
-            'quidditch_skills': ['q16', 'q17', 'q18'],
-            'dueling_skills': ['q19', 'q20', 'q21'],
-            'creativity': ['q22', 'q23', 'q24']
-        }
-        
-        # Validate all questions are answered
-        expected_questions = [f'q{i}' for i in range(1, 25)]
-        missing_questions = []
-        invalid_questions = []
-        
-        for q_id in expected_questions:
-            if q_id not in data:
-                missing_questions.append(q_id)
-            else:
-                value = data[q_id]
-                if not isinstance(value, (int, float)) or value < 0 or value > 10:
-                    invalid_questions.append(q_id)
-        
-        if missing_questions:
-            return jsonify({
-                'error': 'Missing required questions',
-                'missing': missing_questions,
-                'total_required': 24
-            }), 400
-            
-        if invalid_questions:
-            return jsonify({
-                'error': 'Invalid values provided (must be 0-10)',
-                'invalid_questions': invalid_questions
-            }), 400
-        
-        # Calculate average scores for each trait
-        trait_scores = {}
-        features = []
-        
-        for trait, question_ids in trait_mapping.items():
-            scores = [data[q_id] for q_id in question_ids]
-            average_score = sum(scores) / len(scores)
-            trait_scores[trait] = round(average_score, 2)
-            features.append(average_score)
+        timer.lap('parse')
+
+        error, features, trait_scores = validate_answers(data)
+        timer.lap('validate')
+        if error:
+            metrics.count_error('/predict', error_type(error))
+            return jsonify(error), 400
         
         # Convert to numpy array and reshape for prediction
         features_array = np.array(features).reshape(1, -1)
         
-        # Make prediction
-        prediction = model.predict(features_array)[0]
-        
-        # Get prediction probabilities for all houses
-        prediction_proba = model.predict_proba(features_array)[0]
-        house_names = model.classes_
-        
-        # Create probability dictionary
-        probabilities = {}
-        for i, house in enumerate(house_names):
-            probabilities[house] = round(float(prediction_proba[i]) * 100, 2)
-        
-        return jsonify({
-            'predicted_house': prediction,
-            'probabilities': probabilities,
-            'trait_scores': trait_scores,
-            'input_questions': len([q for q in data.keys() if q.startswith('q')])
-        })
+        # Make prediction and get probabilities for all houses in one pass
+        explain = request.args.get('explain') in ('1', 'true')
+        with inference_limiter.slot():
+            if explain:
+                predictions, prediction_proba, explanation = predict_and_explain(features_array)
+            else:
+                predictions, prediction_proba = predict_with_proba(features_array)
+        timer.lap('inference')
+
+        trusted = admin_authorized(request.headers.get('Authorization'))
+        record_sorting(data, features, predictions[0], prediction_proba[0], trusted)
+
+        payload = prediction_payload(data, predictions[0], prediction_proba[0], trait_scores)
+        if explain:
+            payload['explanation'] = explanation
+        response = jsonify(payload)
+        timer.lap('serialize')
+        timer.finish()
+        return response
+
+    except Overloaded as e:
+        metrics.count_error('/predict', 'overloaded')
+        payload, headers = overloaded_payload(e)
+        return jsonify(payload), 503, headers
     
     except Exception as e:
+        metrics.count_error('/predict', 'exception')
         return jsonify({'error': f'Prediction failed: {str(e)}'}), 500
 
-@app.route('/questions', methods=['GET'])
+def batch_payload(data, trusted=False):
+    """
+    Validate and score a list of questionnaires with a single model call.
+    trusted: the caller sent ADMIN_TOKEN, so "house" labels are logged.
+    Returns (response_body, status_code)
+    """
+    if isinstance(data, dict):
+        data = data.get('questionnaires')
+    if not isinstance(data, list) or not data:
+        return {'error': 'Expected a non-empty list of questionnaires'}, 400
+    if len(data) > MAX_BATCH_SIZE:
+        return {
+            'error': 'Too many questionnaires in one batch',
+            'max_batch_size': MAX_BATCH_SIZE
+        }, 400
+
+    results = [None] * len(data)
+    questionnaires = []
+    positions = []
+
+    for index, answers in enumerate(data):
+        if not isinstance(answers, dict):
+            results[index] = {'error': 'Questionnaire must be a JSON object', 'index': index}
+        else:
+            questionnaires.append(answers)
+            positions.append(index)
+
+    # One vectorized validation pass, one (N, 8) matrix, one pass through the forest
+    errors, features_array, valid_rows = validate_many(questionnaires)
+    for error, index in zip(errors, positions):
+        if error:
+            results[index] = dict(error, index=index)
+
+    if valid_rows:
+        predictions, prediction_proba = predict_with_proba(features_array)
+
+        for row, valid_row in enumerate(valid_rows):
+            index = positions[valid_row]
+            features = features_array[row].tolist()
+            record_sorting(questionnaires[valid_row], features, predictions[row], prediction_proba[row], trusted)
+            results[index] = {
+                'index': index,
+                'predicted_house': predictions[row],
+                'probabilities': format_probabilities(prediction_proba[row]),
+                'trait_scores': trait_scores_for(features)
+            }
+
+    return {
+        'results': results,
+        'total': len(data),
+        'succeeded': len(valid_rows),
+        'failed': len(data) - len(valid_rows)
+    }, 200
+
+
+def predict_house_batch():
+    """
+    Predict houses for many questionnaires with a single model call
+    Expected JSON format:
+    {
+        "questionnaires": [
+            {"q1": 8, "q2": 7, ..., "q24": 6},
+            ...
+        ]
+    }
+    A bare list of questionnaires is accepted as well. Each entry is validated
+    on its own, so a bad row gets an error in its slot instead of failing the batch.
+    """
+    metrics.count_request('/predict/batch')
+    try:
+        if load_model() is None:
+            metrics.count_error('/predict/batch', 'exception')
+            return jsonify({'error': 'Model not loaded'}), 500
+
+        retry_after = rate_limiter.check(client_id(request.headers, request.remote_addr))
+        if retry_after is not None:
+            metrics.count_error('/predict/batch', 'rate_limited')
+            payload, headers = rate_limited_payload(retry_after)
+            return jsonify(payload), 429, headers
+
+        data = request.json
+        with inference_limiter.slot():
+            payload, status = batch_payload(data, admin_authorized(request.headers.get('Authorization')))
+        if status != 200:
+            metrics.count_error('/predict/batch', 'invalid')
+        return jsonify(payload), status
+
+    except Overloaded as e:
+        metrics.count_error('/predict/batch', 'overloaded')
+        payload, headers = overloaded_payload(e)
+        return jsonify(payload), 503, headers
+
+    except Exception as e:
+        metrics.count_error('/predict/batch', 'exception')
+        return jsonify({'error': f'Batch prediction failed: {str(e)}'}), 500
+
+# Indirect questions that measure traits without revealing the connection to houses
+QUESTIONS = [
+    # Bravery Questions (bravery_1, bravery_2, bravery_3)
+    {
+        "id": "q1",
+        "question": "You're walking alone at night and hear strange noises in a dark alley. What do you do?",
+        "scale": "0 (Avoid completely) - 10 (Investigate immediately)",
+        "trait": "bravery"
+    },
+    {
+        "id": "q2", 
+        "question": "Your friend is being bullied by a group of older students. How likely are you to step in?",
+        "scale": "0 (Not at all) - 10 (Definitely step in)",
+        "trait": "bravery"
+    },
+    {
+        "id": "q3",
+        "question": "You have to give a presentation to 200 people. How do you feel?",
+        "scale": "0 (Terrified) - 10 (Excited and confident)",
+        "trait": "bravery"
+    },
+    
+    # Intelligence Questions (intelligence_1, intelligence_2, intelligence_3)
+    {
+        "id": "q4",
+        "question": "How often do you enjoy solving complex puzzles or riddles?",
+        "scale": "0 (Never) - 10 (All the time)",
+        "trait": "intelligence"
+    },
+    {
+        "id": "q5",
+        "question": "When learning something new, you prefer:",
+        "scale": "0 (Simple explanations) - 10 (Deep, detailed analysis)",
+        "trait": "intelligence"
+    },
+    {
+        "id": "q6",
+        "question": "How often do others come to you for advice on difficult problems?",
+        "scale": "0 (Never) - 10 (Very frequently)",
+        "trait": "intelligence"
+    },
+    
+    # Loyalty Questions (loyalty_1, loyalty_2, loyalty_3)
+    {
+        "id": "q7",
+        "question": "Your best friend asks you to keep a secret that could get them in trouble. You:",
+        "scale": "0 (Would tell) - 10 (Keep it no matter what)",
+        "trait": "loyalty"
+    },
+    {
+        "id": "q8",
+        "question": "How important is it to you to maintain long-term friendships?",
+        "scale": "0 (Not important) - 10 (Extremely important)",
+        "trait": "loyalty"
+    },
+    {
+        "id": "q9",
+        "question": "When a friend succeeds at something you wanted, you feel:",
+        "scale": "0 (Jealous) - 10 (Genuinely happy for them)",
+        "trait": "loyalty"
+    },
+    
+    # Ambition Questions (ambition_1, ambition_2, ambition_3)
+    {
+        "id": "q10",
+        "question": "How important is it for you to be the best at what you do?",
+        "scale": "0 (Not important) - 10 (Extremely important)",
+        "trait": "ambition"
+    },
+    {
+        "id": "q11",
+        "question": "When you see someone in a position of power, you think:",
+        "scale": "0 (I don't want that responsibility) - 10 (I could do that better)",
+        "trait": "ambition"
+    },
+    {
+        "id": "q12",
+        "question": "How often do you set challenging goals for yourself?",
+        "scale": "0 (Rarely) - 10 (Constantly)",
+        "trait": "ambition"
+    },
+    
+    # Dark Arts Knowledge Questions (dark_arts_1, dark_arts_2, dark_arts_3)
+    {
+        "id": "q13",
+        "question": "How interested are you in learning about forbidden or taboo subjects?",
+        "scale": "0 (Not interested) - 10 (Very interested)",
+        "trait": "dark_arts_knowledge"
+    },
+    {
+        "id": "q14",
+        "question": "If you could access any restricted section of a library, would you?",
+        "scale": "0 (No, rules exist for a reason) - 10 (Absolutely, knowledge is power)",
+        "trait": "dark_arts_knowledge"
+    },
+    {
+        "id": "q15",
+        "question": "How comfortable are you with using morally questionable methods to achieve good results?",
+        "scale": "0 (Very uncomfortable) - 10 (Completely comfortable)",
+        "trait": "dark_arts_knowledge"
+    },
+    
+    # Quidditch Skills Questions (quidditch_1, quidditch_2, quidditch_3)
+    {
+        "id": "q16",
+        "question": "How much do you enjoy competitive sports and physical activities?",
+        "scale": "0 (Not at all) - 10 (Love them)",
+        "trait": "quidditch_skills"
+    },
+    {
+        "id": "q17",
+        "question": "How good is your hand-eye coordination?",
+        "scale": "0 (Poor) - 10 (Excellent)",
+        "trait": "quidditch_skills"
+    },
+    {
+        "id": "q18",
+        "question": "How comfortable are you with heights and fast-moving activities?",
+        "scale": "0 (Very uncomfortable) - 10 (Love the thrill)",
+        "trait": "quidditch_skills"
+    },
+    
+    # Dueling Skills Questions (dueling_1, dueling_2, dueling_3)
+    {
+        "id": "q19",
+        "question": "When facing a conflict, you prefer to:",
+        "scale": "0 (Avoid confrontation) - 10 (Face it head-on)",
+        "trait": "dueling_skills"
+    },
+    {
+        "id": "q20",
+        "question": "How quickly can you react to unexpected situations?",
+        "scale": "0 (Very slowly) - 10 (Lightning fast)",
+        "trait": "dueling_skills"
+    },
+    {
+        "id": "q21",
+        "question": "How competitive are you when it comes to winning?",
+        "scale": "0 (Don't care about winning) - 10 (Must win)",
+        "trait": "dueling_skills"
+    },
+    
+    # Creativity Questions (creativity_1, creativity_2, creativity_3)
+    {
+        "id": "q22",
+        "question": "How often do you come up with unique solutions to problems?",
+        "scale": "0 (Rarely) - 10 (All the time)",
+        "trait": "creativity"
+    },
+    {
+        "id": "q23",
+        "question": "How much do you enjoy artistic or creative activities?",
+        "scale": "0 (Not at all) - 10 (Love them)",
+        "trait": "creativity"
+    },
+    {
+        "id": "q24",
+        "question": "When given rules, you tend to:",
+        "scale": "0 (Follow them exactly) - 10 (Find creative ways around them)",
+        "trait": "creativity"
+    }
+]
+
+# Information about Hogwarts houses
+HOUSES_INFO = {
+    'Gryffindor': {
+        'traits': ['Brave', 'Daring', 'Chivalrous', 'Courageous'],
+        'colors': ['Red', 'Gold'],
+        'element': 'Fire',
+        'animal': 'Lion'
+    },
+    'Hufflepuff': {
+        'traits': ['Loyal', 'Patient', 'Fair', 'Hard-working'],
+        'colors': ['Yellow', 'Black'],
+        'element': 'Earth',
+        'animal': 'Badger'
+    },
+    'Ravenclaw': {
+        'traits': ['Intelligent', 'Wise', 'Creative', 'Witty'],
+        'colors': ['Blue', 'Bronze'],
+        'element': 'Air',
+        'animal': 'Eagle'
+    },
+    'Slytherin': {
+        'traits': ['Ambitious', 'Cunning', 'Resourceful', 'Determined'],
+        'colors': ['Green', 'Silver'],
+        'element': 'Water',
+        'animal': 'Serpent'
+    }
+}
+
+
+def questions_payload():
+    return {
+        'questions': QUESTIONS,
+        'total_questions': len(QUESTIONS),
+        'instructions': 'Answer all questions honestly. Each question is rated on a scale of 0-10.'
+    }
+
+
+def houses_payload():
+    return {'houses': HOUSES_INFO}
+
+
+# /questions and /houses never change while the process runs, so encode them once
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', 3600))
+STATIC_GZIP = os.environ.get('STATIC_GZIP', '1') != '0'
+
+QUESTIONS_RESPONSE = StaticPayload(questions_payload(), max_age=STATIC_MAX_AGE, use_gzip=STATIC_GZIP)
+HOUSES_RESPONSE = StaticPayload(houses_payload(), max_age=STATIC_MAX_AGE, use_gzip=STATIC_GZIP)
+
+
+def static_response(static_payload):
+    status, headers, body = static_payload.respond(
+        request.headers.get('If-None-Match'),
+        request.headers.get('Accept-Encoding')
+    )
+    return Flask.response_class(body, status=status, headers=headers)
+
+
 def get_questions():
     """
     Return indirect questions that measure traits without revealing the connection to houses
     3 questions per trait (24 total) to calculate averages and prevent gaming
     """
-    questions = [
-        # Bravery Questions (bravery_1, bravery_2, bravery_3)
-        {
-            "id": "q1",
-            "question": "You're walking alone at night and hear strange noises in a dark alley. What do you do?",
-            "scale": "0 (Avoid completely) - 10 (Investigate immediately)",
-            "trait": "bravery"
-        },
-        {
-            "id": "q2", 
-            "question": "Your friend is being bullied by a group of older students. How likely are you to step in?",
-            "scale": "0 (Not at all) - 10 (Definitely step in)",
-            "trait": "bravery"
-        },
-        {
-            "id": "q3",
-            "question": "You have to give a presentation to 200 people. How do you feel?",
-            "scale": "0 (Terrified) - 10 (Excited and confident)",
-            "trait": "bravery"
-        },
-        
-        # Intelligence Questions (intelligence_1, intelligence_2, intelligence_3)
-        {
-            "id": "q4",
-            "question": "How often do you enjoy solving complex puzzles or riddles?",
-            "scale": "0 (Never) - 10 (All the time)",
-            "trait": "intelligence"
-        },
-        {
-            "id": "q5",
-            "question": "When learning something new, you prefer:",
-            "scale": "0 (Simple explanations) - 10 (Deep, detailed analysis)",
-            "trait": "intelligence"
-        },
-        {
-            "id": "q6",
-            "question": "How often do others come to you for advice on difficult problems?",
-            "scale": "0 (Never) - 10 (Very frequently)",
-            "trait": "intelligence"
-        },
-        
-        # Loyalty Questions (loyalty_1, loyalty_2, loyalty_3)
-        {
-            "id": "q7",
-            "question": "Your best friend asks you to keep a secret that could get them in trouble. You:",
-            "scale": "0 (Would tell) - 10 (Keep it no matter what)",
-            "trait": "loyalty"
-        },
-        {
-            "id": "q8",
-            "question": "How important is it to you to maintain long-term friendships?",
-            "scale": "0 (Not important) - 10 (Extremely important)",
-            "trait": "loyalty"
-        },
-        {
-            "id": "q9",
-            "question": "When a friend succeeds at something you wanted, you feel:",
-            "scale": "0 (Jealous) - 10 (Genuinely happy for them)",
-            "trait": "loyalty"
-        },
-        
-        # Ambition Questions (ambition_1, ambition_2, ambition_3)
-        {
-            "id": "q10",
-            "question": "How important is it for you to be the best at what you do?",
-            "scale": "0 (Not important) - 10 (Extremely important)",
-            "trait": "ambition"
-        },
-        {
-            "id": "q11",
-            "question": "When you see someone in a position of power, you think:",
-            "scale": "0 (I don't want that responsibility) - 10 (I could do that better)",
-            "trait": "ambition"
-        },
-        {
-            "id": "q12",
-            "question": "How often do you set challenging goals for yourself?",
-            "scale": "0 (Rarely) - 10 (Constantly)",
-            "trait": "ambition"
-        },
-        
-        # Dark Arts Knowledge Questions (dark_arts_1, dark_arts_2, dark_arts_3)
-        {
-            "id": "q13",
-            "question": "How interested are you in learning about forbidden or taboo subjects?",
-            "scale": "0 (Not interested) - 10 (Very interested)",
-            "trait": "dark_arts_knowledge"
-        },
-        {
-            "id": "q14",
-            "question": "If you could access any restricted section of a library, would you?",
-            "scale": "0 (No, rules exist for a reason) - 10 (Absolutely, knowledge is power)",
-            "trait": "dark_arts_knowledge"
-        },
-        {
-            "id": "q15",
-            "question": "How comfortable are you with using morally questionable methods to achieve good results?",
-            "scale": "0 (Very uncomfortable) - 10 (Completely comfortable)",
-            "trait": "dark_arts_knowledge"
-        },
-        
-        # Quidditch Skills Questions (quidditch_1, quidditch_2, quidditch_3)
-        {
-            "id": "q16",
-            "question": "How much do you enjoy competitive sports and physical activities?",
-            "scale": "0 (Not at all) - 10 (Love them)",
-            "trait": "quidditch_skills"
-        },
-        {
-            "id": "q17",
-            "question": "How good is your hand-eye coordination?",
-            "scale": "0 (Poor) - 10 (Excellent)",
-            "trait": "quidditch_skills"
-        },
-        {
-            "id": "q18",
-            "question": "How comfortable are you with heights and fast-moving activities?",
-            "scale": "0 (Very uncomfortable) - 10 (Love the thrill)",
-            "trait": "quidditch_skills"
-        },
-        
-        # Dueling Skills Questions (dueling_1, dueling_2, dueling_3)
-        {
-            "id": "q19",
-            "question": "When facing a conflict, you prefer to:",
-            "scale": "0 (Avoid confrontation) - 10 (Face it head-on)",
-            "trait": "dueling_skills"
-        },
-        {
-            "id": "q20",
-            "question": "How quickly can you react to unexpected situations?",
-            "scale": "0 (Very slowly) - 10 (Lightning fast)",
-            "trait": "dueling_skills"
-        },
-        {
-            "id": "q21",
-            "question": "How competitive are you when it comes to winning?",
-            "scale": "0 (Don't care about winning) - 10 (Must win)",
-            "trait": "dueling_skills"
-        },
-        
-        # Creativity Questions (creativity_1, creativity_2, creativity_3)
-        {
-            "id": "q22",
-            "question": "How often do you come up with unique solutions to problems?",
-            "scale": "0 (Rarely) - 10 (All the time)",
-            "trait": "creativity"
-        },
-        {
-            "id": "q23",
-            "question": "How much do you enjoy artistic or creative activities?",
-            "scale": "0 (Not at all) - 10 (Love them)",
-            "trait": "creativity"
-        },
-        {
-            "id": "q24",
-            "question": "When given rules, you tend to:",
-            "scale": "0 (Follow them exactly) - 10 (Find creative ways around them)",
-            "trait": "creativity"
-        }
-    ]
-    
-    return jsonify({
-        'questions': questions,
-        'total_questions': len(questions),
-        'instructions': 'Answer all questions honestly. Each question is rated on a scale of 0-10.'
-    })
+    return static_response(QUESTIONS_RESPONSE)
 
-@app.route('/houses', methods=['GET'])
 def get_houses():
     """
     Return information about Hogwarts houses
     """
-    houses_info = {
-        'Gryffindor': {
-            'traits': ['Brave', 'Daring', 'Chivalrous', 'Courageous'],
-            'colors': ['Red', 'Gold'],
-            'element': 'Fire',
-            'animal': 'Lion'
-        },
-        'Hufflepuff': {
-            'traits': ['Loyal', 'Patient', 'Fair', 'Hard-working'],
-            'colors': ['Yellow', 'Black'],
-            'element': 'Earth',
-            'animal': 'Badger'
-        },
-        'Ravenclaw': {
-            'traits': ['Intelligent', 'Wise', 'Creative', 'Witty'],
-            'colors': ['Blue', 'Bronze'],
-            'element': 'Air',
-            'animal': 'Eagle'
-        },
-        'Slytherin': {
-            'traits': ['Ambitious', 'Cunning', 'Resourceful', 'Determined'],
-            'colors': ['Green', 'Silver'],
-            'element': 'Water',
-            'animal': 'Serpent'
-        }
-    }
-    
-    return jsonify({'houses': houses_info})
+    return static_response(HOUSES_RESPONSE)
+
+def get_metrics():
+    """
+    Prometheus-style text metrics: per-stage /predict latency histograms,
+    request and error counters, and model load time
+    """
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Flask.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def get_stats():
+    """
+    House distribution, per-house and overall trait means and standard deviations,
+    and the winning-probability histogram over every sorting so far
+    """
+    if load_model() is None:
+        return jsonify({'error': 'Model not loaded'}), 500
+    return jsonify(house_stats.summary())
+
+def reload_payload(authorization, wait):
+    """(body, status) of an admin reload request; blocks until the reload is done when `wait`"""
+    if not ADMIN_TOKEN:
+        return {'error': 'Admin endpoints are disabled'}, 404
+    if not admin_authorized(authorization):
+        return {'error': 'Unauthorized'}, 401
+
+    if not wait:
+        model_registry.reload()
+        return {'status': 'reloading', 'model_version': model_registry.stats()}, 202
+
+    reloaded = model_registry.reload(wait=True)
+    return {'reloaded': reloaded, 'model_version': model_registry.stats()}, 200 if reloaded else 409
+
+
+def reload_model():
+    """
+    Load the model file again and swap it in once it passes the smoke test.
+    Needs ADMIN_TOKEN as a bearer token. Runs in the background (202) unless
+    ?wait=1, which answers with the outcome. Only the worker handling the
+    request reloads; file watching reaches every worker
+    """
+    payload, status = reload_payload(request.headers.get('Authorization'), request.args.get('wait') in ('1', 'true'))
+    return jsonify(payload), status
+
+ROUTES = [
+    ('/', home, ['GET']),
+    ('/predict', predict_house, ['POST']),
+    ('/predict/batch', predict_house_batch, ['POST']),
+    ('/questions', get_questions, ['GET']),
+    ('/houses', get_houses, ['GET']),
+    ('/metrics', get_metrics, ['GET']),
+    ('/stats', get_stats, ['GET']),
+    ('/admin/reload', reload_model, ['POST']),
+]
+
+
+def create_app(load=None):
+    """
+    Build the Flask app. load=True loads the model now, False leaves it to the
+    first request; the default follows MODEL_LOADING. Every app created in a
+    process serves the same model registry, caches and metrics
+    """
+    app = Flask(__name__)
+    app.after_request(after_request)
+    for rule, view, methods in ROUTES:
+        app.add_url_rule(rule, view_func=view, methods=methods)
+    if load if load is not None else MODEL_LOADING == 'eager':
+        load_model()
+    return app
+
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
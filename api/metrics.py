@@ -0,0 +1,155 @@
+"""
+Low-overhead request metrics, exposed in the Prometheus text format.
+
+/predict records how long each stage of a request takes (JSON parsing,
+validation and trait averaging, inference, serialization) into fixed-bucket
+histograms, plus request and error counters. Recording is a perf_counter()
+call and a bisect per stage. With metrics disabled every call site gets the
+shared NullTimer, whose methods do nothing.
+
+Metrics are kept per process; with several gunicorn workers each one reports
+its own numbers.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds in seconds: 50us .. 2.5s
+DEFAULT_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5
+)
+
+
+class Histogram:
+    """Cumulative-on-render histogram with fixed bucket bounds"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # One slot per bound plus +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[slot] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class StageTimer:
+    """Times consecutive stages of one request: each lap() closes the stage that just ran"""
+
+    __slots__ = ('metrics', 'start', 'last')
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.start = self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.metrics.observe(stage, now - self.last)
+        self.last = now
+
+    def finish(self):
+        self.metrics.observe('total', time.perf_counter() - self.start)
+
+
+class NullTimer:
+    __slots__ = ()
+
+    def lap(self, stage):
+        pass
+
+    def finish(self):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+class Metrics:
+    def __init__(self, enabled=True, namespace='house_sorting'):
+        self.enabled = enabled
+        self.namespace = namespace
+        self.stages = {}
+        self.requests = {}
+        self.errors = {}
+        self.gauges = {}
+        self._lock = threading.Lock()
+
+    def timer(self):
+        return StageTimer(self) if self.enabled else NULL_TIMER
+
+    def observe(self, stage, seconds):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.stages.setdefault(stage, Histogram())
+        histogram.observe(seconds)
+
+    def _increment(self, counters, key):
+        with self._lock:
+            counters[key] = counters.get(key, 0) + 1
+
+    def count_request(self, endpoint):
+        if self.enabled:
+            self._increment(self.requests, endpoint)
+
+    def count_error(self, endpoint, error_type):
+        if self.enabled:
+            self._increment(self.errors, (endpoint, error_type))
+
+    def set_gauge(self, name, value, help_text=''):
+        # Gauges are set once (e.g. at startup), so they are kept even when disabled
+        self.gauges[name] = (value, help_text)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        ns = self.namespace
+        lines = []
+
+        for name, (value, help_text) in sorted(self.gauges.items()):
+            lines.append(f'# HELP {ns}_{name} {help_text}')
+            lines.append(f'# TYPE {ns}_{name} gauge')
+            lines.append(f'{ns}_{name} {value}')
+
+        lines.append(f'# HELP {ns}_requests_total Requests received, by endpoint')
+        lines.append(f'# TYPE {ns}_requests_total counter')
+        for endpoint, count in sorted(self.requests.items()):
+            lines.append(f'{ns}_requests_total{{endpoint="{endpoint}"}} {count}')
+
+        lines.append(f'# HELP {ns}_errors_total Failed requests, by endpoint and error type')
+        lines.append(f'# TYPE {ns}_errors_total counter')
+        for (endpoint, error_type), count in sorted(self.errors.items()):
+            lines.append(f'{ns}_errors_total{{endpoint="{endpoint}",type="{error_type}"}} {count}')
+
+        lines.append(f'# HELP {ns}_stage_seconds Time spent in each stage of /predict')
+        lines.append(f'# TYPE {ns}_stage_seconds histogram')
+        for stage, histogram in sorted(self.stages.items()):
+            counts, total, count = histogram.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{ns}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{ns}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{ns}_stage_seconds_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{ns}_stage_seconds_count{{stage="{stage}"}} {count}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def error_type(error):
+    """Classify a validation error body from features.validate_answers"""
+    if 'missing' in error:
+        return 'missing'
+    if 'invalid_questions' in error:
+        return 'invalid'
+    return 'no_data'
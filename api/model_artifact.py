@@ -0,0 +1,202 @@
+"""
+Model loading: a flat, memory-mappable forest artifact, or the original pickle
+with an integrity check.
+
+The artifact holds the FlatForest node arrays behind a small JSON header:
+
+    b"HSFOREST" | uint32 version | uint64 header length | JSON header | arrays
+
+Each array starts on a 64-byte boundary so it can be mapped read-only with
+np.memmap. Loading it needs neither pickle nor sklearn, takes a few
+milliseconds, and preforked workers share the same page-cache pages instead
+of each holding a private copy of the trees.
+
+Export the artifact and the pickle checksum from the api directory:
+    python model_artifact.py export [model.pkl] [model.forest]
+    python model_artifact.py checksum [model.pkl]
+"""
+import hashlib
+import hmac
+import json
+import os
+import pickle
+import struct
+import sys
+
+import numpy as np
+
+MAGIC = b"HSFOREST"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct("<8sIQ")
+
+ARRAY_NAMES = ("feature", "threshold", "children", "value", "roots")
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "house_sorting_model.pkl")
+DEFAULT_ARTIFACT_PATH = os.path.join(os.path.dirname(__file__), "..", "house_sorting_model.forest")
+
+
+class ModelIntegrityError(Exception):
+    """The model file does not match its expected checksum"""
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def checksum_path(model_path):
+    return model_path + ".sha256"
+
+
+def write_checksum(model_path):
+    """Record the pickle's SHA-256 next to it, for load_pickle to verify"""
+    sha256 = file_sha256(model_path)
+    with open(checksum_path(model_path), "w") as f:
+        f.write(f"{sha256}  {os.path.basename(model_path)}\n")
+    return sha256
+
+
+def expected_checksum(model_path):
+    """MODEL_SHA256 from the environment, else the .sha256 file next to the model, else None"""
+    expected = os.environ.get("MODEL_SHA256")
+    if expected:
+        return expected.strip().lower()
+    try:
+        with open(checksum_path(model_path)) as f:
+            return f.read().split()[0].lower()
+    except (FileNotFoundError, IndexError):
+        return None
+
+
+def load_pickle(model_path, verify=True):
+    """
+    Unpickle the sklearn model, refusing to if it does not match its recorded SHA-256.
+    Unpickling runs arbitrary code, so a tampered or truncated file must never reach pickle.load
+    """
+    with open(model_path, "rb") as f:
+        payload = f.read()
+
+    if verify:
+        expected = expected_checksum(model_path)
+        if expected is None:
+            print(f"⚠️ No checksum found for {model_path}; loading pickle without integrity check")
+        elif not hmac.compare_digest(hashlib.sha256(payload).hexdigest(), expected):
+            raise ModelIntegrityError(f"SHA-256 of {model_path} does not match the expected checksum")
+
+    return pickle.loads(payload)
+
+
+def export_artifact(forest, artifact_path, source_sha256=None):
+    """Write a FlatForest or CompactForest to the flat binary format"""
+    # Checked by name rather than isinstance: `python compact_forest.py export` runs the class as __main__
+    kind = getattr(forest, "ARTIFACT_KIND", "flat")
+    if kind == "compact":
+        # Already fixed-width apart from the roots
+        arrays = {name: np.ascontiguousarray(getattr(forest, name)) for name in forest.ARRAY_NAMES}
+        arrays["roots"] = arrays["roots"].astype(np.int64)
+    else:
+        arrays = {name: np.ascontiguousarray(getattr(forest, name)) for name in ARRAY_NAMES}
+        # Fixed-width index types keep the file portable between 32 and 64-bit builds
+        for name in ("feature", "children", "roots"):
+            arrays[name] = arrays[name].astype(np.int64)
+
+    header = {
+        "kind": kind,
+        "classes": [str(c) for c in forest.classes_],
+        "max_depth": int(forest.max_depth),
+        "n_features_in": int(forest.n_features_in_),
+        "source_sha256": source_sha256,
+        "arrays": {},
+    }
+
+    # Lay the arrays out after the header; the header size depends on the offsets,
+    # so leave generous fixed room for it
+    offset = _align(_PREAMBLE.size + 4096)
+    for name, array in arrays.items():
+        header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = _align(offset + array.nbytes)
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    if _PREAMBLE.size + len(header_bytes) > min(spec["offset"] for spec in header["arrays"].values()):
+        raise ValueError("Artifact header too large")
+
+    tmp_path = artifact_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(header["arrays"][name]["offset"])
+            f.write(array.tobytes())
+    os.replace(tmp_path, artifact_path)
+
+
+def read_header(artifact_path):
+    with open(artifact_path, "rb") as f:
+        magic, version, header_length = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError(f"{artifact_path} is not a forest artifact")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported forest artifact version {version}")
+        return json.loads(f.read(header_length))
+
+
+def load_artifact(artifact_path):
+    """Memory-map a forest artifact read-only and wrap it in a FlatForest or CompactForest"""
+    # The engine classes are only needed here, so importing this module for its checksum helpers stays cheap
+    from compact_forest import CompactForest
+    from inference import FlatForest
+
+    header = read_header(artifact_path)
+    arrays = {
+        name: np.memmap(
+            artifact_path,
+            dtype=np.dtype(spec["dtype"]),
+            mode="r",
+            offset=spec["offset"],
+            shape=tuple(spec["shape"]),
+        )
+        for name, spec in header["arrays"].items()
+    }
+    # Artifacts written before compact forests existed have no "kind"
+    forest_class = CompactForest if header.get("kind") == "compact" else FlatForest
+    if forest_class is CompactForest:
+        arrays["roots"] = np.asarray(arrays["roots"], dtype=np.intp)
+    forest = forest_class(
+        classes=np.array(header["classes"], dtype=object),
+        max_depth=header["max_depth"],
+        n_features_in=header["n_features_in"],
+        **arrays,
+    )
+    forest.source_sha256 = header.get("source_sha256")
+    return forest
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def main(argv):
+    from inference import FlatForest
+
+    command = argv[1] if len(argv) > 1 else None
+    model_path = argv[2] if len(argv) > 2 else DEFAULT_MODEL_PATH
+
+    if command == "export":
+        artifact_path = argv[3] if len(argv) > 3 else DEFAULT_ARTIFACT_PATH
+        model = load_pickle(model_path)
+        export_artifact(FlatForest.from_sklearn(model), artifact_path, source_sha256=file_sha256(model_path))
+        print(f"✅ Forest artifact written to {artifact_path} ({os.path.getsize(artifact_path) / 1024:.0f} KiB)")
+    elif command == "checksum":
+        print(f"✅ {write_checksum(model_path)}  {checksum_path(model_path)}")
+    else:
+        print("Usage: python model_artifact.py [export|checksum] [model_path] [artifact_path]")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
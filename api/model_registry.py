@@ -0,0 +1,184 @@
+"""
+Model registry: the version of the model currently serving, and hot reloads.
+
+A reload loads the new model and builds its inference engine on a background
+thread while requests keep being served by the current version. The new
+version must pass a smoke test on a few reference rows before it is swapped
+in with a single reference assignment; a request that already picked up the
+old version finishes on it.
+
+Reloads are triggered by watching the model file (mtime and size of the model
+and its .sha256 sidecar, polled every few seconds) or explicitly through
+ModelRegistry.reload(), which /admin/reload calls.
+"""
+import datetime
+import os
+import threading
+import time
+
+import numpy as np
+
+
+class ModelVersion:
+    """A loaded model together with the engine built from it"""
+
+    def __init__(self, engine, model=None, artifact=None, engine_name=None, version=None, source=None,
+                 load_seconds=None):
+        self.engine = engine
+        self.model = model
+        self.artifact = artifact
+        self.engine_name = engine_name
+        self.version = version
+        self.source = source
+        self.load_seconds = load_seconds
+        # Built on the first explanation request (main.explainer_for)
+        self.explainer = None
+        self.loaded_at = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+
+    def describe(self):
+        return {
+            'version': self.version[:12] if self.version else None,
+            'source': os.path.basename(self.source) if self.source else None,
+            'loaded_at': self.loaded_at,
+            'load_seconds': round(self.load_seconds, 3) if self.load_seconds is not None else None,
+        }
+
+
+class SmokeTestError(Exception):
+    """A freshly loaded model gave wrong or unusable predictions"""
+
+
+def smoke_test(candidate, current, rows):
+    """
+    Check a new version before it serves traffic: probabilities must be finite
+    and sum to 1, the engine must agree with the sklearn model it was built
+    from, and the houses must be the ones the API already returns.
+    Returns the share of rows on which the new version agrees with the current one
+    """
+    proba = np.asarray(candidate.engine.predict_proba(rows))
+    if proba.shape != (len(rows), len(candidate.engine.classes_)):
+        raise SmokeTestError(f"predict_proba returned shape {proba.shape}")
+    if not np.isfinite(proba).all() or not np.allclose(proba.sum(axis=1), 1.0):
+        raise SmokeTestError("probabilities are not finite or do not sum to 1")
+
+    if candidate.model is not None and candidate.engine is not candidate.model:
+        # Quantized engines declare how far from the model they may be
+        tolerance = getattr(candidate.engine, 'proba_tolerance', 1e-9)
+        if not np.allclose(proba, candidate.model.predict_proba(rows), rtol=0, atol=tolerance):
+            raise SmokeTestError(f"{candidate.engine_name} engine disagrees with the model it was built from")
+
+    if current is None or current.engine is None:
+        return None
+    if list(candidate.engine.classes_) != list(current.engine.classes_):
+        raise SmokeTestError(
+            f"houses changed from {list(current.engine.classes_)} to {list(candidate.engine.classes_)}"
+        )
+    current_labels = np.argmax(current.engine.predict_proba(rows), axis=1)
+    return float(np.mean(np.argmax(proba, axis=1) == current_labels))
+
+
+def file_signature(paths):
+    """(mtime_ns, size) of each path, None for missing ones; cheap enough to poll"""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+class ModelRegistry:
+    """
+    Holds the serving ModelVersion and replaces it on reload.
+
+    `loader()` returns a new ModelVersion (or raises); `on_swap(version)` runs
+    right after a new version becomes current, e.g. to clear caches.
+    """
+
+    def __init__(self, loader, smoke_rows, on_swap=None, watch_paths=(), poll_interval=0):
+        self.loader = loader
+        self.smoke_rows = smoke_rows
+        self.on_swap = on_swap
+        self.watch_paths = tuple(watch_paths)
+        self.poll_interval = poll_interval
+        self.current = None
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_error = None
+        self.last_agreement = None
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._signature = file_signature(self.watch_paths)
+
+    def set_current(self, version):
+        self.current = version
+        if self.on_swap is not None:
+            self.on_swap(version)
+
+    def reload(self, wait=False):
+        """Load, smoke-test and swap in the model in the background; wait=True blocks and returns the outcome"""
+        if wait:
+            return self._reload()
+        threading.Thread(target=self._reload, name='model-reload', daemon=True).start()
+        return None
+
+    def _reload(self):
+        # One reload at a time; a trigger arriving mid-reload waits, then loads whatever is on disk
+        with self._reload_lock:
+            signature = file_signature(self.watch_paths)
+            try:
+                candidate = self.loader()
+                agreement = smoke_test(candidate, self.current, self.smoke_rows)
+            except Exception as e:
+                self.failed_reloads += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                self._signature = signature
+                print(f"⚠️ Model reload failed, still serving the previous version: {self.last_error}")
+                return False
+
+            self._signature = signature
+            self.last_error = None
+            self.last_agreement = agreement
+            self.reloads += 1
+            self.set_current(candidate)
+            print(f"✅ Model reloaded: version {candidate.describe()['version']} ({candidate.engine_name} engine)")
+            return True
+
+    def check_for_changes(self):
+        """Reload (in this thread) if a watched file changed since the last load attempt"""
+        if file_signature(self.watch_paths) != self._signature:
+            return self._reload()
+        return None
+
+    def start_watching(self):
+        """Poll the watched files on a daemon thread; also restarts after a fork (gunicorn --preload)"""
+        if not self.poll_interval or not self.watch_paths:
+            return
+        self._start_watcher()
+        os.register_at_fork(after_in_child=self._start_watcher)
+
+    def _start_watcher(self):
+        self._watcher = threading.Thread(target=self._watch, name='model-watcher', daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.check_for_changes()
+            except Exception as e:
+                print(f"⚠️ Model watcher error: {e}")
+
+    def stats(self):
+        current = self.current.describe() if self.current is not None else None
+        return dict(
+            current or {},
+            engine=self.current.engine_name if self.current is not None else None,
+            reloads=self.reloads,
+            failed_reloads=self.failed_reloads,
+            last_reload_error=self.last_error,
+            last_reload_agreement=self.last_agreement,
+            watching=self._watcher is not None,
+        )
@@ -0,0 +1,66 @@
+"""
+Bounded LRU cache of house probabilities keyed on the 8 trait averages.
+
+Answers are 0-10 values averaged over 3 questions, so many different q1-q24
+submissions reduce to the same feature vector. Caching on that vector lets
+repeat and popular profiles skip the forest entirely.
+"""
+import threading
+from collections import OrderedDict
+
+# Trait means are rounded before use as a key so float noise (e.g. 3.3 vs 3.2999999)
+# still hits; differences this small never cross a split threshold
+KEY_DECIMALS = 6
+
+
+class PredictionCache:
+    """Thread-safe LRU mapping of feature tuples to probability rows"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(features):
+        return tuple(round(float(value), KEY_DECIMALS) for value in features)
+
+    def get(self, key):
+        """Cached probability row for key, or None on a miss"""
+        with self._lock:
+            proba = self._entries.get(key)
+            if proba is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return proba
+
+    def put(self, key, proba):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = proba
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
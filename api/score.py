@@ -0,0 +1,320 @@
+"""
+Streaming bulk scorer for CSV and JSONL files.
+
+Rows are read in fixed-size chunks, each chunk is validated and reduced with
+the same logic as /predict and scored as one matrix, and results are written
+out before the next chunk is read, so memory stays flat however large the
+input is.
+
+Each input row is either a questionnaire (q1-q24) or already-averaged trait
+scores with the training column names (Bravery, Intelligence, ...), as in
+house_sorting.csv. Invalid rows get an error in the output instead of
+stopping the run.
+
+    python score.py ../house_sorting.csv predictions.csv
+    python score.py answers.jsonl predictions.jsonl --chunk-size 50000
+    python score.py history.jsonl predictions.jsonl --workers 8
+    cat answers.jsonl | python score.py - - --output-format jsonl
+
+With --workers N, chunks are scored by N worker processes. Workers memory-map
+the exported forest artifact instead of unpickling the model, so they start
+quickly and share one copy of the trees; results are written in input order.
+"""
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+
+import numpy as np
+
+import main
+from features import EXPECTED_QUESTIONS, FEATURE_NAMES, validate_many
+from inference import FlatForest
+from model_artifact import export_artifact
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+def load_model():
+    """Load main's model with its progress messages on stderr, keeping stdout clean for piped output"""
+    with contextlib.redirect_stdout(sys.stderr):
+        return main.load_model()
+
+
+def detect_format(path, explicit=None):
+    if explicit:
+        return explicit
+    return 'jsonl' if path.endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def open_text(path, mode):
+    if path == '-':
+        stream = sys.stdin if 'r' in mode else sys.stdout
+        return contextlib.nullcontext(stream)
+    return open(path, mode, newline='', encoding='utf-8')
+
+
+def read_rows(stream, input_format):
+    """Yield one dict per input row"""
+    if input_format == 'csv':
+        for row in csv.DictReader(stream):
+            yield csv_values(row)
+    else:
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+
+def coerce_number(value):
+    """CSV cells arrive as strings; turn numeric ones into int/float so validation sees numbers"""
+    if not isinstance(value, str):
+        return value
+    text = value.strip()
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return value
+
+
+def csv_values(row):
+    """
+    A CSV record with numeric strings converted and blank cells dropped (so they count
+    as missing). JSONL values keep their JSON types and are validated as /predict would
+    """
+    return {key: coerce_number(value) for key, value in row.items() if value not in ('', None)}
+
+
+def trait_row_features(row):
+    """
+    (error, features) for a row of pre-averaged trait columns, with the same
+    0-10 range check /predict applies to answers
+    """
+    missing = [name for name in FEATURE_NAMES if row.get(name) in ('', None)]
+    if missing:
+        return {'error': 'Missing required questions', 'missing': missing}, None
+
+    features = [row[name] for name in FEATURE_NAMES]
+    invalid = [
+        name for name, value in zip(FEATURE_NAMES, features)
+        if not isinstance(value, (int, float)) or not 0 <= value <= 10
+    ]
+    if invalid:
+        return {'error': 'Invalid values provided (must be 0-10)', 'invalid_questions': invalid}, None
+    return None, features
+
+
+def score_chunk(rows):
+    """Validate and score one chunk; returns one result dict per row, in order"""
+    results = [None] * len(rows)
+    questionnaires = []
+    questionnaire_rows = []
+    trait_features = []
+    trait_rows = []
+
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            results[index] = {'error': 'Row must be a JSON object'}
+        elif any(q_id in row for q_id in EXPECTED_QUESTIONS):
+            questionnaires.append(row)
+            questionnaire_rows.append(index)
+        else:
+            error, features = trait_row_features(row)
+            if error:
+                results[index] = error
+            else:
+                trait_features.append(features)
+                trait_rows.append(index)
+
+    # Questionnaires are validated and averaged in one vectorized pass
+    errors, features_array, valid = validate_many(questionnaires)
+    for error, index in zip(errors, questionnaire_rows):
+        if error:
+            results[index] = error
+
+    scored_rows = [questionnaire_rows[position] for position in valid] + trait_rows
+    if scored_rows:
+        features_array = np.vstack([features_array, np.array(trait_features, dtype=float).reshape(-1, 8)])
+        predictions, prediction_proba = main.predict_with_proba(features_array, use_cache=False)
+        for row, index in enumerate(scored_rows):
+            results[index] = {
+                'predicted_house': str(predictions[row]),
+                'probabilities': main.format_probabilities(prediction_proba[row])
+            }
+    return results
+
+
+class ResultWriter:
+    """Writes scored rows incrementally as CSV (one column per house) or JSONL"""
+
+    def __init__(self, stream, output_format):
+        self.stream = stream
+        self.output_format = output_format
+        self.houses = [str(house) for house in main.engine.classes_]
+        if output_format == 'csv':
+            self.writer = csv.writer(stream)
+            self.writer.writerow(['row', 'predicted_house'] + self.houses + ['error'])
+
+    def write(self, first_row, results):
+        if self.output_format == 'csv':
+            for offset, result in enumerate(results):
+                if 'error' in result:
+                    self.writer.writerow([first_row + offset, ''] + [''] * len(self.houses) + [result['error']])
+                else:
+                    probabilities = result['probabilities']
+                    self.writer.writerow(
+                        [first_row + offset, result['predicted_house']]
+                        + [probabilities[house] for house in self.houses] + ['']
+                    )
+        else:
+            buffer = io.StringIO()
+            for offset, result in enumerate(results):
+                buffer.write(json.dumps(dict(result, row=first_row + offset)))
+                buffer.write('\n')
+            self.stream.write(buffer.getvalue())
+        self.stream.flush()
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def score_chunks(chunks):
+    """Score chunks one after another in this process"""
+    for rows in chunks:
+        yield score_chunk(rows)
+
+
+class ParallelScorer:
+    """
+    Scores chunks on a pool of worker processes, yielding results in input order.
+
+    At most `workers * max_pending_per_worker` chunks are in flight, so a fast
+    reader cannot pile the whole file up in memory ahead of slow workers.
+    """
+
+    def __init__(self, workers, max_pending_per_worker=2):
+        self.workers = workers
+        self.max_pending = workers * max_pending_per_worker
+
+    def __call__(self, chunks):
+        with tempfile.TemporaryDirectory() as tmp:
+            with self._worker_environment(tmp):
+                # spawn gives each worker a fresh interpreter that maps the artifact
+                # rather than inheriting (and slowly dirtying) the parent's model pages
+                pool = multiprocessing.get_context('spawn').Pool(self.workers, initializer=load_model)
+            with pool:
+                pending = deque()
+                for rows in chunks:
+                    pending.append(pool.apply_async(score_chunk, (rows,)))
+                    if len(pending) >= self.max_pending:
+                        yield pending.popleft().get()
+                while pending:
+                    yield pending.popleft().get()
+
+    @contextlib.contextmanager
+    def _worker_environment(self, tmp):
+        """Point workers' `import main` at a memory-mapped forest artifact while the pool starts"""
+        if main.MODEL_FORMAT == 'artifact':
+            artifact_path = main.MODEL_ARTIFACT_PATH
+        else:
+            artifact_path = os.path.join(tmp, 'model.forest')
+            forest = main.engine if isinstance(main.engine, FlatForest) else FlatForest.from_sklearn(main.model)
+            export_artifact(forest, artifact_path)
+
+        overrides = {
+            'MODEL_FORMAT': 'artifact',
+            'MODEL_ARTIFACT_PATH': artifact_path,
+            'INFERENCE_ENGINE': 'flat',
+            'PREDICTION_CACHE_SIZE': '0',
+        }
+        saved = {name: os.environ.get(name) for name in overrides}
+        os.environ.update(overrides)
+        try:
+            yield
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+
+def score_file(input_path, output_path, input_format=None, output_format=None,
+               chunk_size=DEFAULT_CHUNK_SIZE, score=score_chunks, progress=True):
+    """
+    Stream input_path through score(), which maps an iterable of row chunks to an
+    iterable of per-chunk results in the same order. Returns summary counts and rows/sec
+    """
+    input_format = detect_format(input_path, input_format)
+    output_format = detect_format(output_path, output_format)
+
+    total = failed = 0
+    start = time.perf_counter()
+    with open_text(input_path, 'r') as source, open_text(output_path, 'w') as sink:
+        writer = ResultWriter(sink, output_format)
+        for results in score(chunked(read_rows(source, input_format), chunk_size)):
+            writer.write(total, results)
+            total += len(results)
+            failed += sum(1 for result in results if 'error' in result)
+            if progress:
+                elapsed = time.perf_counter() - start
+                print(f"   {total:,} rows scored ({total / elapsed:,.0f} rows/s)", file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': total,
+        'failed': failed,
+        'seconds': elapsed,
+        'rows_per_s': total / elapsed if elapsed else 0.0
+    }
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description='Score a CSV/JSONL file of questionnaires or trait scores')
+    parser.add_argument('input', help="Input file, or '-' for stdin")
+    parser.add_argument('output', help="Output file, or '-' for stdout")
+    parser.add_argument('--input-format', choices=['csv', 'jsonl'], help='Default: from the file extension')
+    parser.add_argument('--output-format', choices=['csv', 'jsonl'], help='Default: from the file extension')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows scored per model call')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes scoring chunks in parallel')
+    parser.add_argument('--quiet', action='store_true', help='No per-chunk progress')
+    args = parser.parse_args(argv)
+
+    if load_model() is None:
+        print("❌ Model not loaded", file=sys.stderr)
+        return 1
+
+    scorer = ParallelScorer(args.workers) if args.workers > 1 else score_chunks
+    summary = score_file(
+        args.input, args.output, args.input_format, args.output_format,
+        chunk_size=args.chunk_size, score=scorer, progress=not args.quiet
+    )
+    print(f"✅ Scored {summary['rows']:,} rows ({summary['failed']:,} invalid) in {summary['seconds']:.2f}s "
+          f"- {summary['rows_per_s']:,.0f} rows/s", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
@@ -14,4 +14,5 @@ echo "Available endpoints:"
 echo "- GET  /                 - Health check"
 echo "- GET  /questions        - Get sorting questions"
 echo "- POST /predict          - Predict house"
+echo "- POST /predict/batch    - Predict houses for many questionnaires"
 echo "- GET  /houses          - Get house information"
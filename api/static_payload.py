@@ -0,0 +1,78 @@
+"""
+Pre-encoded responses for endpoints whose content never changes while the
+process runs (/questions, /houses).
+
+The JSON body is serialized (and optionally gzipped) once at startup together
+with a strong ETag, so a request costs a header lookup and, for repeat
+visitors sending If-None-Match, an empty 304.
+"""
+import gzip
+import hashlib
+import json
+
+# Bodies smaller than this are not worth compressing
+GZIP_MIN_SIZE = 256
+
+
+def _accepts_gzip(accept_encoding):
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if coding.strip().lower() in ('gzip', '*'):
+            return params.replace(' ', '').lower() not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+def _etag_matches(if_none_match, etags):
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        # If-None-Match uses weak comparison
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate in etags:
+            return True
+    return False
+
+
+class StaticPayload:
+    """A JSON payload encoded once, served with ETag/Cache-Control and 304 support"""
+
+    def __init__(self, payload, max_age=3600, use_gzip=True):
+        # Same encoding as Flask's jsonify outside debug mode
+        self.body = (json.dumps(payload, sort_keys=True, separators=(',', ':')) + '\n').encode('utf-8')
+        self.etag = '"%s"' % hashlib.sha256(self.body).hexdigest()[:32]
+        self.cache_control = f'public, max-age={max_age}'
+
+        self.gzip_body = None
+        self.gzip_etag = None
+        if use_gzip and len(self.body) >= GZIP_MIN_SIZE:
+            # mtime=0 keeps the compressed bytes, and so the ETag, stable across restarts
+            self.gzip_body = gzip.compress(self.body, compresslevel=9, mtime=0)
+            # Each content-coding is its own representation, so it gets its own strong ETag
+            self.gzip_etag = self.etag[:-1] + '-gzip"'
+
+    def respond(self, if_none_match=None, accept_encoding=None):
+        """(status, headers, body) for a GET with the given conditional/encoding request headers"""
+        if self.gzip_body is not None and _accepts_gzip(accept_encoding):
+            body, etag, encoding = self.gzip_body, self.gzip_etag, 'gzip'
+        else:
+            body, etag, encoding = self.body, self.etag, None
+
+        headers = {
+            'ETag': etag,
+            'Cache-Control': self.cache_control,
+        }
+        if self.gzip_body is not None:
+            headers['Vary'] = 'Accept-Encoding'
+
+        if _etag_matches(if_none_match, (self.etag, self.gzip_etag)):
+            return 304, headers, b''
+
+        headers['Content-Type'] = 'application/json'
+        headers['Content-Length'] = str(len(body))
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        return 200, headers, body
@@ -0,0 +1,115 @@
+"""
+Append-only log of scored submissions, for incremental training.
+
+Each scored questionnaire becomes one JSON line: the 8 trait averages, the
+predicted house and its probability, and a confirmed label when a trusted
+client (one with ADMIN_TOKEN) sent one ("house"). record() only appends to an in-memory buffer; a
+background thread writes the buffer out in one os.write() per batch, either
+every `flush_interval` seconds or as soon as `flush_rows` rows are waiting.
+The file is opened with O_APPEND, so several workers can share one log
+without interleaving batches.
+
+If the buffer is full because the disk cannot keep up, new rows are dropped
+(and counted) rather than slowing requests down.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+
+DEFAULT_FLUSH_ROWS = 256
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_MAX_BUFFERED = 100000
+
+
+class SubmissionLog:
+    def __init__(self, path, flush_rows=DEFAULT_FLUSH_ROWS, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 max_buffered=DEFAULT_MAX_BUFFERED):
+        self.path = path
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self.written = 0
+        self.dropped = 0
+        self._start_writer()
+        # Workers forked after import (gunicorn --preload) need their own writer thread
+        os.register_at_fork(after_in_child=self._after_fork)
+        atexit.register(self.flush)
+
+    def record(self, features, predicted_house, probability, label=None):
+        """Queue one scored submission; never touches the disk"""
+        row = (features, predicted_house, probability, label, time.time())
+        with self._lock:
+            if len(self._buffer) >= self.max_buffered:
+                self.dropped += 1
+                return
+            self._buffer.append(row)
+            full = len(self._buffer) >= self.flush_rows
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Write everything buffered so far as one append"""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+
+        data = ''.join(
+            json.dumps({
+                'features': [float(value) for value in features],
+                'predicted_house': str(predicted_house),
+                'probability': round(float(probability), 6),
+                'label': label,
+                'ts': round(ts, 3),
+            }) + '\n'
+            for features, predicted_house, probability, label, ts in rows
+        ).encode('utf-8')
+
+        with self._write_lock:
+            try:
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    view = memoryview(data)
+                    while view:
+                        view = view[os.write(fd, view):]
+                finally:
+                    os.close(fd)
+            except OSError:
+                self.dropped += len(rows)
+                raise
+            self.written += len(rows)
+        return len(rows)
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'buffered': len(self._buffer),
+            'written': self.written,
+            'dropped': self.dropped,
+        }
+
+    def _start_writer(self):
+        threading.Thread(target=self._run, name='submission-log', daemon=True).start()
+
+    def _after_fork(self):
+        # Rows buffered in the parent belong to the parent
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._start_writer()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"⚠️ Could not write submission log {self.path}: {e}")
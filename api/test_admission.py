@@ -0,0 +1,188 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import asgi
+import main
+from admission import ConcurrencyLimiter, Overloaded, RateLimiter
+from test_asgi import call
+
+ANSWERS = {f'q{i}': 5 for i in range(1, 25)}
+
+
+def test_token_bucket_allows_burst_then_refills_at_rate():
+    limiter = RateLimiter(rate=2, burst=3)
+
+    assert [limiter.check('a', now=0.0) for _ in range(3)] == [None, None, None]
+    assert limiter.check('a', now=0.0) == pytest.approx(0.5)
+    # Buckets are per client
+    assert limiter.check('b', now=0.0) is None
+    assert limiter.check('a', now=0.5) is None
+    assert limiter.check('a', now=0.5) is not None
+    stats = limiter.stats()
+    assert stats['allowed'] == 5 and stats['limited'] == 2 and stats['clients'] == 2
+
+
+def test_rate_limiter_forgets_least_recent_clients():
+    limiter = RateLimiter(rate=1, burst=1, max_clients=2)
+    for client in ('a', 'b', 'c'):
+        limiter.check(client, now=0.0)
+    assert limiter.stats()['clients'] == 2
+    # 'a' was forgotten, so it starts again with a full bucket
+    assert limiter.check('a', now=0.0) is None
+
+
+def test_client_id_trusts_only_proxy_appended_addresses(monkeypatch):
+    monkeypatch.setattr(main, 'RATE_LIMIT_CLIENT_HEADER', 'X-Forwarded-For')
+    # The proxy appends the address it saw; anything before it is the client's own claim
+    headers = {'X-Forwarded-For': '1.2.3.4, 203.0.113.7'}
+    assert main.client_id(headers, '10.0.0.1') == '203.0.113.7'
+    assert main.client_id({'X-Forwarded-For': '198.51.100.9, 203.0.113.7'}, '10.0.0.1') == '203.0.113.7'
+    assert main.client_id({}, '10.0.0.1') == '10.0.0.1'
+
+    monkeypatch.setattr(main, 'RATE_LIMIT_TRUSTED_PROXIES', 2)
+    assert main.client_id({'X-Forwarded-For': '1.2.3.4, 203.0.113.7, 10.1.0.5'}, '10.0.0.1') == '203.0.113.7'
+    assert main.client_id({'X-Forwarded-For': '203.0.113.7'}, '10.0.0.1') == '10.0.0.1'
+
+
+def hold_slots(limiter, count):
+    """Occupy `count` slots from other threads until the returned event is set"""
+    release, held = threading.Event(), threading.Barrier(count + 1)
+
+    def worker():
+        with limiter.slot():
+            held.wait()
+            release.wait()
+
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    held.wait()
+    return release, threads
+
+
+def test_concurrency_limiter_sheds_on_full_queue_and_latency_budget():
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=0, latency_budget=0.05)
+    release, threads = hold_slots(limiter, 1)
+    with pytest.raises(Overloaded) as excinfo:
+        limiter.acquire()
+    assert excinfo.value.reason == 'queue_full' and excinfo.value.retry_after >= 1
+
+    limiter.max_queue = 1
+    started = time.monotonic()
+    with pytest.raises(Overloaded) as excinfo:
+        limiter.acquire()
+    assert excinfo.value.reason == 'latency_budget'
+    assert 0.04 <= time.monotonic() - started < 1
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    stats = limiter.stats()
+    assert stats['active'] == 0 and stats['waiting'] == 0
+    assert stats['shed_queue_full'] == 1 and stats['shed_latency_budget'] == 1
+    # Shed straight away when the recent inference time says the budget cannot be met
+    limiter.service_time = 1.0
+    release, threads = hold_slots(limiter, 1)
+    started = time.monotonic()
+    with pytest.raises(Overloaded):
+        limiter.acquire()
+    assert time.monotonic() - started < 0.04
+    release.set()
+    for thread in threads:
+        thread.join()
+
+
+def test_waiting_request_gets_the_released_slot():
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=1, latency_budget=5)
+    release, threads = hold_slots(limiter, 1)
+    threading.Timer(0.02, release.set).start()
+    with limiter.slot():
+        assert limiter.active == 1
+    for thread in threads:
+        thread.join()
+    assert limiter.stats()['admitted'] == 2 and limiter.service_time is not None
+
+
+def test_predict_answers_429_and_503_and_reports_counters(monkeypatch):
+    monkeypatch.setattr(main, 'rate_limiter', RateLimiter(rate=0.001, burst=1))
+    client = main.app.test_client()
+
+    assert client.post('/predict', json=ANSWERS).status_code == 200
+    limited = client.post('/predict', json=ANSWERS)
+    assert limited.status_code == 429
+    assert int(limited.headers['Retry-After']) >= 1 and limited.json['error'] == 'Too many requests'
+    # Another client has its own bucket
+    assert client.post('/predict', json=ANSWERS, environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 200
+
+    monkeypatch.setattr(main, 'rate_limiter', RateLimiter(rate=0, burst=1))
+    monkeypatch.setattr(main, 'inference_limiter', ConcurrencyLimiter(max_concurrent=1, max_queue=0, latency_budget=1))
+    release, threads = hold_slots(main.inference_limiter, 1)
+    try:
+        for path, body in (('/predict', ANSWERS), ('/predict/batch', [ANSWERS])):
+            shed = client.post(path, json=body)
+            assert shed.status_code == 503
+            assert shed.json['reason'] == 'queue_full' and shed.headers['Retry-After'] == '1'
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+
+    admission = client.get('/').json['admission']
+    assert admission['inference']['shed_queue_full'] == 2
+    assert admission['rate_limit']['enabled'] is False
+
+
+def test_asgi_rate_limits_per_client(monkeypatch):
+    monkeypatch.setattr(main, 'rate_limiter', RateLimiter(rate=0.001, burst=1))
+
+    async def scenario():
+        return [(await call('POST', '/predict', ANSWERS))[0] for _ in range(2)]
+
+    assert asyncio.run(scenario()) == [200, 429]
+
+
+def test_asgi_sheds_when_the_micro_batch_backlog_is_over_budget(monkeypatch):
+    release = threading.Event()
+
+    def held_predict(features_array):
+        release.wait()
+        return main.predict_with_proba(features_array)
+
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=1, latency_budget=1)
+    monkeypatch.setattr(asgi, 'batcher', asgi.MicroBatcher(held_predict, max_wait=0.001, max_batch=1, limiter=limiter))
+
+    async def scenario():
+        # One batch being scored and one row waiting fill the queue; the next request is shed
+        first = asyncio.ensure_future(call('POST', '/predict', ANSWERS))
+        await asyncio.sleep(0.05)
+        second = asyncio.ensure_future(call('POST', '/predict', ANSWERS))
+        await asyncio.sleep(0.05)
+        shed = [await call('POST', path, body) for path, body in (('/predict', ANSWERS), ('/predict/batch', [ANSWERS]))]
+        release.set()
+        admitted = [await first, await second]
+
+        # An idle batcher admits anything; with a batch in flight the recent batch time must fit the budget
+        release.clear()
+        held = asyncio.ensure_future(call('POST', '/predict', ANSWERS))
+        await asyncio.sleep(0.05)
+        limiter.service_time = 2.0
+        shed.append(await call('POST', '/predict', ANSWERS))
+        release.set()
+        admitted.append(await held)
+        return admitted, shed
+
+    try:
+        admitted, shed = asyncio.run(scenario())
+    finally:
+        release.set()
+
+    assert [status for status, _ in admitted] == [200, 200, 200]
+    assert [(status, body['reason']) for status, body in shed] == \
+        [(503, 'queue_full'), (503, 'queue_full'), (503, 'latency_budget')]
+    assert shed[2][1]['retry_after'] == 2
+    stats = limiter.stats()
+    assert stats['shed_queue_full'] == 2 and stats['shed_latency_budget'] == 1 and stats['admitted'] == 3
+    assert asgi.batcher.in_flight == 0 and asgi.batcher.in_flight_batches == 0
@@ -228,6 +228,35 @@ def test_edge_cases():
     else:
         print("   ❌ Should have rejected invalid values")
 
+def test_batch_predictions():
+    """Test scoring several questionnaires in one request"""
+    base_url = "http://localhost:5000"
+
+    print("\n" + "=" * 60)
+    print("📦 BATCH PREDICTION TESTING")
+    print("=" * 60)
+
+    questionnaires = [dataset_info['data'] for dataset_info in test_datasets.values()]
+    # One incomplete questionnaire should fail on its own, not the whole batch
+    questionnaires.append({"q1": 5, "q2": 7})
+
+    response = requests.post(f"{base_url}/predict/batch", json={"questionnaires": questionnaires})
+    print(f"   Status: {response.status_code} (should be 200)")
+    if response.status_code == 200:
+        result = response.json()
+        print(f"   Succeeded: {result['succeeded']} / {result['total']}")
+        for row in result['results']:
+            if 'error' in row:
+                print(f"      #{row['index']}: ❌ {row['error']}")
+            else:
+                print(f"      #{row['index']}: 🏠 {row['predicted_house']}")
+        if result['succeeded'] == len(test_datasets) and result['failed'] == 1:
+            print("   ✅ Bad row reported without failing the batch")
+        else:
+            print("   ❌ Unexpected batch result counts")
+    else:
+        print(f"   ❌ Error: {response.text}")
+
 def run_comprehensive_test():
     """Run all tests"""
     print("🧙‍♂️ HOGWARTS HOUSE SORTING API - COMPREHENSIVE TEST SUITE")
@@ -236,6 +265,7 @@ def run_comprehensive_test():
     try:
         test_api()
         test_edge_cases()        
+        test_batch_predictions()
         print("\n" + "=" * 80)
         print("📊 TEST SUMMARY")
         print("=" * 80)
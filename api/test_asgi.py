@@ -0,0 +1,104 @@
+import asyncio
+import json
+import random
+
+from test_endpoints import run_probe
+
+import asgi
+import main
+
+rng = random.Random(0)
+QUESTIONNAIRES = [{f'q{i}': rng.randint(0, 10) for i in range(1, 25)} for _ in range(8)]
+
+
+async def call(method, path, payload=None, headers=None):
+    """Drive the ASGI app in-process and return (status, json_body)"""
+    body = json.dumps(payload).encode() if payload is not None else b''
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'query_string': query.encode(),
+        'headers': [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+    }
+    await asgi.app(scope, receive, send)
+    return sent[0]['status'], json.loads(sent[1]['body'])
+
+
+def test_asgi_responses_match_flask():
+    client = main.app.test_client()
+
+    async def scenario():
+        for answers in QUESTIONNAIRES:
+            status, body = await call('POST', '/predict', answers)
+            expected = client.post('/predict', json=answers)
+            assert (status, body) == (expected.status_code, expected.json)
+
+        status, body = await call('POST', '/predict', {'q1': 5, 'q2': 7})
+        assert (status, body) == (400, client.post('/predict', json={'q1': 5, 'q2': 7}).json)
+
+        for path in ('/questions', '/houses'):
+            status, body = await call('GET', path)
+            assert (status, body) == (200, client.get(path).json)
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_predictions_are_coalesced_into_one_batch():
+    batcher = asgi.MicroBatcher(main.predict_with_proba, max_wait=0.05, max_batch=64)
+    rows = [main.validate_answers(answers)[1] for answers in QUESTIONNAIRES]
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.submit(features) for features in rows))
+
+    results = asyncio.run(scenario())
+
+    assert batcher.batches == 1 and batcher.rows == len(rows)
+    for features, (predicted_house, _) in zip(rows, results):
+        assert predicted_house == main.predict_with_proba([features])[0][0]
+
+
+# Starts the ASGI app through its lifespan in a fresh process, then reports what it serves
+_LIFESPAN_PROBE = """
+import asyncio, json
+import asgi
+from test_asgi import call
+
+async def scenario():
+    startup = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+    sent = []
+    async def receive():
+        return startup.pop(0)
+    async def send(message):
+        sent.append(message['type'])
+    await asgi.app({'type': 'lifespan'}, receive, send)
+    health = (await call('GET', '/'))[1]
+    stats = (await call('GET', '/stats'))[0]
+    predict = (await call('POST', '/predict', {f'q{i}': 5 for i in range(1, 25)}))[0]
+    return [sent, health['model_loaded'], stats, predict, (await call('GET', '/'))[1]['model_loaded']]
+
+print(json.dumps(asyncio.run(scenario())))
+"""
+
+
+def test_lifespan_startup_loads_the_model_unless_lazy():
+    eager = json.loads(run_probe(_LIFESPAN_PROBE).splitlines()[-1])
+    assert eager == [['lifespan.startup.complete', 'lifespan.shutdown.complete'], True, 200, 200, True]
+
+    # Lazy: nothing loaded at startup; /stats loads it off the event loop
+    lazy = json.loads(run_probe(_LIFESPAN_PROBE, MODEL_LOADING='lazy').splitlines()[-1])
+    assert lazy[1:] == [False, 200, 200, True]
+
+
+if __name__ == "__main__":
+    test_asgi_responses_match_flask()
+    test_concurrent_predictions_are_coalesced_into_one_batch()
+    test_lifespan_startup_loads_the_model_unless_lazy()
+    print("✅ ASGI mode matches Flask and coalesces concurrent requests")
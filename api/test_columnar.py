@@ -0,0 +1,91 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import columnar
+import train
+from dataset import DATASET_PATH
+
+
+def test_csv_round_trip_matches_read_csv(tmp_path):
+    out = str(tmp_path / "house_sorting.cols")
+    assert columnar.convert_csv(DATASET_PATH, out, chunk_rows=300) == 1000
+
+    dataset = columnar.ColumnarDataset(out)
+    df = pd.read_csv(DATASET_PATH)
+    assert len(dataset) == 1000 and len(dataset.meta['chunks']) == 4
+    assert dataset.trait_codes().dtype == np.uint8
+    assert np.array_equal(dataset.features(), df[train.FEATURE_NAMES].to_numpy(dtype=float))
+    assert list(dataset.labels('House')) == df['House'].tolist()
+    assert list(dataset.labels('Blood Status')) == df['Blood Status'].tolist()
+    # Far smaller than the CSV
+    assert columnar.dataset_nbytes(out) < 0.5 * len(open(DATASET_PATH, 'rb').read())
+
+
+def test_csv_conversion_refuses_to_duplicate_an_existing_dataset(tmp_path):
+    out = str(tmp_path / "house_sorting.cols")
+    columnar.convert_csv(DATASET_PATH, out)
+
+    with pytest.raises(FileExistsError):
+        columnar.convert_csv(DATASET_PATH, out)
+    assert len(columnar.ColumnarDataset(out)) == 1000
+    assert columnar.main(['columnar.py', 'from-csv', DATASET_PATH, out]) == 1
+
+    assert columnar.convert_csv(DATASET_PATH, out, chunk_rows=300, overwrite=True) == 1000
+    assert len(columnar.ColumnarDataset(out)) == 1000 and len(os.listdir(out)) == 1 + 4 * 3
+    columnar.convert_csv(DATASET_PATH, out, append=True)
+    assert len(columnar.ColumnarDataset(out)) == 2000
+
+
+def test_training_reads_columnar_zero_copy(tmp_path):
+    out = str(tmp_path / "house_sorting.cols")
+    columnar.convert_csv(DATASET_PATH, out)
+
+    X, y = train.load_dataset(out)
+    X_csv, y_csv = train.load_dataset(DATASET_PATH)
+    assert np.array_equal(X.to_numpy(dtype=float), X_csv.to_numpy(dtype=float))
+    assert y.tolist() == y_csv.tolist()
+    # One chunk: the DataFrame is a view of the memory-mapped file
+    base = X.to_numpy()
+    while base is not None and not isinstance(base, np.memmap):
+        base = base.base
+    assert isinstance(base, np.memmap)
+
+
+def test_log_conversion_appends_new_lines_only(tmp_path):
+    log_path = tmp_path / "submissions.jsonl"
+    out = str(tmp_path / "history.cols")
+    entries = [
+        {'features': [5.0, 6 + 1 / 3, 7 + 2 / 3, 0.0, 10.0, 1 / 3, 2.0, 3.0], 'predicted_house': 'Gryffindor',
+         'probability': 0.9, 'label': None},
+        {'features': [5.5] * 8, 'predicted_house': 'Slytherin', 'probability': 0.8, 'label': None},
+    ]
+    log_path.write_text(''.join(json.dumps(entry) + '\n' for entry in entries))
+    # The 5.5 row (fractional answers) cannot be stored on the 1/3 grid
+    assert columnar.convert_log(str(log_path), out) == (1, 1)
+
+    with open(log_path, 'a') as f:
+        f.write(json.dumps({'features': [1.0] * 8, 'predicted_house': 'Ravenclaw', 'probability': 0.5,
+                            'label': 'Hufflepuff'}) + '\n')
+        f.write('{"features": [1.0')  # still being written
+    assert columnar.convert_log(str(log_path), out) == (1, 0)
+
+    dataset = columnar.ColumnarDataset(out)
+    assert dataset.scale == 3
+    assert np.allclose(dataset.features()[0], entries[0]['features'], rtol=0, atol=1e-12)
+    assert list(dataset.labels('House')) == ['Gryffindor', 'Hufflepuff']
+    assert list(dataset.labels('Label')) == [None, 'Hufflepuff']
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    for test in (test_csv_round_trip_matches_read_csv, test_csv_conversion_refuses_to_duplicate_an_existing_dataset,
+                 test_training_reads_columnar_zero_copy, test_log_conversion_appends_new_lines_only):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ Columnar datasets round-trip the CSV and the submission log")
@@ -0,0 +1,176 @@
+import gzip
+import json
+import os
+import subprocess
+import sys
+
+import main
+from metrics import Metrics, NULL_TIMER
+
+
+def test_static_endpoints_are_served_with_etag_and_304():
+    client = main.app.test_client()
+
+    for path in ('/questions', '/houses'):
+        response = client.get(path)
+        assert response.status_code == 200
+        assert response.headers['Cache-Control'].startswith('public, max-age=')
+        etag = response.headers['ETag']
+
+        not_modified = client.get(path, headers={'If-None-Match': etag})
+        assert not_modified.status_code == 304
+        assert not_modified.data == b''
+        assert not_modified.headers['ETag'] == etag
+
+        changed = client.get(path, headers={'If-None-Match': '"stale"'})
+        assert changed.status_code == 200 and changed.json == response.json
+
+
+def test_static_endpoints_serve_pregzipped_bytes():
+    client = main.app.test_client()
+
+    plain = client.get('/questions')
+    compressed = client.get('/questions', headers={'Accept-Encoding': 'gzip, deflate'})
+
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.headers['ETag'] != plain.headers['ETag']
+    assert json.loads(gzip.decompress(compressed.data)) == plain.json
+    assert plain.json['total_questions'] == 24
+    # Either representation's ETag revalidates
+    assert client.get('/questions', headers={'If-None-Match': compressed.headers['ETag']}).status_code == 304
+
+
+def metric_value(text, line_prefix):
+    for line in text.splitlines():
+        if line.startswith(line_prefix + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return 0.0
+
+
+def test_metrics_count_stages_requests_and_errors():
+    client = main.app.test_client()
+    before = client.get('/metrics').data.decode()
+
+    client.post('/predict', json={f'q{i}': 5 for i in range(1, 25)})
+    client.post('/predict', json={'q1': 5})
+    client.post('/predict', json=dict({f'q{i}': 5 for i in range(1, 25)}, q3=11))
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    after = response.data.decode()
+
+    def delta(prefix):
+        return metric_value(after, prefix) - metric_value(before, prefix)
+
+    assert delta('house_sorting_requests_total{endpoint="/predict"}') == 3
+    assert delta('house_sorting_errors_total{endpoint="/predict",type="missing"}') == 1
+    assert delta('house_sorting_errors_total{endpoint="/predict",type="invalid"}') == 1
+    for stage in ('parse', 'validate'):
+        assert delta(f'house_sorting_stage_seconds_count{{stage="{stage}"}}') == 3
+    for stage in ('inference', 'serialize', 'total'):
+        assert delta(f'house_sorting_stage_seconds_count{{stage="{stage}"}}') == 1
+    assert metric_value(after, 'house_sorting_model_load_seconds') > 0
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = Metrics(enabled=False)
+    assert metrics.timer() is NULL_TIMER
+    metrics.count_request('/predict')
+    metrics.count_error('/predict', 'missing')
+    assert metrics.requests == {} and metrics.errors == {} and metrics.stages == {}
+
+
+ANSWERS = {f'q{i}': (i * 5) % 11 for i in range(1, 25)}
+
+
+def test_batch_reports_bad_rows_in_place_with_their_index():
+    client = main.app.test_client()
+    batch = [ANSWERS, {'q1': 5, 'q2': 7}, 'not a questionnaire', dict(ANSWERS, q5=15), ANSWERS]
+
+    response = client.post('/predict/batch', json={'questionnaires': batch})
+    body = response.json
+    assert response.status_code == 200
+    assert (body['total'], body['succeeded'], body['failed']) == (5, 2, 3)
+    assert [result['index'] for result in body['results']] == [0, 1, 2, 3, 4]
+
+    single = client.post('/predict', json=ANSWERS).json
+    for result in (body['results'][0], body['results'][4]):
+        assert result['predicted_house'] == single['predicted_house']
+        assert result['probabilities'] == single['probabilities']
+        assert result['trait_scores'] == single['trait_scores']
+    assert body['results'][1]['error'] == 'Missing required questions'
+    assert body['results'][2]['error'] == 'Questionnaire must be a JSON object'
+    assert body['results'][3]['invalid_questions'] == ['q5']
+
+
+def test_batch_accepts_a_bare_list():
+    client = main.app.test_client()
+    wrapped = client.post('/predict/batch', json={'questionnaires': [ANSWERS, ANSWERS]}).json
+    assert client.post('/predict/batch', json=[ANSWERS, ANSWERS]).json == wrapped
+
+    for body in ([], {'questionnaires': []}, {'answers': [ANSWERS]}, ANSWERS):
+        response = client.post('/predict/batch', json=body)
+        assert response.status_code == 400
+        assert response.json['error'] == 'Expected a non-empty list of questionnaires'
+
+
+def test_batch_rejects_more_than_max_batch_size():
+    client = main.app.test_client()
+    saved = main.MAX_BATCH_SIZE
+    try:
+        main.MAX_BATCH_SIZE = 3
+        assert client.post('/predict/batch', json=[ANSWERS] * 3).status_code == 200
+        response = client.post('/predict/batch', json=[ANSWERS] * 4)
+    finally:
+        main.MAX_BATCH_SIZE = saved
+    assert response.status_code == 400
+    assert response.json == {'error': 'Too many questionnaires in one batch', 'max_batch_size': 3}
+
+
+def run_probe(code, **env):
+    """Run code in a fresh interpreter from the api directory; returns its stdout"""
+    return subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=dict(os.environ, MODEL_WATCH_INTERVAL='0', **env),
+        capture_output=True, text=True, check=True,
+    ).stdout
+
+
+def test_importing_main_loads_no_model_and_no_heavy_libraries():
+    output = run_probe(
+        "import sys, main\n"
+        "engines = ('inference', 'compact_forest', 'explain', 'lookup_table', 'house_stats')\n"
+        "print(main.model_registry.current is None, 'sklearn' in sys.modules, 'pandas' in sys.modules,\n"
+        "      any(name in sys.modules for name in engines))"
+    )
+    assert output.split()[-4:] == ['True', 'False', 'False', 'False']
+
+
+def test_lazy_model_loading_waits_for_the_first_request():
+    output = run_probe(
+        "import main\n"
+        "client = main.create_app().test_client()\n"
+        "before = client.get('/').json['model_loaded']\n"
+        "status = client.post('/predict', json={f'q{i}': 5 for i in range(1, 25)}).status_code\n"
+        "print(before, status, client.get('/').json['model_loaded'])",
+        MODEL_LOADING='lazy',
+    )
+    assert output.split()[-3:] == ['False', '200', 'True']
+
+
+if __name__ == "__main__":
+    test_static_endpoints_are_served_with_etag_and_304()
+    test_static_endpoints_serve_pregzipped_bytes()
+    test_metrics_count_stages_requests_and_errors()
+    test_disabled_metrics_record_nothing()
+    test_batch_reports_bad_rows_in_place_with_their_index()
+    test_batch_accepts_a_bare_list()
+    test_batch_rejects_more_than_max_batch_size()
+    test_importing_main_loads_no_model_and_no_heavy_libraries()
+    test_lazy_model_loading_waits_for_the_first_request()
+    print("✅ /questions and /houses answer conditional requests")
+    print("✅ /metrics records per-stage latencies and error counts")
+    print("✅ /predict/batch scores rows independently and enforces MAX_BATCH_SIZE")
+    print("✅ Importing main loads nothing until the model is asked for")
@@ -0,0 +1,80 @@
+import asyncio
+
+import numpy as np
+
+import main
+from test_asgi import call
+from explain import PathExplainer
+from features import TRAIT_NAMES
+from inference import FlatForest
+from model_registry import ModelVersion
+from prediction_cache import PredictionCache
+from dataset import load_dataset_features
+
+ANSWERS = {f'q{i}': (i * 7) % 11 for i in range(1, 25)}
+
+
+def test_contributions_add_up_to_the_forest_probabilities():
+    forest = FlatForest.from_sklearn(main.model)
+    explainer = PathExplainer.from_flat(forest)
+    X = np.vstack([load_dataset_features()[:500], np.random.default_rng(0).uniform(0, 10, size=(500, 8))])
+
+    proba, contributions = explainer.explain(X)
+    assert contributions.shape == (len(X), forest.n_features_in_, len(forest.classes_))
+    np.testing.assert_allclose(proba, forest.predict_proba(X), atol=1e-12)
+    np.testing.assert_allclose(explainer.baseline + contributions.sum(axis=1), proba, atol=1e-12)
+    # Every split moves probability between houses, so each trait's contributions sum to zero
+    np.testing.assert_allclose(contributions.sum(axis=2), 0, atol=1e-12)
+
+
+def test_leaf_contributions_follow_the_decision_path():
+    forest = FlatForest.from_sklearn(main.model)
+    explainer = PathExplainer.from_flat(forest)
+    x = np.full((1, 8), 4.5, dtype=np.float32)
+
+    estimator = main.model.estimators_[3]
+    tree = estimator.tree_
+    value = tree.value[:, 0, :] / tree.value[:, 0, :].sum(axis=1, keepdims=True)
+    path = estimator.decision_path(x).indices
+    expected = np.zeros((8, len(forest.classes_)))
+    for parent, child in zip(path[:-1], path[1:]):
+        expected[tree.feature[parent]] += value[child] - value[parent]
+
+    leaf = forest.apply(x)[0, 3]
+    np.testing.assert_allclose(explainer.leaf_contributions[explainer.leaf_row[leaf]], expected, atol=1e-12)
+
+
+def test_predict_explain_returns_cached_contributions():
+    client = main.app.test_client()
+    main.explanation_cache.clear()
+
+    plain = client.post('/predict', json=ANSWERS).json
+    assert 'explanation' not in plain
+    explained = client.post('/predict?explain=1', json=ANSWERS).json
+    assert explained['probabilities'] == plain['probabilities']
+
+    explanation = explained['explanation']
+    assert set(explanation['contributions']) == set(TRAIT_NAMES)
+    for house, percent in explained['probabilities'].items():
+        total = explanation['baseline'][house] + sum(row[house] for row in explanation['contributions'].values())
+        assert abs(total - percent) < 0.1
+
+    hits = main.explanation_cache.hits
+    assert client.post('/predict?explain=1', json=ANSWERS).json['explanation'] == explanation
+    assert main.explanation_cache.hits == hits + 1
+
+
+def test_asgi_predict_explains_like_flask():
+    expected = main.app.test_client().post('/predict?explain=1', json=ANSWERS).json
+    status, body = asyncio.run(call('POST', '/predict?explain=1', ANSWERS))
+    assert status == 200 and body == expected
+
+
+def test_explanation_uses_the_version_that_scored():
+    current = main.model_registry.current
+    other = ModelVersion(current.engine, model=current.model, version='other-version')
+    features_array = np.array([main.validate_answers(ANSWERS)[1]])
+
+    main.explain_features(features_array, other)
+    assert other.explainer is not None
+    assert main.explanation_cache.get(('other-version', PredictionCache.make_key(features_array[0]))) is not None
@@ -0,0 +1,63 @@
+import random
+
+import numpy as np
+
+from features import EXPECTED_QUESTIONS, validate_answers, validate_many
+from legacy_validation import legacy_validate_answers
+
+
+def random_questionnaires(n, seed=0):
+    """Mostly valid answers, with missing keys, out-of-range values and wrong types mixed in"""
+    rng = random.Random(seed)
+    strange_values = [-1, 11, 10.5, -0.01, '5', None, [5], True, False, float('inf')]
+    questionnaires = []
+    for _ in range(n):
+        data = {q_id: rng.choice([rng.randint(0, 10), round(rng.uniform(0, 10), 3)]) for q_id in EXPECTED_QUESTIONS}
+        roll = rng.random()
+        if roll < 0.15:
+            for q_id in rng.sample(EXPECTED_QUESTIONS, rng.randint(1, 5)):
+                del data[q_id]
+        elif roll < 0.35:
+            for q_id in rng.sample(EXPECTED_QUESTIONS, rng.randint(1, 3)):
+                data[q_id] = rng.choice(strange_values)
+        if rng.random() < 0.1:
+            data['comment'] = 'extra keys are ignored'
+        questionnaires.append(data)
+    return questionnaires + [{}, None, {'q1': 5}]
+
+
+def test_vectorized_validation_matches_legacy_loop():
+    for data in random_questionnaires(2000):
+        assert validate_answers(data) == legacy_validate_answers(data)
+
+
+def test_batch_validation_matches_single_row_validation():
+    questionnaires = random_questionnaires(500, seed=1)
+
+    errors, features, valid_rows = validate_many(questionnaires)
+
+    assert len(features) == len(valid_rows)
+    row_of = {index: row for row, index in enumerate(valid_rows)}
+    for index, data in enumerate(questionnaires):
+        error, expected_features, _ = legacy_validate_answers(data)
+        assert errors[index] == error
+        if error is None:
+            assert np.array_equal(features[row_of[index]], expected_features)
+
+
+def test_non_finite_answers_are_rejected():
+    answers = {q_id: 5 for q_id in EXPECTED_QUESTIONS}
+    for value in (float('nan'), float('inf'), -float('inf')):
+        for position in (0, 1, 23):
+            data = dict(answers, **{EXPECTED_QUESTIONS[position]: value})
+            error, _, _ = validate_answers(data)
+            assert error['invalid_questions'] == [EXPECTED_QUESTIONS[position]]
+            errors, features, valid_rows = validate_many([data, answers])
+            assert errors[0] == error and valid_rows == [1] and np.isfinite(features).all()
+
+
+if __name__ == "__main__":
+    test_vectorized_validation_matches_legacy_loop()
+    test_batch_validation_matches_single_row_validation()
+    test_non_finite_answers_are_rejected()
+    print("✅ Vectorized validation reports exactly what the per-question loop did")
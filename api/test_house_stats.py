@@ -0,0 +1,129 @@
+import os
+import signal
+import time
+
+import numpy as np
+import pytest
+
+import main
+from features import TRAIT_NAMES
+from house_stats import HouseStats
+
+HOUSES = ['Gryffindor', 'Hufflepuff', 'Ravenclaw', 'Slytherin']
+
+
+def random_sortings(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 31, size=(n, 8)) / 3, rng.integers(0, 4, size=n), rng.uniform(0.25, 1, size=n)
+
+
+def record_all(stats, features, houses, winning):
+    for row, house, probability in zip(features, houses, winning):
+        stats.record(row, house, probability)
+
+
+def assert_matches(stats, features, houses, winning):
+    count, mean, m2, hist = stats.snapshot()
+    np.testing.assert_array_equal(count, np.bincount(houses, minlength=4))
+    for house in range(4):
+        rows = features[houses == house]
+        np.testing.assert_allclose(mean[house], rows.mean(axis=0), atol=1e-9)
+        np.testing.assert_allclose(m2[house] / (len(rows) - 1), rows.var(axis=0, ddof=1), atol=1e-9)
+    np.testing.assert_array_equal(hist, np.histogram(winning, bins=stats.bins, range=(0, 1))[0])
+
+    summary = stats.summary()
+    assert summary['total_sortings'] == len(features)
+    for i, trait in enumerate(TRAIT_NAMES):
+        assert summary['traits'][trait]['mean'] == pytest.approx(features[:, i].mean(), abs=1e-4)
+        assert summary['traits'][trait]['std'] == pytest.approx(features[:, i].std(ddof=1), abs=1e-4)
+
+
+def test_running_aggregates_match_a_full_recomputation():
+    stats = HouseStats(HOUSES, TRAIT_NAMES)
+    sortings = random_sortings(2000)
+    record_all(stats, *sortings)
+    assert_matches(stats, *sortings)
+
+
+def test_workers_share_the_file_and_it_survives_restarts(tmp_path):
+    path = str(tmp_path / 'house_stats.bin')
+    features, houses, winning = random_sortings(3000)
+    stats = HouseStats(HOUSES, TRAIT_NAMES, path=path, flush_interval=0)
+
+    # Two worker processes, each writing its own slot
+    children = []
+    for part in (slice(0, 1000), slice(1000, 2000)):
+        pid = os.fork()
+        if pid == 0:
+            record_all(stats, features[part], houses[part], winning[part])
+            stats.flush()
+            os._exit(0)
+        children.append(pid)
+    for pid in children:
+        assert os.waitpid(pid, 0)[1] == 0
+    assert stats.workers() == 2
+
+    # A restarted server reopens the file, reuses an exited worker's slot and keeps counting
+    restarted = HouseStats(HOUSES, TRAIT_NAMES, path=path, flush_interval=0)
+    record_all(restarted, features[2000:], houses[2000:], winning[2000:])
+    assert restarted.workers() == 2
+    assert_matches(restarted, features, houses, winning)
+
+    with pytest.raises(ValueError):
+        HouseStats(HOUSES[:2], TRAIT_NAMES, path=path)
+
+
+def test_a_worker_killed_mid_update_does_not_hang_readers(tmp_path):
+    path = str(tmp_path / 'house_stats.bin')
+    features, houses, winning = random_sortings(100)
+    stats = HouseStats(HOUSES, TRAIT_NAMES, path=path, flush_interval=0)
+
+    pid = os.fork()
+    if pid == 0:
+        record_all(stats, features, houses, winning)
+        stats._slot[0] += 1  # as if killed between the two sequence increments
+        stats.flush()
+        os.kill(os.getpid(), signal.SIGKILL)
+    os.waitpid(pid, 0)
+
+    restarted = HouseStats(HOUSES, TRAIT_NAMES, path=path, flush_interval=0)
+    started = time.monotonic()
+    assert restarted.summary()['total_sortings'] == 100
+    assert time.monotonic() - started < 1
+
+    # The next worker to claim the slot makes its sequence even, so readers stop waiting on it
+    restarted.record(features[0], houses[0], winning[0])
+    assert restarted._slots[0, 0] % 2 == 0
+    assert restarted.summary()['total_sortings'] == 101
+
+
+def test_non_finite_sortings_are_rejected_and_never_recorded():
+    stats = HouseStats(HOUSES, TRAIT_NAMES)
+    stats.record([5.0] * 8, 0, 0.9)
+    stats.record([float('nan')] + [5.0] * 7, 0, 0.9)
+    stats.record([5.0] * 8, 1, float('nan'))
+    assert stats.summary()['total_sortings'] == 1
+
+    client = main.app.test_client()
+    before = client.get('/stats').json['total_sortings']
+    # Python's json writes NaN as a bare literal, which Flask's parser accepts
+    body = '{' + ', '.join(f'"q{i}": ' + ('NaN' if i == 1 else '5') for i in range(1, 25)) + '}'
+    response = client.post('/predict', data=body, content_type='application/json')
+    assert response.status_code == 400 and response.json['invalid_questions'] == ['q1']
+    after = client.get('/stats')
+    assert after.json['total_sortings'] == before
+    assert b'NaN' not in after.data
+
+
+def test_stats_endpoint_counts_every_scored_questionnaire():
+    client = main.app.test_client()
+    before = client.get('/stats').json
+
+    answers = {f'q{i}': 6 for i in range(1, 25)}
+    predicted = client.post('/predict', json=answers).json['predicted_house']
+    client.post('/predict/batch', json=[answers, answers, {'q1': 5}])
+
+    after = client.get('/stats').json
+    assert after['total_sortings'] == before['total_sortings'] + 3
+    assert after['houses'][predicted]['count'] == before['houses'][predicted]['count'] + 3
+    assert sum(bucket['count'] for bucket in after['winning_probability']) == after['total_sortings']
@@ -0,0 +1,124 @@
+import json
+import pickle
+
+import numpy as np
+
+import incremental_train
+import main
+from model_artifact import load_pickle, write_checksum
+from submission_log import SubmissionLog
+from dataset import load_dataset_features
+
+
+def write_model_copy(tmp_path):
+    model_path = str(tmp_path / "model.pkl")
+    with open(model_path, "wb") as f:
+        pickle.dump(main.model, f)
+    write_checksum(model_path)
+    return model_path
+
+
+def log_rows(log, features):
+    predictions, prediction_proba = main.predict_with_proba(features, use_cache=False)
+    for row, house, proba in zip(features, predictions, prediction_proba):
+        log.record(row.tolist(), house, proba.max())
+    log.flush()
+
+
+def test_submission_log_buffers_and_appends_batches(tmp_path):
+    log_path = str(tmp_path / "submissions.jsonl")
+    log = SubmissionLog(log_path, flush_rows=1000, flush_interval=3600)
+
+    log.record([5.0] * 8, 'Gryffindor', 0.9, label='Hufflepuff')
+    assert log.stats()['buffered'] == 1
+    assert log.flush() == 1
+    log.record([6.0] * 8, 'Ravenclaw', 0.7)
+    log.flush()
+
+    with open(log_path) as f:
+        entries = [json.loads(line) for line in f]
+    assert [entry['label'] for entry in entries] == ['Hufflepuff', None]
+    assert entries[1]['features'] == [6.0] * 8 and entries[1]['predicted_house'] == 'Ravenclaw'
+    assert log.stats()['written'] == 2
+
+
+def test_only_trusted_callers_can_confirm_labels(tmp_path):
+    log_path = str(tmp_path / "submissions.jsonl")
+    client = main.app.test_client()
+    labelled = dict({f'q{i}': 5 for i in range(1, 25)}, house='Hufflepuff')
+    admin = {'Authorization': 'Bearer secret'}
+    saved = main.submission_log, main.ADMIN_TOKEN
+    try:
+        main.submission_log = SubmissionLog(log_path, flush_interval=3600)
+        main.ADMIN_TOKEN = 'secret'
+        client.post('/predict', json=labelled)
+        client.post('/predict', json=labelled, headers={'Authorization': 'Bearer guess'})
+        client.post('/predict', json=labelled, headers=admin)
+        client.post('/predict/batch', json=[labelled], headers=admin)
+        client.post('/predict/batch', json=[labelled])
+        main.submission_log.flush()
+    finally:
+        main.submission_log, main.ADMIN_TOKEN = saved
+
+    with open(log_path) as f:
+        labels = [json.loads(line)['label'] for line in f]
+    assert labels == [None, None, 'Hufflepuff', 'Hufflepuff', None]
+
+
+def test_incremental_update_adds_trees_from_new_rows_only(tmp_path):
+    model_path = write_model_copy(tmp_path)
+    log_path = str(tmp_path / "submissions.jsonl")
+    log = SubmissionLog(log_path, flush_interval=3600)
+    features = load_dataset_features()
+    n_trees = len(main.model.estimators_)
+
+    log_rows(log, features[:400])
+    summary = incremental_train.run_update(log_path, model_path, trees_per_update=5, min_rows=100)
+    assert summary['updated'] and summary['usable_rows'] <= 400
+    updated = load_pickle(model_path)
+    assert len(updated.estimators_) == n_trees + 5
+    assert list(updated.classes_) == list(main.model.classes_)
+    assert list(updated.feature_names_in_) == main.FEATURE_NAMES
+    # The original trees are carried over unchanged
+    probe = np.full((1, 8), 5.0)
+    assert np.array_equal(updated.estimators_[0].predict_proba(probe), main.model.estimators_[0].predict_proba(probe))
+
+    state = incremental_train.load_state(model_path)
+    with open(log_path, "rb") as f:
+        assert state['log_offset'] == len(f.read())
+
+    # Nothing new: nothing to do
+    assert not incremental_train.run_update(log_path, model_path, min_rows=100)['updated']
+
+    # Only the rows appended since the last update are read
+    log_rows(log, features[400:700])
+    summary = incremental_train.run_update(log_path, model_path, trees_per_update=5, min_rows=100, max_trees=n_trees)
+    assert summary['updated'] and summary['new_entries'] == 300
+    assert len(load_pickle(model_path).estimators_) == n_trees
+
+
+def test_incremental_update_waits_for_every_house(tmp_path):
+    model_path = write_model_copy(tmp_path)
+    log_path = str(tmp_path / "submissions.jsonl")
+    log = SubmissionLog(log_path, flush_interval=3600)
+    for _ in range(300):
+        log.record([9.0, 3.0, 5.0, 4.0, 1.0, 8.0, 8.0, 5.0], 'Gryffindor', 0.95)
+    log.flush()
+
+    summary = incremental_train.run_update(log_path, model_path, min_rows=100)
+    assert not summary['updated'] and 'no rows for' in summary['reason']
+    assert incremental_train.load_state(model_path)['log_offset'] == 0
+    assert len(load_pickle(model_path).estimators_) == len(main.model.estimators_)
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    for test in (test_submission_log_buffers_and_appends_batches,
+                 test_only_trusted_callers_can_confirm_labels,
+                 test_incremental_update_adds_trees_from_new_rows_only,
+                 test_incremental_update_waits_for_every_house):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ Submission log and incremental updates work")
@@ -0,0 +1,184 @@
+import shutil
+
+import numpy as np
+import pytest
+
+import main
+from compact_forest import CompactForest, ThresholdGridError
+from dataset import load_dataset_features
+from inference import FlatForest
+from lookup_table import LookupTable
+from model_artifact import ModelIntegrityError, export_artifact, load_artifact, load_pickle, write_checksum
+from prediction_cache import PredictionCache
+
+def test_single_pass_labels_match_predict():
+    """predict_with_proba must give exactly the labels model.predict gives"""
+    features = load_dataset_features()
+
+    predictions, prediction_proba = main.predict_with_proba(features)
+
+    assert np.array_equal(predictions, main.model.predict(features))
+    assert np.array_equal(prediction_proba, main.model.predict_proba(features))
+
+
+def test_single_pass_labels_match_predict_row_by_row():
+    """Same check through the 1x8 path /predict takes for each request"""
+    # A slice keeps this quick; the full dataset is covered by the batch test above
+    features = load_dataset_features()[:100]
+
+    for row in features:
+        features_array = row.reshape(1, -1)
+        predictions, _ = main.predict_with_proba(features_array)
+        assert predictions[0] == main.model.predict(features_array)[0]
+
+
+def test_flat_forest_matches_predict_proba():
+    """The flat-array engine must reproduce model.predict_proba on every dataset row"""
+    features = load_dataset_features()
+    forest = FlatForest.from_sklearn(main.model)
+
+    expected = main.model.predict_proba(features)
+    actual = forest.predict_proba(features)
+
+    assert np.allclose(actual, expected, rtol=0, atol=1e-12)
+    assert np.array_equal(forest.predict(features), main.model.predict(features))
+
+
+def test_flat_forest_matches_predict_proba_on_fractional_means():
+    """Trait means from the questionnaire are multiples of 1/3, not just integers"""
+    rng = np.random.default_rng(0)
+    features = rng.integers(0, 31, size=(500, 8)) / 3
+    forest = FlatForest.from_sklearn(main.model)
+
+    assert np.allclose(forest.predict_proba(features), main.model.predict_proba(features), rtol=0, atol=1e-12)
+
+
+def test_lookup_table_matches_predict_proba_on_integer_answers():
+    """Every dataset row plus random whole-number questionnaires, scored without the model"""
+    rng = np.random.default_rng(0)
+    answers = rng.integers(0, 11, size=(2000, 8, 3))
+    features = np.vstack([load_dataset_features(), answers.sum(axis=2) / 3])
+    table = LookupTable.build(main.model)
+
+    codes, on_grid = table.grid_codes(features)
+    assert on_grid.all()
+    assert np.allclose(table.lookup_proba(codes), main.model.predict_proba(features), rtol=0, atol=1e-12)
+
+
+def test_lookup_table_falls_back_for_fractional_answers():
+    rng = np.random.default_rng(0)
+    integer_rows = rng.integers(0, 31, size=(20, 8)) / 3
+    fractional_rows = rng.uniform(0, 10, size=(20, 8))
+    features = np.vstack([integer_rows, fractional_rows])
+    table = LookupTable.build(main.model, fallback=FlatForest.from_sklearn(main.model))
+
+    _, on_grid = table.grid_codes(features)
+    assert on_grid.sum() == 20
+    assert np.allclose(table.predict_proba(features), main.model.predict_proba(features), rtol=0, atol=1e-12)
+
+
+def test_model_artifact_round_trip_matches_predict_proba(tmp_path):
+    """The memory-mapped artifact must score exactly like the forest it was exported from"""
+    artifact_path = str(tmp_path / "model.forest")
+    export_artifact(FlatForest.from_sklearn(main.model), artifact_path)
+
+    forest = load_artifact(artifact_path)
+    features = load_dataset_features()
+
+    assert isinstance(forest.threshold, np.memmap) and not forest.threshold.flags.writeable
+    assert list(forest.classes_) == list(main.model.classes_)
+    assert np.allclose(forest.predict_proba(features), main.model.predict_proba(features), rtol=0, atol=1e-12)
+
+
+def test_compact_forest_matches_flat_forest(tmp_path):
+    """Half-grid uint8 thresholds must route every row to the same leaves, on and off the grid"""
+    flat = FlatForest.from_sklearn(main.model)
+    compact = CompactForest.from_flat(flat)
+    rng = np.random.default_rng(0)
+    features = np.vstack([load_dataset_features(), rng.integers(0, 31, size=(5000, 8)) / 3,
+                          rng.uniform(0, 10, size=(5000, 8))])
+
+    assert np.array_equal(compact.apply(features), flat.apply(features))
+    assert np.allclose(compact.predict_proba(features), flat.predict_proba(features),
+                       rtol=0, atol=compact.proba_tolerance)
+    flat_nbytes = sum(array.nbytes for array in (flat.feature, flat.threshold, flat.children, flat.value, flat.roots))
+    assert compact.nbytes < flat_nbytes / 5
+
+    artifact_path = str(tmp_path / "model.compact.forest")
+    export_artifact(compact, artifact_path)
+    loaded = load_artifact(artifact_path)
+    assert isinstance(loaded, CompactForest) and isinstance(loaded.leaf_value, np.memmap)
+    assert np.array_equal(loaded.predict_proba(features), compact.predict_proba(features))
+
+
+def test_compact_forest_fixed_point_leaves_on_impure_forest():
+    """Shallow trees have mixed leaves, whose probabilities are only kept to half a uint16 step"""
+    from sklearn.ensemble import RandomForestClassifier
+
+    features = load_dataset_features()
+    model = RandomForestClassifier(n_estimators=20, max_depth=3, random_state=0).fit(features, main.model.predict(features))
+    compact = CompactForest.from_sklearn(model)
+    expected = model.predict_proba(features)
+    actual = compact.predict_proba(features)
+
+    assert 0 < np.abs(actual - expected).max() <= compact.proba_tolerance
+    assert np.array_equal(compact.predict(features), model.predict(features))
+
+    # Thresholds between non-grid training values cannot be quantized exactly
+    off_grid = RandomForestClassifier(n_estimators=2, random_state=0).fit(features + 0.1, model.predict(features))
+    with pytest.raises(ThresholdGridError):
+        CompactForest.from_sklearn(off_grid)
+
+
+def test_load_pickle_rejects_tampered_model(tmp_path):
+    model_path = str(tmp_path / "model.pkl")
+    shutil.copyfile(main.MODEL_PATH, model_path)
+    write_checksum(model_path)
+    assert load_pickle(model_path).n_estimators == main.model.n_estimators
+
+    with open(model_path, "ab") as f:
+        f.write(b"\0")
+    with pytest.raises(ModelIntegrityError):
+        load_pickle(model_path)
+
+
+def test_prediction_cache_counts_hits_misses_and_evictions():
+    cache = PredictionCache(maxsize=2)
+    first, second, third = (cache.make_key([value] * 8) for value in (1, 2, 3))
+
+    assert cache.get(first) is None
+    cache.put(first, np.array([1.0]))
+    cache.put(second, np.array([2.0]))
+    assert cache.get(first)[0] == 1.0
+    cache.put(third, np.array([3.0]))  # evicts `second`, the least recently used
+
+    assert cache.get(second) is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['size']) == (1, 2, 1, 2)
+
+
+def test_cached_predictions_match_uncached():
+    """A cache hit must return exactly what the engine computed for that feature vector"""
+    features = load_dataset_features()[:50]
+    main.prediction_cache.clear()
+
+    _, cold = main.predict_with_proba(features)
+    _, warm = main.predict_with_proba(features)
+
+    assert np.array_equal(cold, main.engine.predict_proba(features))
+    assert np.array_equal(warm, cold)
+
+
+if __name__ == "__main__":
+    test_single_pass_labels_match_predict()
+    test_single_pass_labels_match_predict_row_by_row()
+    print("✅ Single-pass inference matches model.predict on every row of house_sorting.csv")
+    test_flat_forest_matches_predict_proba()
+    test_flat_forest_matches_predict_proba_on_fractional_means()
+    print("✅ Flat inference engine matches model.predict_proba")
+    test_lookup_table_matches_predict_proba_on_integer_answers()
+    test_lookup_table_falls_back_for_fractional_answers()
+    print("✅ Lookup table matches model.predict_proba")
+    test_prediction_cache_counts_hits_misses_and_evictions()
+    test_cached_predictions_match_uncached()
+    print("✅ Prediction cache returns the same probabilities as the engine")
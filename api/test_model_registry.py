@@ -0,0 +1,122 @@
+import asyncio
+import pickle
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+import main
+from inference import FlatForest
+from model_registry import ModelRegistry, ModelVersion, SmokeTestError, smoke_test
+from test_asgi import call
+from dataset import load_dataset_features
+
+
+def flat_version(model, version):
+    return ModelVersion(FlatForest.from_sklearn(model), model=model, engine_name='flat', version=version)
+
+
+def retrained_model(n_estimators=5):
+    """A different forest with the same houses, standing in for a retrained model"""
+    features = load_dataset_features()
+    labels = main.model.predict(features)
+    return RandomForestClassifier(n_estimators=n_estimators, max_depth=4, random_state=0).fit(features, labels)
+
+
+def test_reload_swaps_in_new_version_after_smoke_test():
+    old = flat_version(main.model, 'old')
+    new = flat_version(retrained_model(), 'new')
+    swapped = []
+    registry = ModelRegistry(lambda: new, main.SMOKE_TEST_ROWS, on_swap=swapped.append)
+    registry.set_current(old)
+
+    in_flight = registry.current
+    assert registry.reload(wait=True) is True
+    assert registry.current is new and swapped == [old, new]
+    # A request holding the old version still scores with it
+    assert in_flight.engine is old.engine
+    stats = registry.stats()
+    assert stats['version'] == 'new' and stats['reloads'] == 1 and 0 <= stats['last_reload_agreement'] <= 1
+
+
+def test_failed_smoke_test_keeps_serving_old_version():
+    old = flat_version(main.model, 'old')
+    broken = flat_version(retrained_model(), 'broken')
+    broken.engine.value = np.full_like(broken.engine.value, np.nan)
+    registry = ModelRegistry(lambda: broken, main.SMOKE_TEST_ROWS)
+    registry.set_current(old)
+
+    assert registry.reload(wait=True) is False
+    assert registry.current is old
+    assert registry.stats()['failed_reloads'] == 1 and 'SmokeTestError' in registry.last_error
+
+    renamed = flat_version(retrained_model(), 'renamed')
+    renamed.engine.classes_ = np.array(['A', 'B', 'C', 'D'], dtype=object)
+    try:
+        smoke_test(renamed, old, main.SMOKE_TEST_ROWS)
+        raise AssertionError("changed houses must fail the smoke test")
+    except SmokeTestError:
+        pass
+
+
+def test_watcher_reloads_when_model_file_changes(tmp_path):
+    model_path = tmp_path / "model.pkl"
+    model_path.write_bytes(pickle.dumps(main.model))
+
+    def loader():
+        model = pickle.loads(model_path.read_bytes())
+        return flat_version(model, str(model.n_estimators))
+
+    registry = ModelRegistry(loader, main.SMOKE_TEST_ROWS, watch_paths=(str(model_path),))
+    registry.set_current(loader())
+    assert registry.check_for_changes() is None
+
+    model_path.write_bytes(pickle.dumps(retrained_model(n_estimators=7)))
+    assert registry.check_for_changes() is True
+    assert registry.current.version == '7'
+
+    # A truncated file is rejected once and not retried until it changes again
+    model_path.write_bytes(b"not a pickle")
+    assert registry.check_for_changes() is False
+    assert registry.check_for_changes() is None
+    assert registry.current.version == '7'
+
+
+def test_admin_reload_endpoint_and_health_version():
+    client = main.app.test_client()
+    saved_token = main.ADMIN_TOKEN
+    try:
+        main.ADMIN_TOKEN = None
+        assert client.post('/admin/reload').status_code == 404
+
+        main.ADMIN_TOKEN = 'secret'
+        assert client.post('/admin/reload', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+        response = client.post('/admin/reload?wait=1', headers={'Authorization': 'Bearer secret'})
+        assert response.status_code == 200 and response.json['reloaded'] is True
+
+        # The ASGI app answers the same way
+        async def asgi_reloads():
+            return [
+                (await call('POST', '/admin/reload', headers={'Authorization': 'Bearer wrong'}))[0],
+                await call('POST', '/admin/reload?wait=1', headers={'Authorization': 'Bearer secret'}),
+            ]
+        unauthorized, (status, body) = asyncio.run(asgi_reloads())
+        assert unauthorized == 401 and status == 200 and body['reloaded'] is True
+    finally:
+        main.ADMIN_TOKEN = saved_token
+
+    health = client.get('/').json['model_version']
+    assert health['version'] == main.model_registry.current.version[:12]
+    assert health['loaded_at'] and health['reloads'] >= 1
+    assert client.post('/predict', json={f'q{i}': 5 for i in range(1, 25)}).status_code == 200
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    test_reload_swaps_in_new_version_after_smoke_test()
+    test_failed_smoke_test_keeps_serving_old_version()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_watcher_reloads_when_model_file_changes(Path(tmp))
+    test_admin_reload_endpoint_and_health_version()
+    print("✅ Model registry reloads, smoke-tests and swaps versions")
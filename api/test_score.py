@@ -0,0 +1,94 @@
+import csv
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+import main
+import score
+from dataset import DATASET_PATH, load_dataset_features
+
+
+def test_scoring_csv_in_chunks_matches_model(tmp_path):
+    output_path = str(tmp_path / "predictions.csv")
+
+    summary = score.score_file(DATASET_PATH, output_path, chunk_size=128, progress=False)
+
+    with open(output_path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    expected = main.model.predict(load_dataset_features())
+    assert summary['rows'] == len(rows) == len(expected)
+    assert [row['row'] for row in rows] == [str(i) for i in range(len(rows))]
+    assert np.array_equal([row['predicted_house'] for row in rows], expected)
+
+
+def test_scoring_jsonl_reports_bad_rows_in_place(tmp_path):
+    answers = {f'q{i}': 5 for i in range(1, 25)}
+    input_path = tmp_path / "answers.jsonl"
+    input_path.write_text('\n'.join([
+        json.dumps(answers),
+        json.dumps({'q1': 5, 'q2': 7}),
+        'not json',
+        json.dumps(dict(answers, q5=15)),
+        # Strings are numbers only in CSV; in JSON they are rejected as /predict rejects them
+        json.dumps(dict(answers, q1='5')),
+    ]) + '\n')
+    output_path = str(tmp_path / "predictions.jsonl")
+
+    summary = score.score_file(str(input_path), output_path, chunk_size=2, progress=False)
+
+    with open(output_path) as f:
+        results = [json.loads(line) for line in f]
+    assert (summary['rows'], summary['failed']) == (5, 4)
+    assert [result['row'] for result in results] == [0, 1, 2, 3, 4]
+    client = main.app.test_client()
+    expected = client.post('/predict', json=answers).json
+    assert results[0]['predicted_house'] == expected['predicted_house']
+    assert results[0]['probabilities'] == expected['probabilities']
+    assert results[1]['error'] == 'Missing required questions'
+    assert results[3]['invalid_questions'] == ['q5']
+    rejected = client.post('/predict', json=dict(answers, q1='5'))
+    assert rejected.status_code == 400
+    assert {key: value for key, value in results[4].items() if key != 'row'} == rejected.json
+
+
+def test_parallel_scoring_preserves_order(tmp_path):
+    serial_path = str(tmp_path / "serial.csv")
+    parallel_path = str(tmp_path / "parallel.csv")
+
+    score.score_file(DATASET_PATH, serial_path, chunk_size=64, progress=False)
+    score.score_file(DATASET_PATH, parallel_path, chunk_size=64, score=score.ParallelScorer(2), progress=False)
+
+    with open(serial_path) as serial, open(parallel_path) as parallel:
+        assert serial.read() == parallel.read()
+
+
+def test_cli_writes_only_results_to_stdout():
+    """Model-loading messages go to stderr, in the parent and in every worker"""
+    for extra, output_format in (([], 'csv'), (['--workers', '2', '--chunk-size', '500'], 'jsonl')):
+        output = subprocess.run(
+            [sys.executable, 'score.py', DATASET_PATH, '-', '--quiet', '--output-format', output_format] + extra,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=dict(os.environ, MODEL_WATCH_INTERVAL='0'),
+            capture_output=True, text=True, check=True,
+        ).stdout
+        lines = output.splitlines()
+        n_rows = len(load_dataset_features())
+        if output_format == 'csv':
+            assert lines[0].startswith('row,predicted_house,')
+            assert len(list(csv.DictReader(lines))) == len(lines) - 1 == n_rows
+        else:
+            assert [json.loads(line)['row'] for line in lines] == list(range(n_rows))
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    with tempfile.TemporaryDirectory() as tmp:
+        test_scoring_csv_in_chunks_matches_model(Path(tmp))
+        test_scoring_jsonl_reports_bad_rows_in_place(Path(tmp))
+        test_parallel_scoring_preserves_order(Path(tmp))
+    test_cli_writes_only_results_to_stdout()
+    print("✅ Bulk scorer matches the model, reports bad rows in place and keeps order in parallel")
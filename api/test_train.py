@@ -0,0 +1,102 @@
+import json
+import os
+
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import cross_val_score
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+
+import train
+from model_artifact import load_pickle
+
+
+def result(name, cv_accuracy, serialized_bytes, row_latency_ms=0.1, servable=True):
+    return {
+        'name': name, 'servable': servable, 'cv_accuracy': cv_accuracy,
+        'serialized_bytes': serialized_bytes, 'row_latency_ms': row_latency_ms,
+    }
+
+
+def test_select_model_picks_cheapest_within_budget():
+    results = [
+        result('big', 0.990, 900_000, row_latency_ms=0.3),
+        result('small', 0.982, 30_000, row_latency_ms=0.2),
+        result('tiny but inaccurate', 0.950, 5_000, row_latency_ms=0.05),
+        result('not a forest', 0.999, 1_000, servable=False),
+    ]
+
+    assert train.select_model(results) == 1
+    assert train.select_model(results, accuracy_tolerance=0.005) == 0
+    assert train.select_model(results, accuracy_tolerance=0.05, prefer='latency') == 2
+    assert train.select_model(results, max_row_latency_ms=0.25, accuracy_tolerance=0.005) is None
+
+
+def small_grid():
+    return [
+        ("Decision Tree", DecisionTreeClassifier(random_state=0), {}, False),
+        ("KNN (n_neighbors=3)", KNeighborsClassifier(n_neighbors=3), {'n_neighbors': 3}, True),
+        ("Random Forest (n_estimators=5, max_depth=4)",
+         RandomForestClassifier(n_estimators=5, max_depth=4, random_state=0),
+         {'n_estimators': 5, 'max_depth': 4}, False),
+    ]
+
+
+def test_train_writes_model_checksum_and_manifest(tmp_path):
+    models = small_grid()
+    model, manifest = train.train(models=models, accuracy_tolerance=0.05)
+    assert manifest['selected']['name'] == models[2][0]
+    assert len(manifest['candidates']) == 3
+
+    model_path = str(tmp_path / "model.pkl")
+    written = train.write_model(model, model_path, manifest)
+
+    loaded = load_pickle(model_path)
+    assert list(loaded.classes_) == list(model.classes_)
+    with open(train.manifest_path(model_path)) as f:
+        saved = json.load(f)
+    assert saved['model_sha256'] == written['model_sha256']
+    assert saved['seed'] == train.DEFAULT_SEED
+    assert os.path.exists(model_path + ".sha256")
+
+
+def test_cached_folds_match_cross_val_score_and_resume(tmp_path):
+    """Shared fold/scaling caches give the same CV scores as cross_val_score on a pipeline"""
+    cache_path = str(tmp_path / "cache.jsonl")
+    models = small_grid()
+    _, manifest = train.train(models=models, workers=2, cache_path=cache_path)
+
+    X, y = train.load_dataset()
+    x_train, _, y_train, _ = train.train_test_split(X, y, train_size=train.TRAIN_SIZE, random_state=train.SPLIT_SEED)
+    for (name, estimator, _, scaled), result in zip(models, manifest['candidates']):
+        reference = make_pipeline(StandardScaler(), clone(estimator)) if scaled else clone(estimator)
+        expected = cross_val_score(reference, x_train.to_numpy(dtype=float), y_train, cv=train.CV_FOLDS).mean()
+        assert abs(result['cv_accuracy'] - expected) < 1e-12, name
+
+    # A torn line from an interrupted run is skipped, and nothing is re-evaluated
+    with open(cache_path, "a") as f:
+        f.write('{"key": "partial')
+    cache = train.ResultsCache(cache_path)
+    assert len(cache.results) == len(models) * (train.CV_FOLDS + 1)
+    with open(cache_path) as f:
+        assert f.read().endswith('}\n')
+    _, resumed = train.train(models=models, cache_path=cache_path)
+    assert [r['cv_accuracy'] for r in resumed['candidates']] == [r['cv_accuracy'] for r in manifest['candidates']]
+    # Timings are measured again on every run, in this process, and never land in the cache
+    assert all(result['row_latency_ms'] > 0 for result in resumed['candidates'])
+    with open(cache_path) as f:
+        assert 'row_latency_ms' not in f.read()
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    test_select_model_picks_cheapest_within_budget()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_train_writes_model_checksum_and_manifest(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_cached_folds_match_cross_val_score_and_resume(Path(tmp))
+    print("✅ Training pipeline selects within budget and writes model + manifest")
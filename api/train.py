@@ -0,0 +1,488 @@
+"""
+Reproducible training pipeline for the house sorting model.
+
+Replaces the ad-hoc cells of model.ipynb: every candidate (the notebook's six
+model families, its KNN n_neighbors sweep and a grid of random forest sizes)
+is fitted with a fixed seed on the same split and scored on what it costs to
+serve as well as on accuracy:
+
+- test accuracy and 5-fold CV accuracy on the training split
+- per-row predict_proba latency with the engine /predict would use
+  (the flat forest for random forests, the sklearn model otherwise)
+- batch throughput in rows/s
+- pickled size
+
+The accuracy work is split into one task per (candidate, CV fold) plus one
+hold-out task per candidate, fanned out across --workers processes. Fold
+indices and the standardized matrices for scaled models are computed once and
+shared by every task. Each finished task is appended to a results cache, so an
+interrupted run picks up where it stopped. Latency and throughput are measured
+afterwards, one candidate at a time in this process with the pool shut down,
+and never cached: timings taken next to busy workers, or on another run,
+would not be comparable.
+
+The selected model is the cheapest servable candidate (smallest pickle by
+default) whose accuracy is within a tolerance of the best candidate's and
+which meets any latency or size budget given. It is refitted, written with
+its .sha256 checksum and a JSON manifest describing the run.
+
+Run from the api directory:
+    python train.py                                    # writes ../house_sorting_model.pkl + manifest
+    python train.py --workers 8                        # same result, tasks spread over 8 processes
+    python train.py --output /tmp/model.pkl --accuracy-tolerance 0.005 --max-row-latency-ms 0.2
+    python train.py --dry-run                          # evaluate and select, write nothing
+    python train.py --dataset ../house_sorting.cols    # train from the columnar copy (columnar.py)
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+import platform
+import statistics
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.neural_network import MLPClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVC
+from sklearn.tree import DecisionTreeClassifier
+
+from columnar import ColumnarDataset
+from dataset import DATASET_PATH
+from features import FEATURE_NAMES
+from inference import FlatForest
+from model_artifact import DEFAULT_MODEL_PATH, write_checksum
+
+TARGET = 'House'
+DEFAULT_CACHE_PATH = 'train_results_cache.jsonl'
+
+# The notebook split with train_size=0.8, random_state=50; keep it so accuracies stay comparable
+SPLIT_SEED = 50
+TRAIN_SIZE = 0.8
+DEFAULT_SEED = 42
+CV_FOLDS = 5
+
+KNN_NEIGHBORS = range(1, 20)
+FOREST_SIZES = (10, 25, 50, 100, 200)
+FOREST_DEPTHS = (None, 6, 8, 10, 12)
+
+# sklearn warns on every numpy-array call to a model fitted on a DataFrame
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+
+def manifest_path(model_path):
+    return os.path.splitext(model_path)[0] + ".manifest.json"
+
+
+def load_dataset(path=DATASET_PATH):
+    """
+    (X, y): the 8 trait columns in FEATURE_NAMES order and the House labels,
+    from the CSV or from a columnar dataset directory (columnar.py)
+    """
+    if not os.path.isdir(path):
+        df = pd.read_csv(path)
+        return df[FEATURE_NAMES], df[TARGET]
+
+    dataset = ColumnarDataset(path)
+    labels = dataset.labels(TARGET)
+    labelled = labels != None  # noqa: E711 - elementwise on an object array
+    if dataset.scale == 1 and labelled.all():
+        # The DataFrame wraps the memory-mapped uint8 codes without copying them
+        traits = dataset.trait_codes()
+    else:
+        traits = dataset.features()[labelled]
+        labels = labels[labelled]
+    return pd.DataFrame(traits, columns=FEATURE_NAMES, copy=False), pd.Series(labels, name=TARGET)
+
+
+def dataset_sha256(path):
+    """SHA-256 of the CSV, or of a columnar dataset's meta.json and chunk files in name order"""
+    digest = hashlib.sha256()
+    paths = [os.path.join(path, name) for name in sorted(os.listdir(path))] if os.path.isdir(path) else [path]
+    for file_path in paths:
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def candidates(seed=DEFAULT_SEED, knn_neighbors=KNN_NEIGHBORS, forest_sizes=FOREST_SIZES,
+               forest_depths=FOREST_DEPTHS):
+    """
+    (name, estimator, params, scaled) for every model to evaluate. Scaled models
+    are trained on standardized traits and shipped behind their StandardScaler,
+    so every pickled model takes raw trait scores like the forest does
+    """
+    models = [
+        ("Logistic Regression", LogisticRegression(max_iter=1000, random_state=seed), {}, True),
+        ("SVM", SVC(probability=True, random_state=seed), {}, True),
+        ("Decision Tree", DecisionTreeClassifier(random_state=seed), {}, False),
+        ("Neural Network", MLPClassifier(hidden_layer_sizes=(50, 30), max_iter=1000, random_state=seed), {}, True),
+    ]
+    for n_neighbors in knn_neighbors:
+        models.append((f"KNN (n_neighbors={n_neighbors})", KNeighborsClassifier(n_neighbors=n_neighbors),
+                       {'n_neighbors': n_neighbors}, True))
+    for n_estimators in forest_sizes:
+        for max_depth in forest_depths:
+            models.append((
+                f"Random Forest (n_estimators={n_estimators}, max_depth={max_depth})",
+                RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth, random_state=seed),
+                {'n_estimators': n_estimators, 'max_depth': max_depth},
+                False,
+            ))
+    return models
+
+
+def is_servable(model):
+    """The API's flat and lookup engines are built from a random forest's trees"""
+    return isinstance(model, RandomForestClassifier)
+
+
+def serving_engine(model):
+    return FlatForest.from_sklearn(model) if is_servable(model) else model
+
+
+def row_latency_ms(engine, X, n_rows=200, repeats=3):
+    """Median milliseconds for one single-row predict_proba call, best of `repeats` passes"""
+    rows = [row.reshape(1, -1) for row in X[:n_rows]]
+    best = None
+    for _ in range(repeats):
+        timings = []
+        for row in rows:
+            start = time.perf_counter()
+            engine.predict_proba(row)
+            timings.append(time.perf_counter() - start)
+        median = statistics.median(timings)
+        best = median if best is None else min(best, median)
+    return best * 1000
+
+
+def batch_rows_per_s(engine, X, batch_size=10000):
+    batch = np.resize(X, (batch_size, X.shape[1]))
+    start = time.perf_counter()
+    engine.predict_proba(batch)
+    return batch_size / (time.perf_counter() - start)
+
+
+class SearchData:
+    """
+    Everything tasks need, computed once per run: the split, the CV fold
+    indices (the StratifiedKFold cross_val_score would use) and the
+    standardized train/validation matrices of each fold and of the hold-out split
+    """
+
+    def __init__(self, x_train, x_test, y_train, y_test, folds=CV_FOLDS):
+        self.x_train, self.x_test = x_train, x_test
+        self.y_train, self.y_test = y_train.to_numpy(), y_test.to_numpy()
+        X = x_train.to_numpy(dtype=float)
+
+        self.folds = []
+        self.scaled_folds = []
+        for train_index, val_index in StratifiedKFold(n_splits=folds).split(X, self.y_train):
+            self.folds.append((train_index, val_index))
+            scaler = StandardScaler().fit(X[train_index])
+            self.scaled_folds.append((scaler.transform(X[train_index]), scaler.transform(X[val_index])))
+
+        # Fitted on the DataFrame so shipped pipelines keep feature_names_in_
+        self.scaler = StandardScaler().fit(x_train)
+        self.scaled_train = self.scaler.transform(x_train)
+        self.X = X
+
+    def fold_matrices(self, fold, scaled):
+        train_index, val_index = self.folds[fold]
+        if scaled:
+            X_train, X_val = self.scaled_folds[fold]
+        else:
+            X_train, X_val = self.X[train_index], self.X[val_index]
+        return X_train, self.y_train[train_index], X_val, self.y_train[val_index]
+
+    def fit_final(self, estimator, scaled):
+        """Fit on the whole training split; scaled models come back as scaler + estimator pipelines"""
+        model = clone(estimator)
+        if not scaled:
+            return model.fit(self.x_train, self.y_train)
+        model.fit(self.scaled_train, self.y_train)
+        return make_pipeline(self.scaler, model)
+
+
+_search_data = None
+
+
+def _init_worker(data):
+    global _search_data
+    _search_data = data
+
+
+def run_task(task):
+    """One unit of search work: ('fold', i) -> validation accuracy, ('holdout', None) -> test accuracy and size"""
+    name, estimator, params, scaled, kind, fold = task
+    data = _search_data
+
+    if kind == 'fold':
+        X_train, y_train, X_val, y_val = data.fold_matrices(fold, scaled)
+        model = clone(estimator).fit(X_train, y_train)
+        return {'accuracy': accuracy_score(y_val, model.predict(X_val))}
+
+    start = time.perf_counter()
+    model = data.fit_final(estimator, scaled)
+    fit_s = time.perf_counter() - start
+
+    return {
+        'family': type(estimator).__name__,
+        'servable': is_servable(model),
+        'test_accuracy': accuracy_score(data.y_test, model.predict(data.x_test)),
+        'serialized_bytes': len(pickle.dumps(model)),
+        'fit_s': fit_s,
+    }
+
+
+def measure_serving(models, data):
+    """
+    Per-row latency and batch throughput of every candidate, measured one after
+    another in this process so no other work competes for the CPU. The seeds make
+    each refit the model its hold-out task scored
+    """
+    X = data.x_test.to_numpy(dtype=float)
+    timings = []
+    for name, estimator, params, scaled in models:
+        engine = serving_engine(data.fit_final(estimator, scaled))
+        timings.append({'row_latency_ms': row_latency_ms(engine, X), 'batch_rows_per_s': batch_rows_per_s(engine, X)})
+    return timings
+
+
+def task_key(run_id, task):
+    name, _, params, _, kind, fold = task
+    return json.dumps([run_id, name, params, kind, fold], sort_keys=True)
+
+
+class ResultsCache:
+    """Append-only JSONL of finished tasks; a torn last line from an interrupted run is ignored"""
+
+    def __init__(self, path):
+        self.path = path
+        self.results = {}
+        if path and os.path.exists(path):
+            with open(path, 'r+') as f:
+                text = f.read()
+                # Drop a torn trailing line so the next append starts on a fresh line
+                if text and not text.endswith('\n'):
+                    text = text[:text.rfind('\n') + 1]
+                    f.truncate(len(text.encode()))
+            for line in text.splitlines():
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self.results[entry['key']] = entry['result']
+
+    def __contains__(self, key):
+        return key in self.results
+
+    def get(self, key):
+        return self.results[key]
+
+    def put(self, key, result):
+        self.results[key] = result
+        if self.path:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps({'key': key, 'result': result}) + '\n')
+
+
+def run_tasks(tasks, data, workers, cache, run_id):
+    """Run every task not already in the cache, on `workers` processes, caching each result as it lands"""
+    todo = [task for task in tasks if task_key(run_id, task) not in cache]
+    if len(todo) < len(tasks):
+        print(f"   resuming: {len(tasks) - len(todo)} of {len(tasks)} tasks already in the results cache")
+    # Slowest first (big forests), so the pool does not end waiting on one long task
+    todo.sort(key=lambda task: -task[2].get('n_estimators', 1))
+
+    if workers <= 1:
+        _init_worker(data)
+        for task in todo:
+            cache.put(task_key(run_id, task), run_task(task))
+        return
+
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(data,)) as pool:
+        futures = {pool.submit(run_task, task): task for task in todo}
+        for future in as_completed(futures):
+            cache.put(task_key(run_id, futures[future]), future.result())
+
+
+def collect_results(models, cache, run_id, timings, folds=CV_FOLDS):
+    """One summary dict per candidate, in candidate order"""
+    results = []
+    for (name, estimator, params, scaled), timing in zip(models, timings):
+        fold_scores = [
+            cache.get(task_key(run_id, (name, estimator, params, scaled, 'fold', fold)))['accuracy']
+            for fold in range(folds)
+        ]
+        holdout = cache.get(task_key(run_id, (name, estimator, params, scaled, 'holdout', None)))
+        # Timings from caches written before they were measured separately are replaced
+        result = dict(holdout, **timing, name=name, params=params,
+                      cv_accuracy=float(np.mean(fold_scores)), cv_std=float(np.std(fold_scores)))
+        results.append(result)
+        print(f"   {name:55s} test {result['test_accuracy']:.3f}  cv {result['cv_accuracy']:.3f}  "
+              f"{result['row_latency_ms']:.3f} ms/row  {result['serialized_bytes'] / 1024:8.0f} KiB")
+    return results
+
+
+def select_model(results, metric='cv_accuracy', accuracy_tolerance=0.01, max_row_latency_ms=None,
+                 max_size_bytes=None, prefer='size'):
+    """
+    Index of the chosen result: among servable candidates within `accuracy_tolerance`
+    (absolute) of the best servable accuracy and inside the latency/size budgets,
+    the smallest pickle (prefer='size') or fastest single-row call (prefer='latency').
+    Ties fall back to the higher accuracy. Returns None if nothing fits the budget
+    """
+    servable = [i for i, r in enumerate(results) if r['servable']]
+    if not servable:
+        return None
+    best = max(results[i][metric] for i in servable)
+
+    eligible = [
+        i for i in servable
+        if results[i][metric] >= best - accuracy_tolerance
+        and (max_row_latency_ms is None or results[i]['row_latency_ms'] <= max_row_latency_ms)
+        and (max_size_bytes is None or results[i]['serialized_bytes'] <= max_size_bytes)
+    ]
+    if not eligible:
+        return None
+
+    cost = 'serialized_bytes' if prefer == 'size' else 'row_latency_ms'
+    return min(eligible, key=lambda i: (results[i][cost], -results[i][metric]))
+
+
+def write_model(model, model_path, manifest):
+    """Pickle the model, then its .sha256 and the manifest (which records the same digest)"""
+    payload = pickle.dumps(model)
+    tmp_path = model_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+    os.replace(tmp_path, model_path)
+    sha256 = write_checksum(model_path)
+
+    manifest = dict(manifest, model_sha256=sha256, model_path=os.path.basename(model_path))
+    with open(manifest_path(model_path), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def train(dataset_path=DATASET_PATH, seed=DEFAULT_SEED, metric='cv_accuracy', accuracy_tolerance=0.01,
+          max_row_latency_ms=None, max_size_bytes=None, prefer='size', models=None,
+          workers=1, cache_path=None):
+    """Evaluate every candidate and pick one; returns (selected model or None, manifest dict)"""
+    X, y = load_dataset(dataset_path)
+    x_train, x_test, y_train, y_test = train_test_split(X, y, train_size=TRAIN_SIZE, random_state=SPLIT_SEED)
+    models = candidates(seed) if models is None else models
+
+    dataset_hash = dataset_sha256(dataset_path)
+    # Cached results are only reused for the same data, seed and library version
+    run_id = hashlib.sha256(f"{dataset_hash}:{seed}:{sklearn.__version__}".encode()).hexdigest()[:16]
+
+    tasks = [
+        (name, estimator, params, scaled, 'fold', fold)
+        for name, estimator, params, scaled in models for fold in range(CV_FOLDS)
+    ] + [(name, estimator, params, scaled, 'holdout', None) for name, estimator, params, scaled in models]
+
+    print("=" * 60)
+    print(f"🏋️ EVALUATING {len(models)} CANDIDATES ({len(tasks)} tasks, {workers} worker(s), "
+          f"{len(x_train)} train / {len(x_test)} test rows)")
+    print("=" * 60)
+    start = time.perf_counter()
+    data = SearchData(x_train, x_test, y_train, y_test)
+    cache = ResultsCache(cache_path)
+    run_tasks(tasks, data, workers, cache, run_id)
+    search_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    timings = measure_serving(models, data)
+    timing_s = time.perf_counter() - start
+
+    results = collect_results(models, cache, run_id, timings)
+    selected = select_model(results, metric, accuracy_tolerance, max_row_latency_ms, max_size_bytes, prefer)
+    print(f"   search took {search_s:.1f}s, serial timing {timing_s:.1f}s")
+
+    manifest = {
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'dataset': {'path': os.path.basename(dataset_path), 'sha256': dataset_hash, 'rows': len(X)},
+        'split': {'train_size': TRAIN_SIZE, 'random_state': SPLIT_SEED, 'cv_folds': CV_FOLDS},
+        'seed': seed,
+        'feature_names': FEATURE_NAMES,
+        'budget': {
+            'metric': metric, 'accuracy_tolerance': accuracy_tolerance, 'max_row_latency_ms': max_row_latency_ms,
+            'max_size_bytes': max_size_bytes, 'prefer': prefer,
+        },
+        'versions': {
+            'python': platform.python_version(), 'numpy': np.__version__,
+            'pandas': pd.__version__, 'sklearn': sklearn.__version__,
+        },
+        'search': {'workers': workers, 'seconds': search_s, 'timing_seconds': timing_s},
+        'selected': results[selected] if selected is not None else None,
+        'candidates': results,
+    }
+    if selected is None:
+        return None, manifest
+    # Refit in this process: the seed makes it the same model the hold-out task measured
+    name, estimator, params, scaled = models[selected]
+    return data.fit_final(estimator, scaled), manifest
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description='Train, evaluate and select the house sorting model')
+    parser.add_argument('--dataset', default=DATASET_PATH)
+    parser.add_argument('--output', default=DEFAULT_MODEL_PATH, help='Where to write the selected model')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='random_state for every estimator')
+    parser.add_argument('--metric', choices=['cv_accuracy', 'test_accuracy'], default='cv_accuracy',
+                        help='Accuracy the budget is measured against')
+    parser.add_argument('--accuracy-tolerance', type=float, default=0.01,
+                        help='Largest accuracy drop from the best candidate that is accepted (default 0.01)')
+    parser.add_argument('--max-row-latency-ms', type=float, help='Single-row latency budget')
+    parser.add_argument('--max-size-kb', type=float, help='Pickled size budget')
+    parser.add_argument('--prefer', choices=['size', 'latency'], default='size',
+                        help='Among candidates within budget, pick the smallest or the fastest')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Processes running fold and hold-out tasks (default: one per CPU)')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH,
+                        help='Results cache to resume from and append to')
+    parser.add_argument('--no-cache', action='store_true', help='Evaluate everything from scratch, keep nothing')
+    parser.add_argument('--dry-run', action='store_true', help='Evaluate and select without writing files')
+    args = parser.parse_args(argv)
+
+    model, manifest = train(
+        args.dataset, args.seed, args.metric, args.accuracy_tolerance, args.max_row_latency_ms,
+        args.max_size_kb * 1024 if args.max_size_kb else None, args.prefer,
+        workers=args.workers, cache_path=None if args.no_cache else args.cache,
+    )
+    selected = manifest['selected']
+    if selected is None:
+        print("❌ No servable candidate fits the accuracy/latency/size budget", file=sys.stderr)
+        return 1
+
+    print(f"✅ Selected {selected['name']}: {args.metric} {selected[args.metric]:.3f}, "
+          f"{selected['row_latency_ms']:.3f} ms/row, {selected['serialized_bytes'] / 1024:.0f} KiB")
+    if args.dry_run:
+        return 0
+
+    write_model(model, args.output, manifest)
+    print(f"✅ Model written to {args.output} with {os.path.basename(manifest_path(args.output))} and checksum")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())